@@ -0,0 +1,143 @@
+# action_log.py
+# 操作记录与确定性回放。
+# 记录文件是 NDJSON：第一行是头部 (随机种子 + 每个农场的起始存档 + 区域天气的地点)，之后每行一条记录：
+#   ["a", 时间, 农场, 操作, 参数]   玩家操作 (名称和参数与 Simulation.act 相同)
+#   ["h", 时间, 哈希]               每天开始时 (还款结算之前) 的状态哈希
+#   ["e", 时间]                     记录结束
+# 回放在无界面的 Simulation 中以最快速度重新执行所有操作，并逐日比对状态哈希。
+
+import hashlib
+import json
+import time
+
+FORMAT = 1
+
+
+def state_hash(farms, market, now):
+    """Hash of every farm's saved state plus the market's internal state."""
+    from game_state import save_to_dict
+    digest = hashlib.sha1()
+    for farm in sorted(farms, key=lambda f: f.ledger_key):
+        digest.update(json.dumps(save_to_dict(farm, now), sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    for product in market.products:
+        digest.update(repr((product.name, product.fundamental, product.impact, product.sold_today)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class ActionLog:
+    """Records one session. Hooks every farm's recorder; record_day() is called at the start of every day."""
+
+    def __init__(self, path, seed, farms, now, world=None):
+        from game_state import save_to_dict
+        self.path = path
+        self.file = open(path, "w", encoding="utf-8")
+        header = {
+            "format": FORMAT,
+            "seed": seed,
+            "farms": {farm.ledger_key: save_to_dict(farm, now) for farm in farms},
+        }
+        if world:
+            header["world"] = world  # Simulation.world_config()
+        self._write(header)
+        self.actions = 0
+        for farm in farms:
+            farm.recorder = self.record
+
+    def _write(self, item):
+        self.file.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def record(self, ts, farm_key, action, args):
+        self._write(["a", ts, farm_key, action, args])
+        self.actions += 1
+
+    def record_day(self, farms, market, now):
+        self._write(["h", now.strftime("%Y-%m-%d %H:%M"), state_hash(farms, market, now)])
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self, now=None):
+        if now is not None:
+            self._write(["e", now.strftime("%Y-%m-%d %H:%M")])
+        self.file.close()
+
+
+def record_simulation(sim, path, seed):
+    """Starts recording a Simulation's farms (call before the first tick)."""
+    log = ActionLog(path, seed, list(sim.farms.values()), sim.now, sim.world_config())
+    sim.day_listeners.append(lambda s: log.record_day(s.farms.values(), s.market, s.now))
+    return log
+
+
+def read_log(path):
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != FORMAT:
+            raise ValueError(f"不支持的操作记录格式: {header.get('format')}")
+        entries = [json.loads(line) for line in f if line.strip()]
+    return header, entries
+
+
+class ReplayResult:
+    def __init__(self):
+        self.days_checked = 0
+        self.actions = 0
+        self.hours = 0
+        self.mismatch = None  # (时间, 记录的哈希, 回放的哈希)
+        self.elapsed = 0.0
+
+    @property
+    def ok(self):
+        return self.mismatch is None
+
+    def to_dict(self):
+        return {
+            "ok": self.ok, "days_checked": self.days_checked, "actions": self.actions, "hours": self.hours,
+            "elapsed_s": round(self.elapsed, 3),
+            "mismatch": dict(zip(("time", "recorded", "replayed"), self.mismatch)) if self.mismatch else None,
+        }
+
+
+def replay(path, stop_on_mismatch=True):
+    """Re-executes a recorded session headlessly and compares the daily state hashes."""
+    from simulation import Simulation
+    header, entries = read_log(path)
+    sim = Simulation.from_saves(header["farms"], seed=header["seed"], **header.get("world", {}))
+    result = ReplayResult()
+
+    actions = {}
+    expected = {}
+    end = None
+    for entry in entries:
+        if entry[0] == "a":
+            actions.setdefault(entry[1], []).append(entry[2:])
+        elif entry[0] == "h":
+            expected[entry[1]] = entry[2]
+        end = max(end or entry[1], entry[1])
+
+    def check_day(s):
+        ts = s.now.strftime("%Y-%m-%d %H:%M")
+        if ts not in expected or result.mismatch:
+            return
+        actual = state_hash(s.farms.values(), s.market, s.now)
+        if actual != expected[ts]:
+            result.mismatch = (ts, expected[ts], actual)
+        else:
+            result.days_checked += 1
+    sim.day_listeners.append(check_day)
+
+    start = time.perf_counter()
+    while end is not None:
+        ts = sim.now.strftime("%Y-%m-%d %H:%M")
+        for farm_key, action, args in actions.get(ts, ()):
+            sim.act(sim.farms[farm_key], action, args)
+            result.actions += 1
+        if ts >= end:
+            check_day(sim)  # 最后一个哈希没有下一小时的推进来触发
+            break
+        if result.mismatch and stop_on_mismatch:
+            break
+        sim.tick(1)
+    result.hours = sim.hours
+    result.elapsed = time.perf_counter() - start
+    return result
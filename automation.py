@@ -0,0 +1,229 @@
+# automation.py
+# 自动化规则：每行一条 "<操作> when <条件> [and <条件> ...]"，例如
+#   water when water_level < 35
+#   pesticide when damage has 病害 and funds > 500
+#   pesticide when infection_risk > 30
+#   harvest when matured
+#   sell when freshness < 40
+# 规则只编译一次，每小时在 update_hour_logic 中按规则对所有田地 / 库存批量求值。
+
+import operator
+from collections import deque
+
+from farm import ACTION_COSTS, ACTION_REQUIREMENTS, apply_bulk_action
+
+OPERATORS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "==": operator.eq, "!=": operator.ne,
+}
+
+# 田地规则可用的属性 (field -> 值)
+FIELD_ATTRS = {
+    "water_level": lambda f: f.crop.water_level if f.crop else None,
+    "health": lambda f: f.crop.health if f.crop else None,
+    "growth_points": lambda f: f.crop.growth_points if f.crop else None,
+    "days": lambda f: f.crop.day_counter if f.crop else None,
+    "pesticide_hours": lambda f: f.crop.pesticide_effect_hours if f.crop else None,
+    "infection": lambda f: f.crop.infection * 100 if f.crop else None,            # 感染度 %
+    "infection_risk": lambda f: f.crop.infection_risk * 100 if f.crop else None,  # 邻居造成的感染压力 %
+    "soil_N": lambda f: f.soil_npk["N"],
+    "soil_P": lambda f: f.soil_npk["P"],
+    "soil_K": lambda f: f.soil_npk["K"],
+    "crop": lambda f: f.crop.crop_data.name if f.crop else None,
+    "damage": lambda f: f.crop.damage_reasons if f.crop else (),
+    "matured": lambda f: bool(f.crop and f.crop.matured and not f.crop.dead and not f.crop.harvested),
+    "empty": lambda f: f.crop is None,
+}
+
+# 库存规则可用的属性 (lot dict -> 值)
+LOT_ATTRS = {
+    "freshness": lambda lot: lot["freshness"],
+    "nutrition": lambda lot: lot["nutrition"],
+    "days": lambda lot: lot["days"],
+    "yield": lambda lot: lot["yield"],
+    "name": lambda lot: lot["name"],
+    "tags": lambda lot: lot.get("quality_tags", ()),
+}
+
+# 全局上下文属性
+CONTEXT_ATTRS = {"funds", "hour", "day"}
+
+# 属性的取值类型决定可用的运算符：集合只能用 has，文字只能用 == / !=，其余都是数值，比较值必须是数字
+COLLECTION_ATTRS = {"damage", "tags"}
+TEXT_ATTRS = {"crop", "name"}
+
+FIELD_ACTIONS = {"water", "pesticide", "harvest", "fertilize_N", "fertilize_P", "fertilize_K"}
+LOT_ACTIONS = {"sell"}
+
+
+class RuleError(ValueError):
+    """Raised when a rule line cannot be parsed."""
+
+
+def _compile_condition(text, attrs):
+    parts = text.split()
+    if len(parts) == 1:
+        name = parts[0]
+        if name not in attrs:
+            raise RuleError(f"未知条件 '{name}'")
+        getter = attrs[name]
+        return lambda obj, ctx: bool(getter(obj))
+    if len(parts) != 3:
+        raise RuleError(f"无法解析条件 '{text}'")
+
+    name, op, raw_value = parts
+    if name in CONTEXT_ATTRS:
+        getter = lambda obj, ctx: ctx[name]
+    elif name in attrs:
+        attr_getter = attrs[name]
+        getter = lambda obj, ctx: attr_getter(obj)
+    else:
+        raise RuleError(f"未知属性 '{name}'")
+
+    if op == "has":
+        if name not in COLLECTION_ATTRS:
+            raise RuleError(f"'{name}' 不是集合属性，不能使用 has (可用: {', '.join(sorted(COLLECTION_ATTRS))})")
+        return lambda obj, ctx: raw_value in getter(obj, ctx)
+    if op not in OPERATORS:
+        raise RuleError(f"未知运算符 '{op}'")
+    if name in COLLECTION_ATTRS:
+        raise RuleError(f"集合属性 '{name}' 只能使用 has")
+    if name in TEXT_ATTRS:
+        if op not in ("==", "!="):
+            raise RuleError(f"文字属性 '{name}' 只能使用 == 或 !=")
+        value = raw_value
+    else:
+        try:
+            value = float(raw_value)
+        except ValueError:
+            raise RuleError(f"'{name}' 需要一个数字，而不是 '{raw_value}'") from None
+    compare = OPERATORS[op]
+
+    def condition(obj, ctx):
+        current = getter(obj, ctx)
+        return current is not None and compare(current, value)
+    return condition
+
+
+class Rule:
+    def __init__(self, text):
+        self.text = text.strip()
+        head, sep, body = self.text.partition(" when ")
+        self.action = head.strip()
+        if not sep or not body.strip():
+            raise RuleError(f"规则缺少 'when' 条件: '{self.text}'")
+        if self.action in FIELD_ACTIONS:
+            self.target, attrs = "field", FIELD_ATTRS
+        elif self.action in LOT_ACTIONS:
+            self.target, attrs = "lot", LOT_ATTRS
+        else:
+            raise RuleError(f"未知操作 '{self.action}'")
+
+        conditions = [_compile_condition(part.strip(), attrs) for part in body.split(" and ")]
+        if self.target == "field":
+            bulk_action = self.action.split("_")[0]
+            conditions.insert(0, lambda field, ctx: ACTION_REQUIREMENTS[bulk_action](field))
+        self.predicate = lambda obj, ctx: all(cond(obj, ctx) for cond in conditions)
+
+    def select(self, items, ctx):
+        return [i for i, item in enumerate(items) if self.predicate(item, ctx)]
+
+
+def compile_rules(lines):
+    """Compiles rule lines, ignoring blanks and '#' comments."""
+    rules = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            rules.append(Rule(line))
+    return rules
+
+
+class AutomationResult:
+    def __init__(self):
+        self.cost = 0.0
+        self.revenue = 0.0
+        self.messages = []
+        self.actions = 0
+        self.entries = []  # (类别, 金额, 田地/批次, 作物)，由 Farm 记账
+        self.harvests = []  # (田地下标, 收获信息)
+        self.sales = []     # (作物, 金额, 批次号)
+
+
+class AutomationEngine:
+    def __init__(self, rules=(), max_actions_per_tick=20, max_spend_per_tick=None, audit_size=500):
+        self.enabled = False
+        self.rules = []
+        self.rule_texts = []
+        self.max_actions_per_tick = max_actions_per_tick
+        self.max_spend_per_tick = max_spend_per_tick
+        self.audit = deque(maxlen=audit_size)  # (时间, 规则, 操作, 对象编号, 金额)
+        self.set_rules(rules)
+
+    def set_rules(self, lines):
+        """Replaces the rule set. Raises RuleError and keeps the old rules if any line is invalid."""
+        rules = compile_rules(lines)
+        self.rules = rules
+        self.rule_texts = [rule.text for rule in rules]
+
+    def run(self, fields, storage, market, funds, now):
+        """Evaluates every rule once and applies the matching actions in batches."""
+        result = AutomationResult()
+        if not self.enabled or not self.rules:
+            return result
+
+        ctx = {"funds": funds, "hour": now.hour, "day": now.day}
+        timestamp = now.strftime("%Y-%m-%d %H:%M")
+        for rule in self.rules:
+            budget = self.max_actions_per_tick - result.actions
+            if budget <= 0:
+                result.messages.append("自动化: 本小时操作次数已达上限。")
+                break
+
+            indices = rule.select(fields if rule.target == "field" else storage.stock, ctx)[:budget]
+            if not indices:
+                continue
+
+            if rule.target == "field":
+                self._run_field_rule(rule, indices, fields, storage, ctx, result, timestamp)
+            else:
+                self._run_sell_rule(rule, indices, storage, market, ctx, result, timestamp)
+        return result
+
+    def _run_field_rule(self, rule, indices, fields, storage, ctx, result, timestamp):
+        action, _, nutrient_type = rule.action.partition("_")
+        unit_cost = ACTION_COSTS[action]
+        crops = {i: fields[i].crop.crop_data.name for i in indices if fields[i].crop}
+        if unit_cost > 0:
+            spendable = ctx["funds"]
+            if self.max_spend_per_tick is not None:
+                spendable = min(spendable, self.max_spend_per_tick - result.cost)
+            indices = indices[:max(0, int(spendable // unit_cost))]
+            if not indices:
+                return
+
+        bulk = apply_bulk_action(fields, indices, action, ctx["funds"],
+                                 storage=storage, nutrient_type=nutrient_type or None)
+        if not bulk.ok:
+            return
+        ctx["funds"] -= bulk.cost
+        result.cost += bulk.cost
+        result.actions += len(bulk.applied)
+        result.entries.extend((action, -unit_cost, f"田地{i+1}", crops.get(i)) for i in bulk.applied if unit_cost)
+        result.harvests.extend(zip(bulk.applied, bulk.harvests))
+        result.messages.append(f"🤖 {bulk.summary(nutrient_type or None)}")
+        self.audit.append((timestamp, rule.text, rule.action, [i + 1 for i in bulk.applied], -bulk.cost))
+
+    def _run_sell_rule(self, rule, indices, storage, market, ctx, result, timestamp):
+        sold = storage.sell_lots(indices, market)
+        if not sold:
+            return
+        revenue = sum(value for _name, value, _lot_id in sold)
+        names = [name for name, _value, _lot_id in sold]
+        result.entries.extend(("sale", value, f"批次{lot_id}", name) for name, value, lot_id in sold)
+        result.sales.extend(sold)
+        ctx["funds"] += revenue
+        result.revenue += revenue
+        result.actions += len(sold)
+        result.messages.append(f"🤖 自动出售 {len(sold)} 批作物 ({', '.join(sorted(set(names)))}), 收入 ￥{revenue:.2f}")
+        self.audit.append((timestamp, rule.text, rule.action, names, revenue))
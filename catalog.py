@@ -0,0 +1,216 @@
+# catalog.py
+# 作物与商品目录：从 data/crop_data.json 读取，校验后缓存为预编译的 pickle，
+# 全局只加载一次，CropData / Market / Storage 共用同一份只读索引。
+
+import json
+import os
+import pickle
+from types import MappingProxyType
+
+from plant import CropData
+
+CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "crop_data.json")
+CACHE_SUFFIX = ".cache.pickle"
+CACHE_FORMAT = 3
+DEFAULT_MARKET_DEPTH = 5000.0
+DEFAULT_DECAY = (0.5, 1 / 30)  # 仓储腐烂曲线: 每天腐烂 (基础 + 存放天数 × 增量) 个新鲜度百分点
+
+CROP_FIELDS = {
+    "name": str, "grow_days": (int, float), "temp_range": list, "drought_tolerance": (int, float),
+    "cost_per_mu": (int, float), "yield_per_mu": (int, float), "disease_chance": (int, float),
+    "water_need": (int, float), "sun_preference": list, "npk_preference": list,
+    "npk_uptake": (int, float), "quality_tags": dict,
+}
+PRODUCT_FIELDS = {
+    "name": str, "base_price": (int, float), "min_price": (int, float),
+    "max_price": (int, float), "unit": str,
+}
+
+
+class CatalogError(ValueError):
+    """Raised when the catalog file is malformed or crops and products disagree."""
+
+
+class ProductSpec:
+    """Static market definition of a product. Live prices stay on market.Product."""
+    __slots__ = ("name", "base_price", "min_price", "max_price", "unit", "rain_sensitive", "external", "depth", "decay")
+
+    def __init__(self, name, base_price, min_price, max_price, unit, rain_sensitive=False, external=False,
+                 depth=DEFAULT_MARKET_DEPTH, decay=DEFAULT_DECAY):
+        self.name = name
+        self.base_price = base_price
+        self.min_price = min_price
+        self.max_price = max_price
+        self.unit = unit
+        self.rain_sensitive = rain_sensitive
+        self.external = external  # 外购商品（苹果、鸡蛋等），没有对应的作物
+        self.depth = depth        # 市场深度（公斤），见 market.Product
+        self.decay = decay        # (基础, 每天增量)，见 storage.Storage.update_all
+
+
+class Catalog:
+    """Immutable, name-indexed registry of crops and products."""
+
+    def __init__(self, crops, products, source=None):
+        self.crops = MappingProxyType(crops)        # name -> CropData
+        self.products = MappingProxyType(products)  # name -> ProductSpec (market display order)
+        self.source = source
+
+    def crop(self, name):
+        return self.crops.get(name)
+
+    def product(self, name):
+        return self.products.get(name)
+
+    def is_tradable(self, name):
+        return name in self.products
+
+
+def _check_fields(entry, spec, where):
+    for key, expected in spec.items():
+        if key not in entry:
+            raise CatalogError(f"{where}: 缺少字段 '{key}'")
+        if not isinstance(entry[key], expected) or isinstance(entry[key], bool):
+            raise CatalogError(f"{where}: 字段 '{key}' 类型错误 ({type(entry[key]).__name__})")
+
+
+def validate(raw):
+    """Validates the parsed JSON document and returns it normalized to plain tuples/dicts."""
+    if not isinstance(raw, dict) or not isinstance(raw.get("crops"), list) or not isinstance(raw.get("products"), list):
+        raise CatalogError("目录文件必须包含 'crops' 与 'products' 列表")
+
+    crops = {}
+    for i, entry in enumerate(raw["crops"]):
+        where = f"crops[{i}]"
+        if not isinstance(entry, dict):
+            raise CatalogError(f"{where}: 必须是对象")
+        _check_fields(entry, CROP_FIELDS, where)
+        name = entry["name"]
+        if name in crops:
+            raise CatalogError(f"{where}: 作物 '{name}' 重复定义")
+        if len(entry["temp_range"]) != 2 or entry["temp_range"][0] > entry["temp_range"][1]:
+            raise CatalogError(f"{where}: temp_range 必须是 [最低, 最高]")
+        if len(entry["sun_preference"]) != 2:
+            raise CatalogError(f"{where}: sun_preference 必须是 [理想值, 容差]")
+        if len(entry["npk_preference"]) != 3 or sum(entry["npk_preference"]) <= 0:
+            raise CatalogError(f"{where}: npk_preference 必须是三个正数比例")
+        if entry["grow_days"] <= 0 or entry["npk_uptake"] <= 0:
+            raise CatalogError(f"{where}: grow_days 与 npk_uptake 必须为正数")
+        if not 0 <= entry["disease_chance"] <= 1:
+            raise CatalogError(f"{where}: disease_chance 必须在 0-1 之间")
+        if any(k not in "NPK" or len(k) != 1 for k in entry["quality_tags"]):
+            raise CatalogError(f"{where}: quality_tags 的键只能是 N/P/K")
+        crops[name] = {
+            "name": name,
+            "grow_days": entry["grow_days"],
+            "temp_range": tuple(entry["temp_range"]),
+            "drought_tolerance": entry["drought_tolerance"],
+            "cost_per_mu": entry["cost_per_mu"],
+            "yield_per_mu": entry["yield_per_mu"],
+            "disease_chance": entry["disease_chance"],
+            "water_need": entry["water_need"],
+            "sun_preference": tuple(entry["sun_preference"]),
+            "npk_preference": tuple(entry["npk_preference"]),
+            "npk_uptake": entry["npk_uptake"],
+            "quality_tags": dict(entry["quality_tags"]),
+            "special_trait": entry.get("special_trait"),
+        }
+
+    products = {}
+    for i, entry in enumerate(raw["products"]):
+        where = f"products[{i}]"
+        if not isinstance(entry, dict):
+            raise CatalogError(f"{where}: 必须是对象")
+        _check_fields(entry, PRODUCT_FIELDS, where)
+        name = entry["name"]
+        if name in products:
+            raise CatalogError(f"{where}: 商品 '{name}' 重复定义")
+        if not entry["min_price"] <= entry["base_price"] <= entry["max_price"]:
+            raise CatalogError(f"{where}: 价格必须满足 min_price <= base_price <= max_price")
+        depth = entry.get("depth", DEFAULT_MARKET_DEPTH)
+        if not isinstance(depth, (int, float)) or isinstance(depth, bool) or depth <= 0:
+            raise CatalogError(f"{where}: depth 必须为正数")
+        decay = entry.get("decay", DEFAULT_DECAY)
+        if (not isinstance(decay, (list, tuple)) or len(decay) != 2
+                or not all(isinstance(v, (int, float)) and not isinstance(v, bool) and v >= 0 for v in decay)):
+            raise CatalogError(f"{where}: decay 必须是 [基础, 每天增量] 两个非负数")
+        external = bool(entry.get("external", False))
+        if external and name in crops:
+            raise CatalogError(f"{where}: '{name}' 是作物，不能标记为外购商品")
+        if not external and name not in crops:
+            raise CatalogError(f"{where}: 商品 '{name}' 没有对应作物 (若为外购商品请标记 external)")
+        products[name] = {
+            "name": name,
+            "base_price": entry["base_price"],
+            "min_price": entry["min_price"],
+            "max_price": entry["max_price"],
+            "unit": entry["unit"],
+            "rain_sensitive": bool(entry.get("rain_sensitive", False)),
+            "external": external,
+            "depth": float(depth),
+            "decay": tuple(decay),
+        }
+
+    missing = [name for name in crops if name not in products]
+    if missing:
+        raise CatalogError(f"以下作物没有市场价格: {', '.join(missing)}")
+
+    return {"crops": crops, "products": products}
+
+
+def _cache_path(path):
+    return path + CACHE_SUFFIX
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return (CACHE_FORMAT, st.st_mtime_ns, st.st_size)
+
+
+def _read_cache(path, stamp):
+    try:
+        with open(_cache_path(path), "rb") as f:
+            cached_stamp, normalized = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, ValueError, TypeError):
+        return None
+    return normalized if cached_stamp == stamp else None
+
+
+def _write_cache(path, stamp, normalized):
+    tmp = _cache_path(path) + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump((stamp, normalized), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, _cache_path(path))
+    except OSError:
+        pass  # 缓存只是加速，写不进去不影响使用
+
+
+def load_catalog(path=CATALOG_FILE, use_cache=True):
+    """Loads and validates a catalog file, reusing the pickle cache when the source is unchanged."""
+    stamp = _source_stamp(path)
+    normalized = _read_cache(path, stamp) if use_cache else None
+    if normalized is None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except json.JSONDecodeError as e:
+            raise CatalogError(f"目录文件解析失败: {e}") from e
+        normalized = validate(raw)
+        if use_cache:
+            _write_cache(path, stamp, normalized)
+
+    crops = {name: CropData(**fields) for name, fields in normalized["crops"].items()}
+    products = {name: ProductSpec(**fields) for name, fields in normalized["products"].items()}
+    return Catalog(crops, products, source=path)
+
+
+_default_catalog = None
+
+
+def get_catalog():
+    """Returns the process-wide catalog, loading it on first use."""
+    global _default_catalog
+    if _default_catalog is None:
+        _default_catalog = load_catalog()
+    return _default_catalog
@@ -0,0 +1,172 @@
+# charts.py
+# 图表视图：所有曲线画在同一个 Canvas 上 (资金、债务、信用分、作物价格、田地健康/水分)。
+# 每个面板记住自己的线条 id 和上次绘制时的数据版本，刷新时只用 coords() 更新有新数据的面板。
+
+import tkinter as tk
+from tkinter import ttk
+
+from metrics import LEVEL_HOURS
+
+RANGES = {"最近3天": 72, "最近30天": 24 * 30, "最近1年": 24 * 365, "全部": None}
+PAD_LEFT = 70
+PAD_RIGHT = 12
+PANEL_GAP = 10
+
+
+class ChartPanel:
+    """一个面板: 边框、标题、刻度文字、若干条曲线 (每条曲线有平均线和最小/最大值包络)。"""
+
+    def __init__(self, canvas, title, colors):
+        self.canvas = canvas
+        self.title = title
+        self.frame_id = canvas.create_rectangle(0, 0, 0, 0, outline="#ccc")
+        self.title_id = canvas.create_text(0, 0, anchor="nw", font=("Arial", 9, "bold"))
+        self.max_id = canvas.create_text(0, 0, anchor="ne", font=("Arial", 8), fill="#555")
+        self.min_id = canvas.create_text(0, 0, anchor="se", font=("Arial", 8), fill="#555")
+        self.lines = [
+            (canvas.create_polygon(0, 0, 0, 0, fill=_lighten(color), outline="", state="hidden"),
+             canvas.create_line(0, 0, 0, 0, fill=color, width=1.5, state="hidden"))
+            for color in colors
+        ]
+        self.version = None
+        self.box = (0, 0, 0, 0)
+
+    def place(self, x0, y0, x1, y1):
+        self.box = (x0, y0, x1, y1)
+        self.canvas.coords(self.frame_id, x0, y0, x1, y1)
+        self.canvas.coords(self.title_id, x0 + 4, y0 + 2)
+        self.canvas.coords(self.max_id, x0 - 4, y0)
+        self.canvas.coords(self.min_id, x0 - 4, y1)
+        self.version = None
+
+    def draw(self, windows, level, label):
+        """windows: one (first_hour, mean, low, high) per line, or None to hide that line."""
+        x0, y0, x1, y1 = self.box
+        shown = [w for w in windows if w is not None and len(w[1]) >= 2]
+        self.canvas.itemconfigure(self.title_id, text=f"{self.title} {label}")
+        if not shown:
+            for envelope, line in self.lines:
+                self.canvas.itemconfigure(envelope, state="hidden")
+                self.canvas.itemconfigure(line, state="hidden")
+            self.canvas.itemconfigure(self.max_id, text="")
+            self.canvas.itemconfigure(self.min_id, text="")
+            return
+
+        low = min(min(w[2]) for w in shown)
+        high = max(max(w[3]) for w in shown)
+        if high - low < 1e-9:
+            high, low = high + 1, low - 1
+        first = min(w[0] for w in shown)
+        last = max(w[0] + (len(w[1]) - 1) * LEVEL_HOURS[level] for w in shown)
+        x_scale = (x1 - x0) / max(1, last - first)
+        top = y0 + 16
+        y_scale = (y1 - 4 - top) / (high - low)
+
+        for (envelope, line), window in zip(self.lines, windows):
+            if window is None or len(window[1]) < 2:
+                self.canvas.itemconfigure(envelope, state="hidden")
+                self.canvas.itemconfigure(line, state="hidden")
+                continue
+            start, mean, lows, highs = window
+            step = LEVEL_HOURS[level] * x_scale
+            xs = [x0 + (start - first) * x_scale + i * step for i in range(len(mean))]
+            to_y = lambda v: y1 - 4 - (v - low) * y_scale
+            points = [c for x, v in zip(xs, mean) for c in (x, to_y(v))]
+            self.canvas.coords(line, *points)
+            self.canvas.itemconfigure(line, state="normal")
+            if level == "hour":
+                self.canvas.itemconfigure(envelope, state="hidden")
+            else:
+                outline = [c for x, v in zip(xs, highs) for c in (x, to_y(v))]
+                outline += [c for x, v in zip(reversed(xs), reversed(lows)) for c in (x, to_y(v))]
+                self.canvas.coords(envelope, *outline)
+                self.canvas.itemconfigure(envelope, state="normal")
+        self.canvas.itemconfigure(self.max_id, text=_fmt(high))
+        self.canvas.itemconfigure(self.min_id, text=_fmt(low))
+
+
+def _lighten(color):
+    r, g, b = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+    return "#%02x%02x%02x" % tuple(c + (255 - c) * 3 // 4 for c in (r, g, b))
+
+
+def _fmt(value):
+    return f"{value / 1000:.1f}k" if abs(value) >= 10000 else f"{value:.1f}"
+
+
+class ChartsView(tk.Frame):
+    def __init__(self, parent, recorder, products, field_count):
+        super().__init__(parent)
+        self.recorder = recorder
+
+        toolbar = tk.Frame(self)
+        toolbar.pack(fill="x", padx=10, pady=(5, 0))
+        tk.Label(toolbar, text="范围:").pack(side="left")
+        self.range_var = tk.StringVar(value="最近30天")
+        self._combo(toolbar, self.range_var, list(RANGES), 9)
+        tk.Label(toolbar, text="作物价格:").pack(side="left", padx=(10, 0))
+        self.product_var = tk.StringVar(value=products[0] if products else "")
+        self._combo(toolbar, self.product_var, products, 8)
+        tk.Label(toolbar, text="田地:").pack(side="left", padx=(10, 0))
+        self.field_var = tk.StringVar(value="1")
+        self.field_combo = self._combo(toolbar, self.field_var, [], 5)
+        self.set_field_count(field_count)
+
+        self.canvas = tk.Canvas(self, bg="white", highlightthickness=0)
+        self.canvas.pack(expand=True, fill="both", padx=10, pady=5)
+        self.panels = {
+            "funds": ChartPanel(self.canvas, "💰 资金", ["#2e7d32"]),
+            "debt": ChartPanel(self.canvas, "🏦 债务", ["#c62828"]),
+            "credit_score": ChartPanel(self.canvas, "📋 信用分", ["#1565c0"]),
+            "price": ChartPanel(self.canvas, "📈 价格", ["#ef6c00"]),
+            "field": ChartPanel(self.canvas, "🌾 田地 健康(绿)/水分(蓝)", ["#43a047", "#1e88e5"]),
+        }
+        self.width = self.height = 0
+        self.canvas.bind("<Configure>", self._on_resize)
+
+    def _combo(self, parent, var, values, width):
+        combo = ttk.Combobox(parent, textvariable=var, values=values, state="readonly", width=width)
+        combo.pack(side="left", padx=3)
+        combo.bind("<<ComboboxSelected>>", lambda e: self.refresh(force=True))
+        return combo
+
+    def set_field_count(self, count):
+        self.field_combo.configure(values=[str(i + 1) for i in range(count)])
+
+    def _on_resize(self, event):
+        if (event.width, event.height) == (self.width, self.height):
+            return
+        self.width, self.height = event.width, event.height
+        panel_h = max(40, (self.height - PANEL_GAP * (len(self.panels) + 1)) / len(self.panels))
+        for i, panel in enumerate(self.panels.values()):
+            y0 = PANEL_GAP + i * (panel_h + PANEL_GAP)
+            panel.place(PAD_LEFT, y0, self.width - PAD_RIGHT, y0 + panel_h)
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Redraws the panels that have new points at the chosen resolution."""
+        if self.width <= PAD_LEFT + PAD_RIGHT or not self.recorder.hours:
+            return
+        span = RANGES.get(self.range_var.get()) or self.recorder.hours
+        span = min(span, self.recorder.hours)
+        max_points = max(2, self.width - PAD_LEFT - PAD_RIGHT)
+        level = self.recorder.best_level(span, max_points)
+        n = span // LEVEL_HOURS[level] + 1
+        label = {"hour": "(每小时)", "day": "(每天, 阴影为当天最低~最高)", "week": "(每周, 阴影为当周最低~最高)"}[level]
+
+        sources = {
+            "funds": ["funds"],
+            "debt": ["debt"],
+            "credit_score": ["credit_score"],
+            "price": [f"price.{self.product_var.get()}"],
+            "field": [f"field{self.field_var.get()}.health", f"field{self.field_var.get()}.water"],
+        }
+        for key, panel in self.panels.items():
+            series = [self.recorder.series.get(name) for name in sources[key]]
+            # 数据版本: 所选分辨率下已有的点数；没有新点时不重画
+            version = (level, n, tuple(sources[key]),
+                       tuple(s.levels[level][0].total if s else -1 for s in series))
+            if not force and version == panel.version:
+                continue
+            panel.version = version
+            panel.draw([s.window(level, n) if s else None for s in series], level, label)
@@ -0,0 +1,64 @@
+# compaction.py
+# 长时间运行模式：每天开始时整理一次状态，让几十上百年的无界面运行内存保持平稳。
+#   - 田地：移除已死亡的作物实例 (相当于自动清理，收获的作物在收获时就已移除)；
+#   - 仓库：平时只合并存放天数相同的批次 (storage.merge_key)；新鲜度降为 0 的批次不再变化，
+#     不论存放天数按 (作物, 仓库, 品质) 合并成一批 (天数取最长的)；存放超过 max_lot_days 天的批次报废；
+#   - 账本 (economy.Ledger)：keep_days 天以前的记录按 (月份, 类别, 作物) 汇总成一行，keep_years 年以前的
+#     再按年汇总，分类汇总和余额不变；
+#   - 状态库 (game_state.StateStore)：只保留 keep_days 天的价格历史。
+# 其余会增长的结构本身已有上限：指标环形缓冲区、作物日响应表 (LRU)、自动化审计和服务器日志 (deque)。
+# 整理会改变存档内容，所以长时间运行模式不能与操作记录 (--record) 一起使用。
+
+import os
+import sys
+from datetime import timedelta
+
+
+def resident_memory():
+    """Current resident set size in bytes (peak RSS where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Compactor:
+    def __init__(self, keep_days=365, keep_years=10, max_lot_days=3650, every_days=30):
+        self.keep_days = keep_days
+        self.keep_years = keep_years
+        self.max_lot_days = max_lot_days
+        self.every_days = every_days  # 账本和价格历史每隔多少天整理一次
+        self.days = 0
+        self.stats = {"crops": 0, "lots_merged": 0, "lots_expired": 0, "ledger_rows": 0, "price_rows": 0}
+
+    def run(self, sim):
+        """Compacts every farm of sim (called by Simulation.start_new_day in long-run mode)."""
+        stats = self.stats
+        for farm in sim.farms.values():
+            for field in farm.fields:
+                if field.crop is not None and field.crop.dead:
+                    field.clear_field()
+                    stats["crops"] += 1
+            merged, expired = farm.storage.compact(self.max_lot_days)
+            stats["lots_merged"] += merged
+            if expired:
+                stats["lots_expired"] += len(expired)
+                weight = sum(lot["yield"] for lot in expired)
+                farm.log(f"🗑 {len(expired)} 批存放超过 {self.max_lot_days} 天的作物 ({weight:.0f}kg) 已报废。", "warn")
+
+        self.days += 1
+        if self.days % self.every_days:
+            return
+        now = sim.weather.time
+        cutoff = now - timedelta(days=self.keep_days)
+        if sim.ledger is not None:
+            stats["ledger_rows"] += sim.ledger.compact(cutoff.strftime("%Y-%m-%d %H:%M"))
+            stats["ledger_rows"] += sim.ledger.compact(f"{now.year - self.keep_years:04d}-01-01", period="year")
+        if sim.state_store is not None:
+            stats["price_rows"] += sim.state_store.compact(cutoff.strftime("%Y-%m-%d"))
+
+    def report(self):
+        return dict(self.stats, days=self.days, rss_mb=round(resident_memory() / 2 ** 20, 1))
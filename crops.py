@@ -1,18 +1,34 @@
 # crops.py (重构版)
 
-import random
 from plant import CropData
 
 class Field:
     """Represents a single piece of farmland with its own soil properties."""
     def __init__(self):
         self.soil_npk = {'N': 100.0, 'P': 100.0, 'K': 100.0} # N-P-K values of the soil
+        self.grid = None  # soil.SoilGrid；有网格时 soil_npk 是网格的平均值
         self.crop: CropInstance | None = None
 
-    def apply_fertilizer(self, nutrient_type, amount=25):
-        """Applies fertilizer to the soil."""
-        if nutrient_type in self.soil_npk:
+    def enable_grid(self, rows, cols):
+        """Splits the soil into a rows×cols grid starting from the current (uniform) NPK."""
+        from soil import SoilGrid
+        self.grid = SoilGrid(rows, cols, self.soil_npk)
+
+    def sync_soil(self):
+        if self.grid is not None:
+            self.soil_npk = self.grid.means()
+
+    def add_nutrient(self, nutrient_type, amount, cell=None):
+        if self.grid is not None:
+            self.grid.add(nutrient_type, amount, cell)
+            self.sync_soil()
+        else:
             self.soil_npk[nutrient_type] += amount
+
+    def apply_fertilizer(self, nutrient_type, amount=25, cell=None):
+        """Applies fertilizer to the soil (to one grid cell (row, col) if given and the field has a grid)."""
+        if nutrient_type in self.soil_npk:
+            self.add_nutrient(nutrient_type, amount, cell)
             return f"成功为田地施加了{amount}单位的{nutrient_type}肥。"
         return "无效的肥料类型。"
 
@@ -54,6 +70,8 @@ class CropInstance:
         
         self.pesticide_effect_hours = 0
         self.damage_reasons = set()
+        self.infection = 0.0       # 病害感染度 0~1，由 outbreak.OutbreakModel 每天更新
+        self.infection_risk = 0.0  # 最近一次计算的感染压力
         self.total_cost = crop_data.cost_per_mu
 
     def update_hourly(self, weather_hour):
@@ -77,7 +95,7 @@ class CropInstance:
             self.day_counter += 1
             self._daily_nutrient_update()
             self.check_maturity()
-            self.check_disease()
+            # 病害由 outbreak.OutbreakModel 在每天开始时统一计算 (包括在田地之间的传播)
 
     def _daily_nutrient_update(self):
         """Handles daily nutrient uptake and growth point calculation."""
@@ -92,15 +110,19 @@ class CropInstance:
         }
 
         # Actual uptake from soil
-        actual_uptake = {
-            'N': min(ideal_uptake['N'], self.field.soil_npk['N']),
-            'P': min(ideal_uptake['P'], self.field.soil_npk['P']),
-            'K': min(ideal_uptake['K'], self.field.soil_npk['K'])
-        }
+        if self.field.grid is not None:
+            actual_uptake = self.field.grid.uptake(ideal_uptake)  # 每个格子各自受限
+            self.field.sync_soil()
+        else:
+            actual_uptake = {
+                'N': min(ideal_uptake['N'], self.field.soil_npk['N']),
+                'P': min(ideal_uptake['P'], self.field.soil_npk['P']),
+                'K': min(ideal_uptake['K'], self.field.soil_npk['K'])
+            }
 
-        # Consume nutrients from soil
-        for nutrient, value in actual_uptake.items():
-            self.field.soil_npk[nutrient] -= value
+            # Consume nutrients from soil
+            for nutrient, value in actual_uptake.items():
+                self.field.soil_npk[nutrient] -= value
 
         # Calculate satisfaction (0-1 scale for the day)
         daily_satisfaction = sum(actual_uptake.values()) / sum(ideal_uptake.values())
@@ -116,7 +138,7 @@ class CropInstance:
 
         # Special Traits (e.g., Nitrogen Fixation for Soybeans)
         if self.crop_data.special_trait == 'nitrogen_fixer':
-            self.field.soil_npk['N'] += 0.5 # Soybeans fix some nitrogen back into the soil
+            self.field.add_nutrient('N', 0.5) # Soybeans fix some nitrogen back into the soil
 
     def _update_water_level(self, weather_hour):
         hourly_consumption = self.crop_data.water_need / 24
@@ -189,14 +211,6 @@ class CropInstance:
             if avg_satisfaction >= 0.9:
                 self.quality_tags.add(tag)
 
-    def check_disease(self):
-        disease_chance = self.crop_data.disease_chance
-        if self.pesticide_effect_hours > 0:
-            disease_chance *= 0.1
-        if random.random() < disease_chance:
-            self.health -= 10
-            self.damage_reasons.add("病害")
-
     def apply_manual_action(self, action, value=0):
         if action == "water":
             self.water_level = min(120, self.water_level + 30)
@@ -204,6 +218,7 @@ class CropInstance:
         elif action == "pesticide":
             self.pesticide_effect_hours = 48
             self.damage_reasons.discard("病害")
+            self.infection = 0.0
             self.total_cost += 120
 
     def harvest(self):
@@ -243,6 +258,8 @@ class CropInstance:
         
         if self.damage_reasons:
             status_str += f"⚠受损({', '.join(self.damage_reasons)})\n"
+        if self.infection > 0:
+            status_str += f"🦠感染: {self.infection * 100:.0f}%\n"
         
         npk_str = f"土: N:{self.field.soil_npk['N']:.1f} P:{self.field.soil_npk['P']:.1f} K:{self.field.soil_npk['K']:.1f}"
         status_str += npk_str
@@ -0,0 +1,210 @@
+# economy.py
+# 交易账本：每一笔资金变动都追加一条带类型的记录（时间、类别、田地/批次、作物、金额、余额），
+# 保存在 SQLite 中。余额随记录一起写入，分类汇总由触发器维护，
+# 因此查询余额和损益不需要扫描全部记录。
+# 每局游戏 (新游戏或读档) 记在自己的账簿里 (open_book() 返回的键，例如 "main#3")，
+# 旧游戏的记录原样保留；除 compact() 的汇总之外不删除任何记录。
+
+import sqlite3
+
+CATEGORY_NAMES = {
+    "opening": "期初资金",
+    "seed": "播种",
+    "water": "浇水",
+    "pesticide": "喷药",
+    "fertilize": "施肥",
+    "harvest": "收获",
+    "sale": "销售",
+    "storage": "仓储费",
+    "loan": "借款",
+    "repayment": "还款",
+    "field": "购买田地",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id       INTEGER PRIMARY KEY,
+    farm     TEXT NOT NULL,
+    ts       TEXT NOT NULL,
+    category TEXT NOT NULL,
+    ref      TEXT,
+    crop     TEXT,
+    amount   REAL NOT NULL,
+    balance  REAL NOT NULL,
+    count    INTEGER NOT NULL DEFAULT 1  -- 这一行代表的笔数：compact() 生成的汇总行为 N
+);
+CREATE INDEX IF NOT EXISTS entries_farm_ts ON entries (farm, ts);
+CREATE INDEX IF NOT EXISTS entries_farm_category ON entries (farm, category, ts);
+CREATE INDEX IF NOT EXISTS entries_farm_crop ON entries (farm, crop, ts);
+
+CREATE TABLE IF NOT EXISTS totals (
+    farm     TEXT NOT NULL,
+    category TEXT NOT NULL,
+    crop     TEXT NOT NULL DEFAULT '',
+    amount   REAL NOT NULL,
+    count    INTEGER NOT NULL,
+    PRIMARY KEY (farm, category, crop)
+);
+CREATE TRIGGER IF NOT EXISTS entries_totals AFTER INSERT ON entries BEGIN
+    INSERT INTO totals (farm, category, crop, amount, count)
+    VALUES (NEW.farm, NEW.category, COALESCE(NEW.crop, ''), NEW.amount, NEW.count)
+    ON CONFLICT (farm, category, crop) DO UPDATE SET amount = amount + NEW.amount, count = count + NEW.count;
+END;
+"""
+
+
+class Ledger:
+    """
+    只追加的交易账本。
+    写入先进入内存缓冲，flush() 时用一个事务批量写入；所有查询前都会自动 flush。
+    """
+
+    def __init__(self, path=":memory:", flush_every=500):
+        self.path = path
+        # 同一时间只有一个线程使用：界面的动态模式下由后台模拟线程使用，暂停后交还 Tk 线程 (见 sim_thread.py)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+        self.flush_every = flush_every
+        self._pending = []
+        self._balances = dict(self.conn.execute(
+            "SELECT farm, balance FROM entries WHERE id IN (SELECT MAX(id) FROM entries GROUP BY farm)"
+        ).fetchall())
+
+    def _migrate(self):
+        """旧账本文件没有 count 列：补上该列，汇总行的笔数从 ref ("汇总N笔") 转换过来，并重建触发器。"""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if not columns or "count" in columns:
+            return
+        with self.conn:
+            self.conn.execute("ALTER TABLE entries ADD COLUMN count INTEGER NOT NULL DEFAULT 1")
+            self.conn.execute("UPDATE entries SET count = CAST(substr(ref, 3, length(ref) - 3) AS INTEGER) "
+                              "WHERE ref LIKE '汇总%笔'")
+            self.conn.execute("DROP TRIGGER IF EXISTS entries_totals")
+
+    def open_book(self, farm):
+        """
+        A ledger key for a new game of farm ("farm#N", one more than the last game of farm in this file).
+        Earlier games keep their entries; balances and P&L are per key.
+        """
+        self.flush()
+        prefix = farm + "#"
+        keys = {key for (key,) in self.conn.execute("SELECT DISTINCT farm FROM totals")} | set(self._balances)
+        games = [int(key[len(prefix):]) for key in keys if key.startswith(prefix) and key[len(prefix):].isdigit()]
+        book = f"{prefix}{max(games, default=0) + 1}"
+        self._balances[book] = 0.0
+        return book
+
+    def append(self, farm, ts, category, amount, ref=None, crop=None):
+        """Appends one entry and returns the farm's running balance after it."""
+        balance = self._balances.get(farm, 0.0) + amount
+        self._balances[farm] = balance
+        self._pending.append((farm, ts, category, ref, crop, amount, balance))
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+        return balance
+
+    def flush(self):
+        if not self._pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO entries (farm, ts, category, ref, crop, amount, balance) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._pending,
+            )
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def compact(self, before, period="month"):
+        """
+        Rolls every entry before ts `before` into one row per (farm, month or year, category, crop) and returns
+        how many rows were removed. Totals and current balances are unchanged; balance_at() is exact at period
+        ends only (a summary row is dated at the last entry it replaces).
+        """
+        width = {"month": 7, "year": 4}[period]
+        self.flush()
+        with self.conn:
+            groups = self.conn.execute(
+                f"SELECT farm, substr(ts, 1, {width}) AS period, category, crop, SUM(amount), "
+                "SUM(count) FROM entries "
+                "WHERE ts < ? GROUP BY farm, period, category, crop",
+                (before,),
+            ).fetchall()
+            if not groups or len(groups) == self.conn.execute(
+                    "SELECT COUNT(*) FROM entries WHERE ts < ?", (before,)).fetchone()[0]:
+                return 0  # 没有可以合并的记录
+            # 每个 (农场, 时段) 按时间的最后一条记录：汇总行使用它的时间和余额
+            period_end = {}
+            for farm, key, ts, balance in self.conn.execute(
+                f"SELECT farm, substr(ts, 1, {width}), ts, balance FROM entries WHERE ts < ? ORDER BY ts, id",
+                (before,),
+            ):
+                period_end[(farm, key)] = (ts, balance)
+            totals = self.conn.execute("SELECT * FROM totals").fetchall()
+            removed = self.conn.execute("DELETE FROM entries WHERE ts < ?", (before,)).rowcount
+            rows = []
+            for farm, period, category, crop, amount, count in groups:
+                ts, balance = period_end[(farm, period)]
+                rows.append((farm, ts, category, f"汇总{count}笔", crop, amount, balance, count))
+            self.conn.executemany(
+                "INSERT INTO entries (farm, ts, category, ref, crop, amount, balance, count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            # 插入触发器会把汇总行再算一遍，恢复原来的分类汇总
+            self.conn.execute("DELETE FROM totals")
+            self.conn.executemany("INSERT INTO totals VALUES (?, ?, ?, ?, ?)", totals)
+        return removed - len(rows)
+
+    # --- 查询 ---
+
+    def balance(self, farm):
+        return self._balances.get(farm, 0.0)
+
+    def balance_at(self, farm, ts):
+        """Balance after the last entry at or before ts (timestamps are 'YYYY-MM-DD HH:MM')."""
+        self.flush()
+        row = self.conn.execute(
+            "SELECT balance FROM entries WHERE farm = ? AND ts <= ? ORDER BY ts DESC, id DESC LIMIT 1",
+            (farm, ts),
+        ).fetchone()
+        return row[0] if row else 0.0
+
+    def pnl_by_category(self, farm, since=None, until=None):
+        """{类别: (金额合计, 笔数)}。不限时间时直接读汇总表。"""
+        self.flush()
+        if since is None and until is None:
+            rows = self.conn.execute(
+                "SELECT category, SUM(amount), SUM(count) FROM totals WHERE farm = ? GROUP BY category", (farm,)
+            )
+        else:
+            rows = self.conn.execute(
+                "SELECT category, SUM(amount), SUM(count) FROM entries WHERE farm = ? AND ts >= ? AND ts <= ? "
+                "GROUP BY category",
+                (farm, since or "", until or "9999-12-31 23:59"),
+            )
+        return {category: (amount, count) for category, amount, count in rows}
+
+    def pnl_by_crop(self, farm):
+        """{作物: {类别: 金额}}，只包含和作物相关的记录（播种、田间操作、销售）。"""
+        self.flush()
+        result = {}
+        for category, crop, amount in self.conn.execute(
+            "SELECT category, crop, amount FROM totals WHERE farm = ? AND crop != ''", (farm,)
+        ):
+            result.setdefault(crop, {})[category] = amount
+        return result
+
+    def recent(self, farm, limit=20):
+        """Most recent entries, newest first: [(ts, category, ref, crop, amount, balance), ...]."""
+        self.flush()
+        return self.conn.execute(
+            "SELECT ts, category, ref, crop, amount, balance FROM entries WHERE farm = ? ORDER BY id DESC LIMIT ?",
+            (farm, limit),
+        ).fetchall()
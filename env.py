@@ -0,0 +1,389 @@
+# env.py
+# 强化学习环境：Gym / Gymnasium 风格的 reset() / step() 接口，建立在 Simulation 之上，不依赖 Tk。
+#
+# 每一步先执行一个动作，再推进 step_hours 小时 (默认 1 小时，与界面的时间步一致)。
+#   观测：定长 float32 数组 (array('f'))，依次为全局量 (资金、负债、信用分、时间、天气、库存)、
+#         每种作物的市场价格 (相对基础价)、max_fields 个田地槽位 (没有的田地全为 0)。各量大致缩放到 0~1。
+#   动作：Discrete(n)，与界面按钮一一对应：等待、对每块田地浇水 / 喷药 / 收获 / 施 N/P/K / 清理 /
+#         播种每种作物，一键出售、出售不新鲜的批次、买田地、借款。action_names() 给出每个编号的含义。
+#   奖励：这一步净资产 (资金 - 负债 + 库存估值) 的变化，单位元；无效动作另扣 invalid_penalty。
+#   结束：没有资金、库存和在田作物视为破产 (terminated)；经过 max_days 天截断 (truncated)。
+# 所有动作都经过 Simulation.act，与服务器请求和操作回放是同一条路径。
+#
+# VectorEnv 把 num_envs 个农场放在同一个 Simulation 里，天气每小时只算一次，所有农场一起推进
+# (与服务器里的多个玩家一样共享天气和市场)。观测是一个 num_envs × obs_size 的扁平 float32 数组，
+# 可以直接 numpy.frombuffer(obs, dtype="float32").reshape(num_envs, -1)。某个农场结束时立即
+# 换成一个新农场 (自动重置)，结束前的观测放在 info["final_observation"]。
+# SubprocVectorEnv 把农场分给多个子进程，每个子进程运行一个 VectorEnv，接口相同。
+
+import random
+from array import array
+from multiprocessing import Pipe, Process
+
+from farm import is_growing
+from simulation import Simulation
+from valuation import STALE_FRESHNESS
+
+FIELD_ACTIONS = ("water", "pesticide", "harvest", "fertilize_N", "fertilize_P", "fertilize_K", "clear")
+FARM_ACTIONS = ("sell_all", "sell_stale", "buy_field", "borrow")
+BORROW_AMOUNT = 1000
+GLOBAL_FEATURES = 12
+FIELD_FEATURES = 13
+
+
+class Discrete:
+    """Gym-compatible discrete space {0, ..., n-1}."""
+
+    def __init__(self, n):
+        self.n = n
+        self.shape = ()
+        self.dtype = "int64"
+
+    def sample(self, rng=random):
+        return rng.randrange(self.n)
+
+    def contains(self, x):
+        return isinstance(x, int) and 0 <= x < self.n
+
+    def __repr__(self):
+        return f"Discrete({self.n})"
+
+
+class Box:
+    """Gym-compatible box space of float32 values."""
+
+    def __init__(self, low, high, shape):
+        self.low = low
+        self.high = high
+        self.shape = shape
+        self.dtype = "float32"
+
+    def sample(self, rng=random):
+        return array("f", (rng.uniform(self.low, self.high) for _ in range(self.shape[0])))
+
+    def contains(self, x):
+        return len(x) == self.shape[0]
+
+    def __repr__(self):
+        return f"Box({self.low}, {self.high}, {self.shape})"
+
+
+def action_table(crop_names, max_fields):
+    """[(action, args), ...] indexed by the discrete action id."""
+    table = [("wait", {})]
+    for field in range(max_fields):
+        for name in FIELD_ACTIONS:
+            action, _sep, nutrient = name.partition("_")
+            table.append((action, {"field": field, "nutrient": nutrient} if nutrient else {"field": field}))
+        for crop in crop_names:
+            table.append(("plant", {"field": field, "crop": crop}))
+    table.extend((name, {}) for name in FARM_ACTIONS)
+    return table
+
+
+def net_worth(farm, market):
+    return farm.funds - farm.loan_manager.total_debt + farm.storage.valuation.total(market)
+
+
+def is_bankrupt(farm):
+    return (farm.funds <= 0 and not farm.storage.stock
+            and not any(is_growing(field) for field in farm.fields))
+
+
+class VectorEnv:
+    """num_envs farms stepped in lockstep in one Simulation (see the module header)."""
+
+    def __init__(self, num_envs, funds=10000, num_fields=2, max_fields=4, step_hours=1, max_days=365,
+                 invalid_penalty=0.0, seed=None, autoreset=True, **sim_kwargs):
+        self.num_envs = num_envs
+        self.funds = funds
+        self.num_fields = num_fields
+        self.max_fields = max_fields
+        self.step_hours = step_hours
+        self.max_hours = max_days * 24
+        self.invalid_penalty = invalid_penalty
+        self.autoreset = autoreset
+        self.sim_kwargs = sim_kwargs
+        self.sim = None
+        self._build(seed)
+
+        self.crop_names = sorted(self.sim.crop_data)
+        self._crop_index = {name: (i + 1) / len(self.crop_names) for i, name in enumerate(self.crop_names)}
+        self.actions = action_table(self.crop_names, max_fields)
+        self.obs_size = GLOBAL_FEATURES + len(self.sim.market.products) + FIELD_FEATURES * max_fields
+        self.single_action_space = Discrete(len(self.actions))
+        self.single_observation_space = Box(-10.0, 10.0, (self.obs_size,))
+        self.observation_space = Box(-10.0, 10.0, (num_envs * self.obs_size,))
+
+    def _build(self, seed):
+        self.sim = Simulation(seed=seed, **self.sim_kwargs)
+        self.farm_ids = [f"env{i}" for i in range(self.num_envs)]
+        self._start = [0] * self.num_envs
+        self._worth = [0.0] * self.num_envs
+        for i, farm_id in enumerate(self.farm_ids):
+            self._new_farm(i, farm_id)
+
+    def _new_farm(self, i, farm_id):
+        sim = self.sim
+        location = None
+        if farm_id in sim.farms:
+            location = getattr(sim.farm_weather[farm_id], "index", None)
+            del sim.farms[farm_id]
+            del sim.farm_weather[farm_id]
+        farm = sim.add_farm(farm_id, funds=self.funds, num_fields=self.num_fields, location=location)
+        self._start[i] = sim.hours
+        self._worth[i] = net_worth(farm, sim.market)
+        return farm
+
+    def action_names(self):
+        """Human-readable meaning of every action id."""
+        names = []
+        for action, args in self.actions:
+            if "field" in args:
+                detail = args.get("crop") or args.get("nutrient") or ""
+                names.append(f"{action} {detail} 田地{args['field'] + 1}".replace("  ", " "))
+            else:
+                names.append(action)
+        return names
+
+    def action_mask(self, i):
+        """1 for the actions that are currently valid for env i (funds are not checked)."""
+        farm = self.sim.farms[self.farm_ids[i]]
+        mask = bytearray(len(self.actions))
+        for a, (action, args) in enumerate(self.actions):
+            if "field" not in args:
+                mask[a] = action != "sell_stale" or any(lot["freshness"] < STALE_FRESHNESS for lot in farm.storage.stock)
+                continue
+            if args["field"] >= len(farm.fields):
+                continue
+            field = farm.fields[args["field"]]
+            if action in ("water", "pesticide"):
+                mask[a] = is_growing(field)
+            elif action == "harvest":
+                mask[a] = bool(field.crop and field.crop.matured and not field.crop.dead and not field.crop.harvested)
+            elif action == "fertilize":
+                mask[a] = 1
+            elif action == "clear":
+                mask[a] = bool(field.crop and (field.crop.dead or field.crop.harvested))
+            else:
+                mask[a] = field.crop is None
+        return mask
+
+    # --- Gym 接口 ---
+
+    def reset(self, seed=None):
+        """Rebuilds the world with fresh farms. Returns (observations, infos)."""
+        self._build(seed)
+        return self._observe(), [{} for _ in range(self.num_envs)]
+
+    def step(self, actions):
+        """
+        Applies one action per env, advances step_hours and returns
+        (observations, rewards, terminated, truncated, infos).
+        """
+        sim = self.sim
+        infos = []
+        for farm_id, a in zip(self.farm_ids, actions):
+            ok, message = self._apply(sim.farms[farm_id], a)
+            infos.append({"ok": ok, "message": message})
+        sim.tick(self.step_hours)
+
+        rewards = array("d", bytes(8 * self.num_envs))
+        terminated = [False] * self.num_envs
+        truncated = [False] * self.num_envs
+        finished = []
+        for i, farm_id in enumerate(self.farm_ids):
+            farm = sim.farms[farm_id]
+            worth = net_worth(farm, sim.market)
+            rewards[i] = worth - self._worth[i] - (0.0 if infos[i]["ok"] else self.invalid_penalty)
+            self._worth[i] = worth
+            terminated[i] = is_bankrupt(farm)
+            truncated[i] = not terminated[i] and sim.hours - self._start[i] >= self.max_hours
+            if terminated[i] or truncated[i]:
+                finished.append(i)
+        observations = self._observe()
+        if self.autoreset:
+            for i in finished:
+                infos[i]["final_observation"] = observations[i * self.obs_size:(i + 1) * self.obs_size]
+                self._new_farm(i, self.farm_ids[i])
+            if finished:
+                observations = self._observe()
+        return observations, rewards, terminated, truncated, infos
+
+    def _apply(self, farm, a):
+        action, args = self.actions[a]
+        if action == "wait":
+            return True, ""
+        if "field" in args and args["field"] >= len(farm.fields):
+            return False, f"田地 {args['field'] + 1} 不存在。"
+        if action == "sell_stale":
+            lots = [i for i, lot in enumerate(farm.storage.stock) if lot["freshness"] < STALE_FRESHNESS]
+            if not lots:
+                return False, "没有不新鲜的批次。"
+            action, args = "sell", {"lots": lots}
+        elif action == "borrow":
+            args = {"amount": BORROW_AMOUNT}
+        return self.sim.act(farm, action, args)
+
+    def _observe(self):
+        sim = self.sim
+        weather_by_farm = sim.farm_weather
+        time = sim.weather.time
+        clock = (time.hour / 24, sim.day_of_year / 365)
+        prices = [p.price / p.base_price for p in sim.market.products]
+        empty = [0.0] * FIELD_FEATURES
+        values = []
+        for farm_id in self.farm_ids:
+            farm = sim.farms[farm_id]
+            weather = weather_by_farm[farm_id]
+            storage = farm.storage
+            loans = farm.loan_manager
+            values += (
+                farm.funds / 10000, loans.total_debt / 10000, loans.credit_score / 100, *clock,
+                (weather.current_temperature or 0.0) / 40, (weather.current_rainfall or 0.0) / 10,
+                (weather.current_sunlight or 0.0) / 10,
+                sum(lot["yield"] for lot in storage.stock) / 1000, storage.valuation.total(sim.market) / 10000,
+                len(storage.stock) / 10, len(farm.fields) / self.max_fields,
+            )
+            values += prices
+            for field in farm.fields[:self.max_fields]:
+                crop = field.crop
+                npk = field.soil_npk
+                if crop is None:
+                    values += (1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, npk["N"] / 100, npk["P"] / 100, npk["K"] / 100)
+                else:
+                    values += (
+                        1.0, self._crop_index[crop.crop_data.name], min(1.5, crop.growth_points / crop.crop_data.grow_days),
+                        crop.water_level / 100, crop.health / 100, crop.sun_stress / 100,
+                        float(crop.matured), float(crop.dead or crop.harvested), crop.infection,
+                        crop.pesticide_effect_hours / 48, npk["N"] / 100, npk["P"] / 100, npk["K"] / 100,
+                    )
+            for _ in range(self.max_fields - len(farm.fields)):
+                values += empty
+        return array("f", values)
+
+    def close(self):
+        pass
+
+
+class FarmEnv:
+    """Single-farm environment: reset() -> (obs, info), step(a) -> (obs, reward, terminated, truncated, info)."""
+
+    def __init__(self, **kwargs):
+        self._vec = VectorEnv(1, autoreset=False, **kwargs)
+        self.action_space = self._vec.single_action_space
+        self.observation_space = self._vec.single_observation_space
+
+    @property
+    def sim(self):
+        return self._vec.sim
+
+    @property
+    def farm(self):
+        return self._vec.sim.farms[self._vec.farm_ids[0]]
+
+    def action_names(self):
+        return self._vec.action_names()
+
+    def action_mask(self):
+        return self._vec.action_mask(0)
+
+    def reset(self, seed=None):
+        observations, infos = self._vec.reset(seed)
+        return observations, infos[0]
+
+    def step(self, action):
+        observations, rewards, terminated, truncated, infos = self._vec.step([action])
+        return observations, rewards[0], terminated[0], truncated[0], infos[0]
+
+    def close(self):
+        pass
+
+
+def _worker(conn, num_envs, seed, kwargs):
+    if seed is None:
+        random.seed()  # fork 出的子进程继承了同一个随机状态
+    env = VectorEnv(num_envs, seed=seed, **kwargs)
+    while True:
+        command, data = conn.recv()
+        if command == "step":
+            observations, rewards, terminated, truncated, infos = env.step(data)
+            conn.send((observations.tobytes(), rewards.tobytes(), terminated, truncated, infos))
+        elif command == "reset":
+            observations, infos = env.reset(data)
+            conn.send((observations.tobytes(), infos))
+        elif command == "close":
+            conn.close()
+            return
+
+
+class SubprocVectorEnv:
+    """
+    num_envs farms split over `workers` subprocesses, each running a VectorEnv of its share.
+    Same interface as VectorEnv; worker k is seeded with seed + k (a separate world per worker).
+    """
+
+    def __init__(self, num_envs, workers=2, seed=None, **kwargs):
+        workers = max(1, min(workers, num_envs))
+        counts = [num_envs // workers + (k < num_envs % workers) for k in range(workers)]
+        self.num_envs = num_envs
+        self.counts = counts
+        self.seed = seed
+        self._local = VectorEnv(1, **kwargs)  # 只用来读取空间和动作表
+        self.obs_size = self._local.obs_size
+        self.actions = self._local.actions
+        self.single_action_space = self._local.single_action_space
+        self.single_observation_space = self._local.single_observation_space
+        self.observation_space = Box(-10.0, 10.0, (num_envs * self.obs_size,))
+        self._conns = []
+        self._processes = []
+        for k, count in enumerate(counts):
+            parent, child = Pipe()
+            process = Process(target=_worker, args=(child, count, None if seed is None else seed + k, kwargs), daemon=True)
+            process.start()
+            child.close()
+            self._conns.append(parent)
+            self._processes.append(process)
+
+    def action_names(self):
+        return self._local.action_names()
+
+    def reset(self, seed=None):
+        for k, conn in enumerate(self._conns):
+            conn.send(("reset", None if seed is None else seed + k))
+        observations = array("f")
+        infos = []
+        for conn in self._conns:
+            raw, worker_infos = conn.recv()
+            observations.frombytes(raw)
+            infos += worker_infos
+        return observations, infos
+
+    def step(self, actions):
+        actions = list(actions)
+        start = 0
+        for conn, count in zip(self._conns, self.counts):
+            conn.send(("step", actions[start:start + count]))
+            start += count
+        observations, rewards = array("f"), array("d")
+        terminated, truncated, infos = [], [], []
+        for conn in self._conns:
+            raw_obs, raw_rewards, worker_terminated, worker_truncated, worker_infos = conn.recv()
+            observations.frombytes(raw_obs)
+            rewards.frombytes(raw_rewards)
+            terminated += worker_terminated
+            truncated += worker_truncated
+            infos += worker_infos
+        return observations, rewards, terminated, truncated, infos
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(("close", None))
+                conn.close()
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+        self._conns = []
+        self._processes = []
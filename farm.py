@@ -0,0 +1,418 @@
+# farm.py
+# 田地批量操作：按条件筛选田地，并把一个操作作为一次事务应用到所有选中的田地上。
+
+ACTION_COSTS = {"water": 10, "pesticide": 120, "fertilize": 50, "harvest": 0}
+ACTION_NAMES = {"water": "浇水", "pesticide": "喷药", "fertilize": "施肥", "harvest": "收获"}
+NUTRIENTS = ("N", "P", "K")
+
+
+def is_growing(field):
+    crop = field.crop
+    return crop is not None and not crop.dead and not crop.harvested
+
+
+def is_harvestable(field):
+    return is_growing(field) and field.crop.matured
+
+
+def water_below(threshold):
+    return lambda field: is_growing(field) and field.crop.water_level < threshold
+
+
+def has_damage(reason):
+    return lambda field: is_growing(field) and reason in field.crop.damage_reasons
+
+
+# 界面与自动化使用的命名筛选条件
+FIELD_SELECTORS = {
+    "全部田地": lambda field: True,
+    "生长中": is_growing,
+    "已成熟": is_harvestable,
+    "缺水 (水分<40)": water_below(40),
+    "病害": has_damage("病害"),
+    "受损": lambda field: is_growing(field) and bool(field.crop.damage_reasons),
+}
+
+# 每种操作对田地的最低要求；不满足的田地在事务中被跳过
+ACTION_REQUIREMENTS = {
+    "water": is_growing,
+    "pesticide": is_growing,
+    "fertilize": lambda field: True,
+    "harvest": is_harvestable,
+}
+
+
+def select_fields(fields, predicate):
+    """Returns the indices of the fields matching predicate."""
+    return [i for i, field in enumerate(fields) if predicate(field)]
+
+
+class BulkResult:
+    def __init__(self, action, applied=None, skipped=None, cost=0.0, harvests=None, error=None):
+        self.action = action
+        self.applied = applied or []    # 成功执行的田地下标
+        self.skipped = skipped or []    # 不满足条件被跳过的田地下标
+        self.cost = cost
+        self.harvests = harvests or []  # 收获得到的作物信息 (与 CropInstance.harvest 返回值相同)
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def summary(self, nutrient_type=None):
+        """One combined log line for the whole batch."""
+        if self.error:
+            return self.error
+        action_cn = ACTION_NAMES.get(self.action, self.action)
+        if self.action == "fertilize" and nutrient_type:
+            action_cn = f"施{nutrient_type}肥"
+        fields_str = ", ".join(str(i + 1) for i in self.applied)
+        msg = f"批量{action_cn}: 田地 {fields_str}，共 {len(self.applied)} 块，花费 ￥{self.cost:.2f}"
+        if self.harvests:
+            total = sum(h["yield"] for h in self.harvests)
+            msg += f"，共收获 {total:.1f}kg"
+        if self.skipped:
+            msg += f"（跳过 {len(self.skipped)} 块不符合条件的田地）"
+        return msg
+
+
+def apply_bulk_action(fields, indices, action, funds, storage=None, nutrient_type=None):
+    """
+    对选中的田地执行同一个操作。
+    - 总费用一次性计算，资金不足时不执行任何操作。
+    - 不满足操作条件的田地被跳过并记录在结果中。
+    - 调用者负责扣除 result.cost 并刷新界面。
+    """
+    if action not in ACTION_COSTS:
+        return BulkResult(action, error=f"未知操作 '{action}'。")
+    if action == "harvest" and storage is None:
+        return BulkResult(action, error="收获需要仓库。")
+    if action == "fertilize" and nutrient_type not in NUTRIENTS:
+        return BulkResult(action, error="无效的肥料类型。")
+
+    requirement = ACTION_REQUIREMENTS[action]
+    applied = [i for i in indices if requirement(fields[i])]
+    skipped = [i for i in indices if i not in applied]
+    if not applied:
+        return BulkResult(action, skipped=skipped, error="没有符合条件的田地。")
+
+    cost = ACTION_COSTS[action] * len(applied)
+    if funds < cost:
+        action_cn = ACTION_NAMES[action]
+        return BulkResult(action, skipped=skipped, cost=cost,
+                          error=f"资金不足! 批量{action_cn} {len(applied)} 块田地需要 ￥{cost:.2f}")
+
+    harvests = []
+    for i in applied:
+        field = fields[i]
+        if action == "fertilize":
+            field.apply_fertilizer(nutrient_type)
+        elif action == "harvest":
+            result = field.crop.harvest()
+            result["lot_id"] = storage.add_crop(result)
+            field.clear_field()
+            harvests.append(result)
+        else:
+            field.crop.apply_manual_action(action)
+
+    return BulkResult(action, applied=applied, skipped=skipped, cost=cost, harvests=harvests)
+
+
+class Farm:
+    """
+    一个农场的全部经营状态（田地、仓库、贷款、资金、自动化规则），不依赖 Tk。
+    天气与市场属于外部世界，由调用者传入，因此多个农场可以共享同一个天气和市场。
+    所有资金变动都经过 transact()，有账本 (economy.Ledger) 时会同时记账。
+    有事件总线 (telemetry.EventBus) 时，资金变动和作物生命周期会作为结构化事件发布。
+    """
+    FIELD_BASE_PRICE = 2000
+    MAX_FIELDS = 500
+
+    def __init__(self, funds=10000, num_fields=2, farm_id=None, log=None, ledger=None, start_time=None, events=None,
+                 soil_grid=None):
+        from storage import Storage
+        from loan import LoanManager
+        from automation import AutomationEngine
+
+        self.farm_id = farm_id
+        self.funds = 0
+        self.soil_grid = tuple(soil_grid) if soil_grid else None  # (行, 列)：每块田地的土壤网格，见 soil.py
+        self.fields = [self._new_field() for _ in range(num_fields)]
+        self.storage = Storage()
+        self.loan_manager = LoanManager()
+        self.automation = AutomationEngine()
+        self.log = log or (lambda msg, level="info": None)
+        self.ledger = ledger
+        self.ledger_key = farm_id or "main"
+        self.events = events
+        self.recorder = None  # recorder(时间, 农场, 操作, 参数)：记录玩家操作，见 action_log.ActionLog
+        self.harvest_listeners = []  # listener(收获信息)：每次收获后调用，见 strategy.StrategyHost
+        self.now = start_time.strftime("%Y-%m-%d %H:%M") if start_time else ""
+        self.book_key = self.ledger_key  # 本局游戏在账本里的键，见 open_book()
+        self.open_book()
+        self.set_funds(funds)
+
+    def transact(self, category, amount, ref=None, crop=None):
+        """Applies one change to funds and records it in the ledger (if any)."""
+        self.funds += amount
+        if self.ledger is not None and amount:
+            self.ledger.append(self.book_key, self.now, category, amount, ref, crop)
+        if amount:
+            self.emit("transaction", category=category, amount=amount, ref=ref, crop=crop, balance=self.funds)
+
+    def emit(self, kind, **data):
+        """Publishes a structured event for this farm (no-op without an event bus)."""
+        if self.events is not None:
+            self.events.publish(kind, self.now, self.ledger_key, **data)
+
+    def _record(self, action, /, **args):
+        if self.recorder is not None:
+            self.recorder(self.now, self.ledger_key, action, args)
+
+    def _emit_harvest(self, idx, result):
+        for listener in self.harvest_listeners:
+            listener({"field": idx, "crop": result["name"], "yield": result["yield"],
+                      "quality_tags": tuple(result["quality_tags"]), "lot_id": result["lot_id"]})
+        self.emit("harvest", field=idx + 1, crop=result["name"], quality_tags=list(result["quality_tags"]),
+                  lot_id=result["lot_id"], **{"yield": result["yield"]})
+
+    def set_funds(self, funds):
+        """Sets funds directly (new game / loaded save) and books the difference as an opening entry."""
+        self.transact("opening", funds - self.funds)
+
+    # --- 玩家操作 ---
+
+    def open_book(self):
+        """
+        Starts a new ledger book (new game or before loading a save) and sets funds to 0, so the next
+        set_funds() books the whole opening balance there. Earlier games keep their own books.
+        """
+        self.funds = 0
+        if self.ledger is not None:
+            self.book_key = self.ledger.open_book(self.ledger_key)
+
+    def get_next_field_price(self):
+        # 每多一块田地价格上涨 50% 的基础价（线性增长，几百块田地时仍可负担）
+        return self.FIELD_BASE_PRICE * (1 + 0.5 * (len(self.fields) - 1))
+
+    def _new_field(self):
+        from crops import Field
+        field = Field()
+        if self.soil_grid:
+            field.enable_grid(*self.soil_grid)
+        return field
+
+    def buy_field(self):
+        self._record("buy_field")
+        if len(self.fields) >= self.MAX_FIELDS:
+            return False, f"最多只能拥有 {self.MAX_FIELDS} 块田地。"
+        price = self.get_next_field_price()
+        if self.funds < price:
+            return False, f"购买新田地需要 ￥{price:.2f}"
+        self.transact("field", -price, ref=f"田地{len(self.fields) + 1}")
+        self.fields.append(self._new_field())
+        return True, f"成功购买了一块新田地，花费 ￥{price:.2f}"
+
+    def plant(self, idx, crop_data, planted_day):
+        self._record("plant", field=idx, crop=crop_data.name, day=planted_day)
+        cost = crop_data.cost_per_mu
+        if self.funds < cost:
+            return False, f"播种 {crop_data.name} 需要 ￥{cost:.2f}"
+        if not self.fields[idx].plant_crop(crop_data, planted_day):
+            return False, "这块田地已经种上作物了。"
+        self.transact("seed", -cost, ref=f"田地{idx+1}", crop=crop_data.name)
+        return True, f"在田地 {idx+1} 成功播种 {crop_data.name}, 花费 ￥{cost:.2f}"
+
+    def apply_action(self, idx, action):
+        """浇水 / 喷药一块田地。"""
+        self._record(action, field=idx)
+        if not is_growing(self.fields[idx]):
+            return False, "无效操作: 作物不存在或已处理。"
+        cost = ACTION_COSTS.get(action, 0)
+        action_cn = ACTION_NAMES.get(action, action)
+        if self.funds < cost:
+            return False, f"资金不足! 操作 '{action_cn}' 需要 ￥{cost:.2f}"
+        crop = self.fields[idx].crop
+        self.transact(action, -cost, ref=f"田地{idx+1}", crop=crop.crop_data.name)
+        crop.apply_manual_action(action)
+        return True, f"在田地 {idx+1} 上执行了 '{action_cn}' 操作, 花费 ￥{cost:.2f}"
+
+    def fertilize(self, idx, nutrient_type, cell=None):
+        """cell=(行, 列) 定点施肥到土壤网格的一个格子 (需要 soil_grid)。"""
+        if nutrient_type not in NUTRIENTS:
+            return False, "无效的肥料类型。"
+        if cell is None:
+            self._record("fertilize", field=idx, nutrient=nutrient_type)
+        else:
+            cell = tuple(cell)
+            self._record("fertilize", field=idx, nutrient=nutrient_type, cell=list(cell))
+        cost = ACTION_COSTS["fertilize"]
+        if self.funds < cost:
+            return False, f"施肥需要 ￥{cost:.2f}"
+        field = self.fields[idx]
+        if cell is not None:
+            if field.grid is None:
+                return False, f"田地 {idx+1} 没有土壤网格，不能定点施肥。"
+            if not (0 <= cell[0] < field.grid.rows and 0 <= cell[1] < field.grid.cols):
+                return False, f"格子 {cell} 超出 {field.grid.rows}×{field.grid.cols} 网格。"
+        self.transact("fertilize", -cost, ref=f"田地{idx+1}", crop=field.crop.crop_data.name if field.crop else None)
+        message = field.apply_fertilizer(nutrient_type, cell=cell)
+        return True, f"在田地 {idx+1} {message} 花费 ￥{cost:.2f}"
+
+    def harvest(self, idx):
+        self._record("harvest", field=idx)
+        field = self.fields[idx]
+        result = field.crop.harvest() if field.crop else None
+        if not result:
+            return None, "无法收获: 作物未成熟, 或已死亡/收获。"
+        result["lot_id"] = self.storage.add_crop(result)
+        field.clear_field()
+        self._emit_harvest(idx, result)
+        tags = f" (品质: {', '.join(result['quality_tags'])})" if result['quality_tags'] else ""
+        return result, f"🎉 成功收获 {result['name']}! 产量: {result['yield']}kg{tags}"
+
+    def clear_field(self, idx):
+        """清理已死亡或已收获的作物。"""
+        self._record("clear", field=idx)
+        crop = self.fields[idx].crop
+        if crop is None or not (crop.dead or crop.harvested):
+            return False, "只能清理已死亡或已收获的作物。"
+        self.fields[idx].clear_field()
+        return True, f"田地 {idx+1} 已被清理。"
+
+    def bulk_action(self, indices, action, nutrient_type=None):
+        self._record("bulk", fields=list(indices), action=action, nutrient=nutrient_type)
+        crops = {i: self.fields[i].crop.crop_data.name for i in indices if self.fields[i].crop}
+        result = apply_bulk_action(self.fields, indices, action, self.funds,
+                                   storage=self.storage, nutrient_type=nutrient_type)
+        if result.ok:
+            self._book_bulk(result, crops)
+            for idx, harvest in zip(result.applied, result.harvests):
+                self._emit_harvest(idx, harvest)
+        return result
+
+    def _book_bulk(self, result, crops):
+        """Books a bulk action's cost per field, so per-crop P&L stays exact."""
+        unit_cost = ACTION_COSTS[result.action]
+        for i in result.applied:
+            self.transact(result.action, -unit_cost, ref=f"田地{i+1}", crop=crops.get(i))
+
+    def sell_lot(self, idx, market):
+        name, value, _lot_id = self.sell_lots([idx], market)[0]
+        return name, value
+
+    def sell_lots(self, indices, market):
+        """Sells several lots in one batched market match and credits the revenue (ValueError on a bad index)."""
+        indices = self.storage.lot_indices(indices)
+        self._record("sell", lots=indices)
+        results = self.storage.sell_lots(indices, market)
+        for name, value, lot_id in results:
+            self.transact("sale", value, ref=f"批次{lot_id}", crop=name)
+            self.emit("sale", lot_id=lot_id, crop=name, value=value)
+        return results
+
+    def move_lot(self, idx, tier):
+        """Moves lot idx to another warehouse tier (e.g. 冷藏). Returns (ok, message)."""
+        self._record("store", lot=idx, tier=tier)
+        return self.storage.move_lot(idx, tier)
+
+    def sell_all(self, market):
+        results = self.sell_lots(range(len(self.storage.stock)), market)
+        return len(results), sum(value for _name, value, _lot_id in results)
+
+    def borrow(self, amount):
+        self._record("borrow", amount=amount)
+        success, message = self.loan_manager.borrow_money(amount)
+        if success:
+            self.transact("loan", amount)
+        return success, message
+
+    def repay_loan(self):
+        status, amount_paid, message = self.loan_manager.handle_repayment(self.funds)
+        self.settle_repayment(status, amount_paid)
+        return status, message
+
+    def settle_repayment(self, status, amount_paid):
+        """Books the outcome of a repayment day (see LoanManager.handle_repayment / loan.settle_due)."""
+        if status == "paid_full" or status == "paid_partial":
+            self.transact("repayment", -amount_paid)
+        self.emit("repayment", status=status, amount=amount_paid,
+                  debt=self.loan_manager.total_debt, credit_score=self.loan_manager.credit_score)
+
+    def configure_automation(self, rules, enabled):
+        """Replaces the automation rules (RuleError keeps the old ones) and turns automation on or off."""
+        self.automation.set_rules(rules)
+        self.automation.enabled = enabled
+        self._record("automation", rules=self.automation.rule_texts, enabled=enabled)
+
+    # --- 时间推进 ---
+
+    def start_new_day(self, weather=None):
+        if weather is not None and self.soil_grid:
+            from soil import update_fields
+            update_fields(self.fields, weather)
+        fee = self.storage.update_all()
+        if fee > 0:
+            self.transact("storage", -fee)
+            self.log(f"📦 支付了仓储费 ￥{fee:.2f}", "info")
+
+    def update_hour(self, weather, market):
+        """Advances every crop by one hour and runs automation. Returns this hour's log lines."""
+        self.now = weather.time.strftime("%Y-%m-%d %H:%M")
+        return self._advance(lambda crop: crop.update_hourly(weather), weather, market)
+
+    def advance_day(self, weather, market):
+        """
+        Advances every crop by a whole day with the memoized growth tables (growth_table.py),
+        then runs automation once. Approximate; used by Simulation.run_days(days, fast=True).
+        """
+        from growth_table import table_for
+        self.now = weather.time.strftime("%Y-%m-%d %H:%M")
+        return self._advance(lambda crop: table_for(crop.crop_data).advance_day(crop, weather), weather, market)
+
+    def _advance(self, step, weather, market):
+        log_messages = []
+        for i, field in enumerate(self.fields):
+            if field.crop and not field.crop.dead and not field.crop.harvested:
+                old_reasons = set(field.crop.damage_reasons)
+                
+                step(field.crop)
+                
+                new_reasons = set(field.crop.damage_reasons)
+                newly_added_reasons = new_reasons - old_reasons
+                if newly_added_reasons:
+                    log_messages.append(f"田地{i+1} ({field.crop.crop_data.name}) 出现问题: {', '.join(newly_added_reasons)}")
+                    self.emit("damage", field=i + 1, crop=field.crop.crop_data.name, reasons=sorted(newly_added_reasons))
+
+                if field.crop.dead:
+                    self.log(f"田地{i+1} ({field.crop.crop_data.name}) 已经死亡。原因: {', '.join(field.crop.damage_reasons)}", "warn")
+                    self.emit("died", field=i + 1, crop=field.crop.crop_data.name, reasons=sorted(field.crop.damage_reasons))
+                elif field.crop.matured and not old_reasons and field.crop.growth_points >= field.crop.crop_data.grow_days:
+                     self.log(f"田地{i+1} ({field.crop.crop_data.name}) 已经成熟，可以收获了！", "info")
+                     self.emit("matured", field=i + 1, crop=field.crop.crop_data.name)
+
+        automation_result = self.automation.run(self.fields, self.storage, market, self.funds, weather.time)
+        if automation_result.actions:
+            for category, amount, ref, crop in automation_result.entries:
+                self.transact(category, amount, ref, crop)
+            for idx, harvest in automation_result.harvests:
+                self._emit_harvest(idx, harvest)
+            for name, value, lot_id in automation_result.sales:
+                self.emit("sale", lot_id=lot_id, crop=name, value=value)
+            log_messages.extend(automation_result.messages)
+        return log_messages
+
+    def status(self):
+        """Compact, JSON-friendly summary of the farm."""
+        return {
+            "farm_id": self.farm_id,
+            "funds": round(self.funds, 2),
+            "debt": round(self.loan_manager.total_debt, 2),
+            "credit_score": self.loan_manager.credit_score,
+            "fields": [field.status() for field in self.fields],
+            "storage": [
+                {"name": lot["name"], "yield": lot["yield"], "freshness": round(lot["freshness"], 1), "tier": lot["tier"]}
+                for lot in self.storage.stock
+            ],
+        }
@@ -0,0 +1,328 @@
+# farmersim.py
+# 无界面命令行：不导入 Tk，适合批量运行。
+#
+#   python farmersim.py run --days 90 --seed 1 --crop 小麦 --strategy rules.txt
+#   python farmersim.py run --days 365 --seed 1 --policy my_policy.py
+#   python farmersim.py run --days 36500 --crop 小麦 --long-run --report-every 3650
+#   python farmersim.py replay farmersimpy_save.json --days 30
+#   python farmersim.py bench --fields 200 --days 10
+#   python farmersim.py bench --farms 100 --fields 5 --region 100
+#   python farmersim.py sweep --seeds 1-20 --crop 小麦,玉米 --jobs 4
+#   python farmersim.py sweep --seeds 1-500 --crop 小麦 --fast
+#   python farmersim.py run --days 90 --seed 1 --record session.ndjson
+#   python farmersim.py verify session.ndjson
+#   python farmersim.py env-bench --envs 64 --workers 4
+#
+# 每次运行输出一行 JSON 摘要。策略文件是自动化规则 (见 automation.py)，每行一条；
+# --policy 是 Python 策略脚本 (见 strategy.py)，运行中修改会自动重新加载。
+
+import argparse
+import json
+import sys
+import time
+
+
+def load_rules(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def replant(sim, farm, crop_name):
+    """简单的种植策略：清掉死亡的作物，资金够时在所有空地上种 crop_name。"""
+    crop_data = sim.crop_data[crop_name]
+    for i, field in enumerate(farm.fields):
+        if field.crop is not None and field.crop.dead:
+            farm.clear_field(i)
+        if field.crop is None and farm.funds >= crop_data.cost_per_mu:
+            farm.plant(i, crop_data, sim.day_of_year)
+
+
+def run_days(sim, farm, days, crop=None, fast=False, report_every=None):
+    for day in range(1, days + 1):
+        if crop:
+            replant(sim, farm, crop)
+        sim.run_days(1, fast=fast)
+        if report_every and day % report_every == 0:
+            report = sim.compactor.report() if sim.compactor is not None else {}
+            print(json.dumps(dict(report, day=day, date=sim.now.strftime("%Y-%m-%d"), lots=len(farm.storage.stock)),
+                             ensure_ascii=False), file=sys.stderr, flush=True)
+
+
+def summary(sim, farm, **extra):
+    growing = sum(1 for f in farm.fields if f.crop and not f.crop.dead and not f.crop.harvested)
+    result = {
+        "date": sim.now.strftime("%Y-%m-%d %H:%M"),
+        "hours": sim.hours,
+        "funds": round(farm.funds, 2),
+        "debt": round(farm.loan_manager.total_debt, 2),
+        "credit_score": farm.loan_manager.credit_score,
+        "fields": len(farm.fields),
+        "growing": growing,
+        "lots": len(farm.storage.stock),
+    }
+    if sim.ledger is not None:
+        result["pnl"] = {k: round(v, 2) for k, (v, _n) in sim.ledger.pnl_by_category(farm.book_key).items()}
+    if sim.compactor is not None:
+        result["memory"] = sim.compactor.report()
+    host = sim.strategies.get(farm.ledger_key)
+    if host is not None:
+        result["policy"] = host.summary()
+    result.update(extra)
+    return result
+
+
+def _setup(args, sim, farm):
+    if args.strategy:
+        farm.configure_automation(load_rules(args.strategy), True)
+    if args.policy:
+        from strategy import StrategyHost
+        sim.attach_strategy(farm.ledger_key, StrategyHost(args.policy))
+    if args.long_run:
+        sim.enable_long_run()
+    if args.events:
+        from telemetry import NDJSONSink
+        sim.events.subscribe(NDJSONSink(args.events))
+
+
+def _new_simulation(seed, events=False):
+    from simulation import Simulation
+    from economy import Ledger
+    from telemetry import EventBus
+    return Simulation(seed=seed, ledger=Ledger(), events=EventBus() if events else None)
+
+
+def cmd_run(args):
+    seed = args.seed
+    if seed is None and args.record:
+        import random
+        seed = random.randrange(2 ** 31)  # 回放需要种子
+    if args.fast and args.record:
+        raise ValueError("--fast 是近似推进，不能与 --record 一起使用")
+    if args.long_run and args.record:
+        raise ValueError("--long-run 会整理存档内容，不能与 --record 一起使用")
+    sim = _new_simulation(seed, events=bool(args.events))
+    farm = sim.add_farm("main", funds=args.funds, num_fields=args.fields, soil_grid=args.soil_grid)
+    log = None
+    if args.record:
+        from action_log import record_simulation
+        log = record_simulation(sim, args.record, seed)
+    _setup(args, sim, farm)
+    start = time.perf_counter()
+    run_days(sim, farm, args.days, args.crop, args.fast, args.report_every)
+    if sim.events is not None:
+        sim.events.close()
+    if log is not None:
+        log.close(sim.now)
+    if args.out:
+        from game_state import save_to_dict, write_save
+        write_save(args.out, save_to_dict(farm, sim.now))
+    return summary(sim, farm, seed=seed, elapsed_s=round(time.perf_counter() - start, 3))
+
+
+def cmd_verify(args):
+    from action_log import replay
+    return replay(args.log, stop_on_mismatch=not args.keep_going).to_dict()
+
+
+def cmd_replay(args):
+    from simulation import Simulation
+    from game_state import read_save
+    from economy import Ledger
+    from telemetry import EventBus
+    if args.from_state:
+        from game_state import StateStore
+        store = StateStore(args.save)
+        data = store.load_save(args.from_state)
+        store.close()
+        if data is None:
+            raise ValueError(f"状态库 {args.save} 中没有农场 '{args.from_state}'")
+    else:
+        data = read_save(args.save)
+    sim, farm = Simulation.from_save(data, farm_id=args.from_state or "main", seed=args.seed, ledger=Ledger(),
+                                     events=EventBus() if args.events else None)
+    _setup(args, sim, farm)
+    start = time.perf_counter()
+    run_days(sim, farm, args.days, args.crop, args.fast)
+    if sim.events is not None:
+        sim.events.close()
+    return summary(sim, farm, save=args.save, seed=args.seed, elapsed_s=round(time.perf_counter() - start, 3))
+
+
+def cmd_bench(args):
+    from simulation import Simulation
+    from regional_weather import grid_locations
+    sim = Simulation(seed=args.seed, locations=grid_locations(args.region) if args.region else None)
+    farms = [sim.add_farm(f"farm{i + 1}", funds=10 ** 9, num_fields=args.fields, soil_grid=args.soil_grid)
+             for i in range(args.farms)]
+    for farm in farms:
+        replant(sim, farm, args.crop)
+    start = time.perf_counter()
+    sim.run_days(args.days, fast=args.fast)
+    elapsed = time.perf_counter() - start
+    field_hours = sim.hours * args.fields * args.farms
+    result = {
+        "farms": args.farms, "fields": args.fields, "hours": sim.hours, "fast": args.fast,
+        "elapsed_s": round(elapsed, 3),
+        "hours_per_s": round(sim.hours / elapsed, 1),
+        "us_per_field_hour": round(elapsed / field_hours * 1e6, 2),
+    }
+    if args.fast:
+        from growth_table import table_for
+        table = table_for(sim.crop_data[args.crop])
+        result["table"] = {"entries": len(table.entries), "hit_rate": round(table.hit_rate, 3)}
+    return result
+
+
+def cmd_env_bench(args):
+    import random
+    from env import SubprocVectorEnv, VectorEnv
+    if args.workers:
+        env = SubprocVectorEnv(args.envs, workers=args.workers, seed=args.seed, num_fields=args.fields)
+    else:
+        env = VectorEnv(args.envs, seed=args.seed, num_fields=args.fields)
+    rng = random.Random(args.seed)
+    n = env.single_action_space.n
+    env.reset(seed=args.seed)
+    start = time.perf_counter()
+    try:
+        for _ in range(args.steps):
+            env.step([rng.randrange(n) if rng.random() < 0.05 else 0 for _ in range(args.envs)])
+    finally:
+        env.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "envs": args.envs, "workers": args.workers, "steps": args.steps, "elapsed_s": round(elapsed, 3),
+        "env_steps_per_s": round(args.envs * args.steps / elapsed),
+    }
+
+
+def _parse_grid(text):
+    """'8x8' -> (8, 8)"""
+    rows, _sep, cols = text.lower().partition("x")
+    return int(rows), int(cols or rows)
+
+
+def _parse_seeds(text):
+    seeds = []
+    for part in text.split(","):
+        low, sep, high = part.partition("-")
+        seeds.extend(range(int(low), int(high) + 1) if sep else [int(low)])
+    return seeds
+
+
+def _sweep_job(job):
+    seed, crop, days, fields, funds, rules, fast, soil_grid, policy, long_run = job
+    sim = _new_simulation(seed)
+    farm = sim.add_farm("main", funds=funds, num_fields=fields, soil_grid=soil_grid)
+    if rules:
+        farm.configure_automation(rules, True)
+    if policy:
+        from strategy import StrategyHost
+        sim.attach_strategy("main", StrategyHost(policy))
+    if long_run:
+        sim.enable_long_run()
+    run_days(sim, farm, days, crop, fast)
+    return summary(sim, farm, seed=seed, crop=crop)
+
+
+def cmd_sweep(args):
+    rules = load_rules(args.strategy) if args.strategy else None
+    crops = args.crop.split(",") if args.crop else [None]
+    jobs = [(seed, crop, args.days, args.fields, args.funds, rules, args.fast, args.soil_grid, args.policy,
+             args.long_run)
+            for crop in crops for seed in _parse_seeds(args.seeds)]
+    if args.jobs > 1:
+        from multiprocessing import Pool
+        with Pool(args.jobs) as pool:
+            results = pool.imap(_sweep_job, jobs)
+            for result in results:
+                print(json.dumps(result, ensure_ascii=False), flush=True)
+    else:
+        for job in jobs:
+            print(json.dumps(_sweep_job(job), ensure_ascii=False), flush=True)
+    return None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="farmersim", description="FarmerSimPy 无界面命令行")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p, days=90):
+        p.add_argument("--days", type=int, default=days)
+        p.add_argument("--strategy", help="自动化规则文件，每行一条")
+        p.add_argument("--policy", help="Python 策略脚本 (见 strategy.py)")
+        p.add_argument("--long-run", action="store_true", help="长时间运行模式：每天整理状态，内存保持平稳 (见 compaction.py)")
+        p.add_argument("--crop", help="每天在空地上补种的作物")
+        p.add_argument("--fast", action="store_true", help="用作物日响应表按天推进 (近似，见 growth_table.py)")
+
+    run = sub.add_parser("run", help="从新游戏开始模拟")
+    add_common(run)
+    run.add_argument("--seed", type=int)
+    run.add_argument("--fields", type=int, default=2)
+    run.add_argument("--funds", type=float, default=10000)
+    run.add_argument("--events", help="把事件以 NDJSON 写入此文件")
+    run.add_argument("--out", help="结束后写出存档")
+    run.add_argument("--record", help="把种子、操作和每日状态哈希记录到此文件")
+    run.add_argument("--report-every", type=int, help="每隔多少天向 stderr 输出一行内存报告")
+    run.add_argument("--soil-grid", type=_parse_grid, help="每块田地的土壤网格，例如 8x8 (见 soil.py)")
+    run.set_defaults(func=cmd_run)
+
+    replay = sub.add_parser("replay", help="从存档继续模拟")
+    replay.add_argument("save")
+    add_common(replay, days=30)
+    replay.add_argument("--seed", type=int)
+    replay.add_argument("--events", help="把事件以 NDJSON 写入此文件")
+    replay.add_argument("--from-state", metavar="FARM", help="save 是状态库 (如 farmersimpy_state.db)，从该农场的最后检查点继续")
+    replay.set_defaults(func=cmd_replay)
+
+    verify = sub.add_parser("verify", help="回放操作记录并逐日比对状态哈希")
+    verify.add_argument("log")
+    verify.add_argument("--keep-going", action="store_true", help="出现不一致后继续回放")
+    verify.set_defaults(func=cmd_verify)
+
+    bench = sub.add_parser("bench", help="测量模拟速度")
+    bench.add_argument("--days", type=int, default=10)
+    bench.add_argument("--fields", type=int, default=100)
+    bench.add_argument("--farms", type=int, default=1)
+    bench.add_argument("--crop", default="小麦")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--fast", action="store_true", help="用作物日响应表按天推进")
+    bench.add_argument("--soil-grid", type=_parse_grid, help="每块田地的土壤网格，例如 32x32")
+    bench.add_argument("--region", type=int, help="区域天气的地点数，农场依次分配到各地点")
+    bench.set_defaults(func=cmd_bench)
+
+    env_bench = sub.add_parser("env-bench", help="测量强化学习环境 (env.py) 每秒的步数")
+    env_bench.add_argument("--envs", type=int, default=64)
+    env_bench.add_argument("--workers", type=int, default=0, help="子进程数，0 表示在本进程内批量推进")
+    env_bench.add_argument("--steps", type=int, default=500)
+    env_bench.add_argument("--fields", type=int, default=4)
+    env_bench.add_argument("--seed", type=int, default=0)
+    env_bench.set_defaults(func=cmd_env_bench)
+
+    sweep = sub.add_parser("sweep", help="批量运行多个种子/作物，每次运行输出一行")
+    add_common(sweep)
+    sweep.add_argument("--seeds", default="1-10", help="例如 1-20 或 1,5,9")
+    sweep.add_argument("--fields", type=int, default=2)
+    sweep.add_argument("--funds", type=float, default=10000)
+    sweep.add_argument("--jobs", type=int, default=1)
+    sweep.add_argument("--soil-grid", type=_parse_grid, help="每块田地的土壤网格，例如 8x8")
+    sweep.set_defaults(func=cmd_sweep)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        result = args.func(args)
+    except (OSError, KeyError, ValueError) as e:
+        print(json.dumps({"error": f"{type(e).__name__}: {e}"}, ensure_ascii=False), file=sys.stderr)
+        return 1
+    if result is not None:
+        print(json.dumps(result, ensure_ascii=False))
+        if result.get("ok") is False:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
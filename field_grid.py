@@ -0,0 +1,166 @@
+# field_grid.py
+# 田地网格视图：所有田地画在同一个 Canvas 上，每块田地一个小方块，
+# 每次刷新只重绘状态发生变化的方块，悬停显示详细状态。
+
+import tkinter as tk
+from tkinter import ttk
+
+TILE_W = 96
+TILE_H = 54
+GAP = 6
+
+
+def tile_style(field):
+    """Returns (背景色, 方块文字) for a field. Used as the change signature of the tile."""
+    crop = field.crop
+    if crop is None:
+        return "#c8e6c9", "空地"
+    name = crop.crop_data.name
+    if crop.dead:
+        return "#a0a0a0", f"{name} 死亡"
+    if crop.harvested:
+        return "#bbdefb", f"{name} 已收获"
+    if crop.damage_reasons:
+        color = "#ef9a9a" if crop.health < 50 else "#ffcdd2"
+        return color, f"{name} ⚠{crop.health:.0f}%"
+    if crop.matured:
+        return "#ffe082", f"{name} ✅{crop.health:.0f}%"
+    return "#fff9c4", f"{name} {crop.health:.0f}%"
+
+
+class FieldGridView(tk.Frame):
+    def __init__(self, parent, on_click, on_buy):
+        super().__init__(parent)
+        self.on_click = on_click
+        self.fields = []
+        self.tiles = []        # 每块田地的 (矩形 id, 文字 id)
+        self.tile_state = []   # 每块田地上次绘制时的 tile_style，用于跳过未变化的方块
+        self.columns = 0
+        self.hover_index = None
+
+        toolbar = tk.Frame(self)
+        toolbar.pack(fill="x", padx=10, pady=(5, 0))
+        self.buy_button = tk.Button(toolbar, text="购买新田地", bg="#d0e0f0", command=on_buy)
+        self.buy_button.pack(side="left")
+        self.count_var = tk.StringVar()
+        tk.Label(toolbar, textvariable=self.count_var).pack(side="left", padx=10)
+
+        body = tk.Frame(self)
+        body.pack(expand=True, fill="both", padx=10, pady=5)
+        self.canvas = tk.Canvas(body, bg="white", highlightthickness=0)
+        scrollbar = ttk.Scrollbar(body, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.pack(side="left", expand=True, fill="both")
+        scrollbar.pack(side="right", fill="y")
+
+        self.tooltip_bg = self.canvas.create_rectangle(0, 0, 0, 0, fill="#ffffe0", outline="#888", state="hidden")
+        self.tooltip_text = self.canvas.create_text(0, 0, anchor="nw", font=("Arial", 9), state="hidden")
+
+        self.canvas.bind("<Configure>", self._on_resize)
+        self.canvas.bind("<Button-1>", self._on_canvas_click)
+        self.canvas.bind("<Motion>", self._on_motion)
+        self.canvas.bind("<Leave>", lambda e: self._hide_tooltip())
+        self.canvas.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+
+    def set_fields(self, fields, next_price=None, can_buy=True):
+        """Rebuilds all tiles. Only needed when the number of fields changes."""
+        self.fields = fields
+        for rect_id, text_id in self.tiles:
+            self.canvas.delete(rect_id)
+            self.canvas.delete(text_id)
+        self.tiles = []
+        self.tile_state = []
+        for i in range(len(fields)):
+            x, y = self._tile_origin(i)
+            rect_id = self.canvas.create_rectangle(x, y, x + TILE_W, y + TILE_H, outline="#6d8f6d")
+            text_id = self.canvas.create_text(x + 5, y + 4, anchor="nw", width=TILE_W - 8, font=("Arial", 9))
+            self.tiles.append((rect_id, text_id))
+            self.tile_state.append(None)
+        self.count_var.set(f"共 {len(fields)} 块田地")
+        if can_buy and next_price is not None:
+            self.buy_button.config(text=f"购买新田地 (￥{next_price:.0f})", state="normal")
+        else:
+            self.buy_button.config(text="田地数量已达上限", state="disabled")
+        self._update_scrollregion()
+        self._raise_tooltip()
+        self.refresh()
+
+    def replace_fields(self, fields):
+        """Points the tiles at another list with the same number of fields (e.g. a newer snapshot)."""
+        self.fields = fields
+
+    def refresh(self):
+        """Redraws only the tiles whose style changed since the last refresh."""
+        for i, field in enumerate(self.fields):
+            style = tile_style(field)
+            if style == self.tile_state[i]:
+                continue
+            self.tile_state[i] = style
+            color, label = style
+            rect_id, text_id = self.tiles[i]
+            self.canvas.itemconfigure(rect_id, fill=color)
+            self.canvas.itemconfigure(text_id, text=f"{i + 1}\n{label}")
+        if self.hover_index is not None:
+            self._show_tooltip(self.hover_index)
+
+    def _tile_origin(self, i):
+        columns = max(1, self.columns)
+        row, col = divmod(i, columns)
+        return GAP + col * (TILE_W + GAP), GAP + row * (TILE_H + GAP)
+
+    def _index_at(self, x, y):
+        x, y = self.canvas.canvasx(x), self.canvas.canvasy(y)
+        col, dx = divmod(int(x - GAP), TILE_W + GAP)
+        row, dy = divmod(int(y - GAP), TILE_H + GAP)
+        if x < GAP or y < GAP or col >= max(1, self.columns) or dx >= TILE_W or dy >= TILE_H:
+            return None
+        i = row * max(1, self.columns) + col
+        return i if i < len(self.fields) else None
+
+    def _on_resize(self, event):
+        columns = max(1, (event.width - GAP) // (TILE_W + GAP))
+        if columns == self.columns:
+            return
+        self.columns = columns
+        for i, (rect_id, text_id) in enumerate(self.tiles):
+            x, y = self._tile_origin(i)
+            self.canvas.coords(rect_id, x, y, x + TILE_W, y + TILE_H)
+            self.canvas.coords(text_id, x + 5, y + 4)
+        self._update_scrollregion()
+
+    def _update_scrollregion(self):
+        rows = (len(self.fields) + max(1, self.columns) - 1) // max(1, self.columns)
+        self.canvas.configure(scrollregion=(0, 0, max(1, self.columns) * (TILE_W + GAP) + GAP,
+                                            rows * (TILE_H + GAP) + GAP))
+
+    def _on_canvas_click(self, event):
+        i = self._index_at(event.x, event.y)
+        if i is not None:
+            self._hide_tooltip()
+            self.on_click(i)
+
+    def _on_motion(self, event):
+        i = self._index_at(event.x, event.y)
+        if i is None:
+            self._hide_tooltip()
+        elif i != self.hover_index:
+            self._show_tooltip(i)
+
+    def _show_tooltip(self, i):
+        self.hover_index = i
+        x, y = self._tile_origin(i)
+        self.canvas.itemconfigure(self.tooltip_text, text=f"田地 {i + 1}\n{self.fields[i].status()}", state="normal")
+        self.canvas.coords(self.tooltip_text, x + TILE_W // 2, y + TILE_H + 4)
+        x0, y0, x1, y1 = self.canvas.bbox(self.tooltip_text)
+        self.canvas.coords(self.tooltip_bg, x0 - 4, y0 - 3, x1 + 4, y1 + 3)
+        self.canvas.itemconfigure(self.tooltip_bg, state="normal")
+        self._raise_tooltip()
+
+    def _hide_tooltip(self):
+        self.hover_index = None
+        self.canvas.itemconfigure(self.tooltip_text, state="hidden")
+        self.canvas.itemconfigure(self.tooltip_bg, state="hidden")
+
+    def _raise_tooltip(self):
+        self.canvas.tag_raise(self.tooltip_bg)
+        self.canvas.tag_raise(self.tooltip_text)
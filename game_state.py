@@ -0,0 +1,335 @@
+# game_state.py
+# 存档/读档管理。
+# - field_to_dict / field_from_dict: 田地与作物的序列化（JSON 存档与状态库共用）
+# - StateStore: 基于 SQLite (WAL) 的状态库，每小时只写入发生变化的行，一个事务提交一次
+
+import json
+import sqlite3
+from datetime import datetime
+
+CROP_SAVE_KEYS = (
+    "planted_day", "day_counter", "hour_counter", "growth_points", "matured", "dead", "harvested",
+    "health", "water_level", "sun_stress", "nutrient_satisfaction", "pesticide_effect_hours", "total_cost",
+    "infection", "infection_risk",
+)
+
+
+def crop_to_dict(crop):
+    data = {"crop_data_name": crop.crop_data.name}
+    for key in CROP_SAVE_KEYS:
+        data[key] = getattr(crop, key)
+    data["quality_tags"] = sorted(crop.quality_tags)
+    data["damage_reasons"] = sorted(crop.damage_reasons)
+    return data
+
+
+def crop_signature(crop):
+    """A cheap comparable tuple of everything crop_to_dict() saves, used to skip unchanged crops without serializing them."""
+    values = tuple(getattr(crop, key) for key in CROP_SAVE_KEYS if key != "nutrient_satisfaction")
+    return (crop.crop_data.name, values, tuple(crop.nutrient_satisfaction.items()),
+            frozenset(crop.quality_tags), frozenset(crop.damage_reasons))
+
+
+def crop_from_dict(data, field, crop_data):
+    from crops import CropInstance
+    crop = CropInstance(crop_data[data["crop_data_name"]], data["planted_day"], field)
+    for key, value in data.items():
+        if key == "damage_reasons" or key == "quality_tags":
+            setattr(crop, key, set(value))
+        elif key not in ["crop_data_name", "field"]:
+            setattr(crop, key, value)
+    return crop
+
+
+def field_to_dict(field):
+    data = {"soil_npk": field.soil_npk, "crop": crop_to_dict(field.crop) if field.crop else None}
+    if field.grid is not None:
+        data["soil_grid"] = field.grid.to_dict()
+    return data
+
+
+def field_from_dict(data, crop_data):
+    from crops import Field
+    field = Field()
+    field.soil_npk = data["soil_npk"]
+    if data.get("soil_grid"):
+        from soil import SoilGrid
+        field.grid = SoilGrid.from_dict(data["soil_grid"])
+    if data.get("crop"):
+        field.crop = crop_from_dict(data["crop"], field, crop_data)
+    return field
+
+
+def save_to_dict(farm, now):
+    """The JSON save format written by the GUI's save_game."""
+    return {
+        "date": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "funds": farm.funds,
+        "fields": [field_to_dict(field) for field in farm.fields],
+        "storage": farm.storage.stock,
+        "loan_info": farm.loan_manager.to_dict(),
+        "automation": {
+            "enabled": farm.automation.enabled,
+            "rules": farm.automation.rule_texts
+        },
+        **({"soil_grid": list(farm.soil_grid)} if farm.soil_grid else {}),
+    }
+
+
+def load_from_dict(data, farm, crop_data):
+    """Restores a save_to_dict() save (or an older save) into farm. Returns the saved datetime."""
+    date = datetime.strptime(data["date"], "%Y-%m-%d %H:%M:%S")
+    farm.now = date.strftime("%Y-%m-%d %H:%M")
+    farm.set_funds(data["funds"])
+    farm.storage.load_stock(data["storage"])
+
+    if "automation" in data:
+        farm.automation.set_rules(data["automation"].get("rules", []))
+        farm.automation.enabled = data["automation"].get("enabled", False)
+
+    if "loan_info" in data:
+        farm.loan_manager.load_dict(data["loan_info"])
+
+    farm.soil_grid = tuple(data["soil_grid"]) if data.get("soil_grid") else None
+    farm.fields = [field_from_dict(field_data, crop_data) for field_data in data["fields"]]
+    return date
+
+
+def read_save(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_save(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    farm  TEXT NOT NULL,
+    key   TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (farm, key)
+);
+CREATE TABLE IF NOT EXISTS fields (
+    farm   TEXT NOT NULL,
+    idx    INTEGER NOT NULL,
+    soil_n REAL, soil_p REAL, soil_k REAL,
+    PRIMARY KEY (farm, idx)
+);
+CREATE TABLE IF NOT EXISTS crops (
+    farm        TEXT NOT NULL,
+    field_idx   INTEGER NOT NULL,
+    name        TEXT NOT NULL,
+    health      REAL,
+    water_level REAL,
+    matured     INTEGER,
+    dead        INTEGER,
+    harvested   INTEGER,
+    data        TEXT NOT NULL,
+    PRIMARY KEY (farm, field_idx)
+);
+CREATE INDEX IF NOT EXISTS crops_name ON crops (farm, name);
+CREATE TABLE IF NOT EXISTS lots (
+    farm      TEXT NOT NULL,
+    lot_id    INTEGER NOT NULL,
+    name      TEXT NOT NULL,
+    yield     REAL,
+    nutrition REAL,
+    freshness REAL,
+    cost      REAL,
+    days      INTEGER,
+    data      TEXT NOT NULL,
+    PRIMARY KEY (farm, lot_id)
+);
+CREATE INDEX IF NOT EXISTS lots_name ON lots (farm, name);
+CREATE INDEX IF NOT EXISTS lots_freshness ON lots (farm, freshness);
+CREATE TABLE IF NOT EXISTS prices (
+    day   TEXT NOT NULL,
+    name  TEXT NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (day, name)
+);
+CREATE INDEX IF NOT EXISTS prices_name_day ON prices (name, day);
+"""
+
+
+class StateStore:
+    """
+    SQLite 状态库。checkpoint() 把当前状态与上次写入的内容比较，只写入变化的行，
+    整个 checkpoint 在一个事务中完成。账本 (economy.Ledger) 可以使用同一个数据库文件。
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        # 同一时间只有一个线程使用：界面的动态模式下由后台模拟线程使用，暂停后交还 Tk 线程 (见 sim_thread.py)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._written = {}  # (表, farm, 主键) -> 上次写入的行 (作物为 crop_signature)，用于跳过未变化的行
+        self._lot_ids = {}  # farm -> 上次写入时的批次号集合
+        self._price_day = None  # 最近一次写入价格的日期 (每天一次)
+
+    def _changed(self, table, farm, key, row):
+        cache_key = (table, farm, key)
+        if self._written.get(cache_key) == row:
+            return False
+        self._written[cache_key] = row
+        return True
+
+    def checkpoint(self, farm, now, market=None):
+        """Writes everything that changed since the last checkpoint in one transaction. Returns rows written."""
+        return self.checkpoint_many([farm], now, market)
+
+    def checkpoint_many(self, farms, now, market=None):
+        """Checkpoints several farms (e.g. every farm on a server tick) in a single transaction."""
+        written = 0
+        with self.conn:
+            for farm in farms:
+                written += self._write_farm(farm, now)
+            day = now.strftime("%Y-%m-%d")
+            if market is not None and day != self._price_day:
+                self._price_day = day
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO prices VALUES (?, ?, ?)",
+                    [(day, product.name, product.price) for product in market.products],
+                )
+                written += len(market.products)
+        return written
+
+    def compact(self, before_day):
+        """Drops price history before before_day ('YYYY-MM-DD'). Returns rows deleted."""
+        with self.conn:
+            return self.conn.execute("DELETE FROM prices WHERE day < ?", (before_day,)).rowcount
+
+    def _write_farm(self, farm, now):
+        key = farm.ledger_key
+        written = 0
+        if key not in self._lot_ids:
+            # 本进程第一次写这个农场：清掉上次运行留下的行，之后只写增量
+            for table in ("fields", "crops", "lots"):
+                self.conn.execute(f"DELETE FROM {table} WHERE farm = ?", (key,))
+            self._lot_ids[key] = set()
+        meta = {
+            "time": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "funds": repr(farm.funds),
+            "loan_info": json.dumps(farm.loan_manager.to_dict(), ensure_ascii=False),
+            "automation": json.dumps({"enabled": farm.automation.enabled, "rules": farm.automation.rule_texts},
+                                     ensure_ascii=False),
+            "next_lot_id": str(farm.storage.next_lot_id),
+            "num_fields": str(len(farm.fields)),
+        }
+        previous_fields = self._written.get(("meta", key, "num_fields"))
+        for name, value in meta.items():
+            if self._changed("meta", key, name, value):
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?, ?)", (key, name, value))
+                written += 1
+        if previous_fields is not None and int(previous_fields) > len(farm.fields):
+            # 读档后田地变少：删掉多余的田地和作物行
+            for table, column in (("fields", "idx"), ("crops", "field_idx")):
+                self.conn.execute(f"DELETE FROM {table} WHERE farm = ? AND {column} >= ?", (key, len(farm.fields)))
+            for idx in range(len(farm.fields), int(previous_fields)):
+                self._written.pop(("fields", key, idx), None)
+                self._written.pop(("crops", key, idx), None)
+
+        for idx, field in enumerate(farm.fields):
+            soil = (field.soil_npk["N"], field.soil_npk["P"], field.soil_npk["K"])
+            if self._changed("fields", key, idx, soil):
+                self.conn.execute("INSERT OR REPLACE INTO fields VALUES (?, ?, ?, ?, ?)", (key, idx) + soil)
+                written += 1
+            crop = field.crop
+            if crop is None:
+                if self._changed("crops", key, idx, None):
+                    self.conn.execute("DELETE FROM crops WHERE farm = ? AND field_idx = ?", (key, idx))
+                    written += 1
+                continue
+            # 先比较廉价的签名，作物没有变化时不做 JSON 序列化
+            if self._changed("crops", key, idx, crop_signature(crop)):
+                data = json.dumps(crop_to_dict(crop), ensure_ascii=False)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO crops VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, idx, crop.crop_data.name, crop.health, crop.water_level,
+                     int(crop.matured), int(crop.dead), int(crop.harvested), data),
+                )
+                written += 1
+
+        current_ids = set()
+        for lot in farm.storage.stock:
+            lot_id = lot["lot_id"]
+            current_ids.add(lot_id)
+            data = json.dumps(lot, ensure_ascii=False)
+            if self._changed("lots", key, lot_id, data):
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO lots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, lot_id, lot["name"], lot["yield"], lot["nutrition"], lot["freshness"],
+                     lot.get("cost", 0), lot["days"], data),
+                )
+                written += 1
+        removed = self._lot_ids.get(key, set()) - current_ids
+        if removed:
+            self.conn.executemany("DELETE FROM lots WHERE farm = ? AND lot_id = ?", [(key, i) for i in removed])
+            for lot_id in removed:
+                self._written.pop(("lots", key, lot_id), None)
+            written += len(removed)
+        self._lot_ids[key] = current_ids
+        return written
+
+    def load_save(self, farm_key):
+        """
+        The farm's last checkpoint in save_to_dict() format (pass it to load_from_dict), or None if nothing
+        is stored. 状态库只存土壤的平均值，土壤网格不会恢复。
+        """
+        meta = dict(self.conn.execute("SELECT key, value FROM meta WHERE farm = ?", (farm_key,)))
+        if not meta:
+            return None
+        fields = [{"soil_npk": {"N": 100.0, "P": 100.0, "K": 100.0}, "crop": None}
+                  for _ in range(int(meta["num_fields"]))]
+        for idx, n, p, k in self.conn.execute(
+                "SELECT idx, soil_n, soil_p, soil_k FROM fields WHERE farm = ?", (farm_key,)):
+            fields[idx]["soil_npk"] = {"N": n, "P": p, "K": k}
+        for idx, data in self.conn.execute("SELECT field_idx, data FROM crops WHERE farm = ?", (farm_key,)):
+            fields[idx]["crop"] = json.loads(data)
+        return {
+            "date": meta["time"],
+            "funds": float(meta["funds"]),
+            "fields": fields,
+            "storage": [json.loads(data) for (data,) in self.conn.execute(
+                "SELECT data FROM lots WHERE farm = ? ORDER BY lot_id", (farm_key,))],
+            "loan_info": json.loads(meta["loan_info"]),
+            "automation": json.loads(meta["automation"]),
+        }
+
+    # --- 查询 ---
+
+    def lots_below_freshness(self, farm_key, freshness):
+        """Lot ids with freshness below the threshold, stalest first (uses lots_freshness)."""
+        return [row[0] for row in self.conn.execute(
+            "SELECT lot_id FROM lots WHERE farm = ? AND freshness < ? ORDER BY freshness", (farm_key, freshness))]
+
+    def inventory_summary(self, farm_key):
+        """[(作物, 批数, 总重量, 平均新鲜度), ...] (uses lots_name)."""
+        return self.conn.execute(
+            "SELECT name, COUNT(*), SUM(yield), SUM(freshness * yield) / SUM(yield) FROM lots WHERE farm = ? "
+            "GROUP BY name ORDER BY name",
+            (farm_key,),
+        ).fetchall()
+
+    def crops_by_name(self, farm_key, name):
+        """[(田地下标, 健康, 水分), ...] of the growing crops of one name (uses crops_name)."""
+        return self.conn.execute(
+            "SELECT field_idx, health, water_level FROM crops WHERE farm = ? AND name = ? AND dead = 0 AND harvested = 0 "
+            "ORDER BY field_idx",
+            (farm_key, name),
+        ).fetchall()
+
+    def price_history(self, name, since_day=""):
+        """[(日期, 价格), ...] for one product (uses prices_name_day)."""
+        return self.conn.execute(
+            "SELECT day, price FROM prices WHERE name = ? AND day >= ? ORDER BY day", (name, since_day)
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
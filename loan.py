@@ -1,13 +1,94 @@
-
 # loan.py
 
+def amortization_schedule(principal, annual_rate, term_months):
+    """
+    等额本息还款计划。
+    返回 [(本期应还, 其中利息, 其中本金, 剩余本金), ...]，共 term_months 期。
+    """
+    r = annual_rate / 12
+    if r > 0:
+        payment = principal * r / (1 - (1 + r) ** -term_months)
+    else:
+        payment = principal / term_months
+    schedule = []
+    remaining = principal
+    for period in range(term_months):
+        interest = remaining * r
+        principal_part = payment - interest
+        if period == term_months - 1:
+            principal_part = remaining  # 最后一期把舍入误差一起还清
+        remaining = max(0.0, remaining - principal_part)
+        schedule.append((round(principal_part + interest, 2), round(interest, 2), round(principal_part, 2), round(remaining, 2)))
+    return schedule
+
+
+class Loan:
+    """一笔借款及其预先计算好的还款计划。"""
+
+    def __init__(self, principal, annual_rate, term_months, start_month, paid_periods=0, loan_id=None):
+        self.loan_id = loan_id
+        self.principal = principal
+        self.annual_rate = annual_rate
+        self.term_months = term_months
+        self.start_month = start_month    # 第一期在第几个还款日到期 (LoanManager.month，新借款为下一个完整周期)
+        self.paid_periods = paid_periods  # 已结清的期数
+        self.schedule = amortization_schedule(principal, annual_rate, term_months)
+
+    @property
+    def remaining_principal(self):
+        if self.paid_periods == 0:
+            return self.principal
+        return self.schedule[self.paid_periods - 1][3]
+
+    @property
+    def finished(self):
+        return self.paid_periods >= self.term_months
+
+    def due_on(self, month):
+        """Installment due on the given repayment month, or 0."""
+        if self.finished or month < self.start_month + self.paid_periods:
+            return 0.0
+        return self.schedule[self.paid_periods][0]
+
+    def to_dict(self):
+        return {
+            "loan_id": self.loan_id, "principal": self.principal, "annual_rate": self.annual_rate,
+            "term_months": self.term_months, "start_month": self.start_month, "paid_periods": self.paid_periods,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
 class LoanManager:
     def __init__(self, initial_debt=30000, credit_score=100):
-        self.total_debt = initial_debt  # 总债务
         self.credit_score = credit_score  # 信用分 (0-100)
-        self.base_monthly_payment = 3000  # 每月基础还款额
+        self.base_monthly_payment = 3000  # 每月基础还款额（初始债务按此金额免息分期）
         self.interest_rate_overdue = 0.05  # 逾期罚息率 (5% on the overdue amount)
         self.repayment_day = 28  # 每月还款日
+        self.default_term_months = 12  # 新借款的默认期限
+        self.month = 0  # 已经过的还款日数量
+        self.loans = []
+        self.overdue_balance = 0.0  # 逾期未还的金额（含罚息）
+        self._next_loan_id = 1
+        self._migrate_legacy_debt(initial_debt)
+
+    @property
+    def total_debt(self):
+        return sum(loan.remaining_principal for loan in self.loans) + self.overdue_balance
+
+    def _migrate_legacy_debt(self, amount):
+        """
+        把一笔没有还款计划的总债务 (初始债务或旧存档的 total_debt) 换成一笔免息借款：
+        期数为 ceil(amount / base_monthly_payment)，每期等额还款 (不超过 base_monthly_payment)。
+        原有的借款和逾期欠款都被替换。
+        """
+        self.loans = []
+        self.overdue_balance = 0.0
+        if amount > 0:
+            term = max(1, -(-int(round(amount)) // self.base_monthly_payment))
+            self._add_loan(amount, 0.0, term, self.month)
 
     @property
     def max_loan_amount(self):
@@ -15,49 +96,68 @@ class LoanManager:
         # 信用分100时可贷50000，信用分0时可贷1000
         return 1000 + (self.credit_score / 100) * 49000
 
-    def borrow_money(self, amount):
+    @property
+    def interest_rate(self):
+        # 年利率随信用分浮动: 信用分100时 4%，信用分0时 16%
+        return 0.04 + (100 - self.credit_score) / 100 * 0.12
+
+    def _add_loan(self, principal, annual_rate, term_months, start_month):
+        loan = Loan(principal, annual_rate, term_months, start_month, loan_id=self._next_loan_id)
+        self._next_loan_id += 1
+        self.loans.append(loan)
+        return loan
+
+    def borrow_money(self, amount, term_months=None):
         """
         借款功能。
         - 检查是否超过最大可贷金额。
-        - 借款成功后，金额加入总债务，并略微降低信用分。
+        - 借款成功后按当前信用分定价，生成独立的还款计划，并略微降低信用分。
+        - 第一期在满一个完整周期后的还款日到期：本月还款日之前借的款 (哪怕就在还款日当天) 不在本月还。
         """
         if amount <= 0:
             return False, "借款金额必须为正数。"
-        
+
         if amount > self.max_loan_amount:
             return False, f"你的信用额度不足。当前最大可贷金额为 ￥{self.max_loan_amount:.2f}。"
 
-        self.total_debt += amount
+        loan = self._add_loan(amount, self.interest_rate, term_months or self.default_term_months, self.month + 1)
         self.credit_score = max(0, self.credit_score - 5) # 每次借款信用分降低5点
-        return True, f"成功借款 ￥{amount:.2f}。当前总债务为 ￥{self.total_debt:.2f}。"
+        return True, (
+            f"成功借款 ￥{amount:.2f}（年利率 {loan.annual_rate:.1%}，{loan.term_months}期，"
+            f"每期 ￥{loan.schedule[0][0]:.2f}）。当前总债务为 ￥{self.total_debt:.2f}。"
+        )
+
+    def amount_due(self):
+        """本次还款日应还金额：所有借款当期应还 + 逾期欠款。"""
+        return round(sum(loan.due_on(self.month) for loan in self.loans) + self.overdue_balance, 2)
 
     def handle_repayment(self, funds_available):
         """
         处理每月还款。
-        - 计算当月应还金额。
+        - 结清所有借款的当期分期（和之前的逾期欠款）。
         - 根据玩家资金情况处理还款、部分还款或逾期。
+        多个农场同一天还款时用 settle_due() 一起结算，结果相同。
         """
-        if self.total_debt <= 0:
-            return "no_debt", 0, "您已还清所有债务！"
+        return settle_due([self], [funds_available])[0]
+
+    def _apply_payment(self, due_amount, funds_available):
+        """The outcome of a repayment day once its installments have been rolled forward (see settle_due)."""
+        if due_amount <= 0:
+            return "no_due", 0, f"本月没有到期的分期。剩余债务: ￥{self.total_debt:.2f}。"
 
-        # 应还金额为基础还款额和剩余债务中的较小者
-        due_amount = min(self.base_monthly_payment, self.total_debt)
-        
         if funds_available >= due_amount:
             # 全额还款
-            self.total_debt -= due_amount
+            self.overdue_balance = 0.0
             self.credit_score = min(100, self.credit_score + 2) # 按时还款，信用分增加
             return "paid_full", due_amount, f"成功还款 ￥{due_amount:.2f}。剩余债务: ￥{self.total_debt:.2f}。"
-        
+
         elif funds_available > 0:
             # 部分还款
             paid_amount = funds_available
             remaining_due = due_amount - paid_amount
-            
-            self.total_debt -= paid_amount
             overdue_penalty = remaining_due * self.interest_rate_overdue
-            self.total_debt += overdue_penalty # 罚息计入总债务
-            
+            self.overdue_balance = remaining_due + overdue_penalty # 罚息计入总债务
+
             self.credit_score = max(0, self.credit_score - 10) # 部分还款，信用分下降
             return "paid_partial", paid_amount, (
                 f"资金不足！仅还款 ￥{paid_amount:.2f}。"
@@ -66,15 +166,111 @@ class LoanManager:
         else:
             # 完全逾期
             overdue_penalty = due_amount * self.interest_rate_overdue
-            self.total_debt += overdue_penalty # 罚息计入总债务
+            self.overdue_balance = due_amount + overdue_penalty # 罚息计入总债务
             self.credit_score = max(0, self.credit_score - 15) # 完全逾期，信用分大幅下降
             return "overdue", 0, (
                 f"本月未能还款！应还金额 ￥{due_amount:.2f} 已产生 ￥{overdue_penalty:.2f} 的罚息并计入总债务。"
             )
 
+    def payment_curve(self, months):
+        """未来 months 个还款日各自的计划还款额（不含逾期欠款）。"""
+        curve = [0.0] * months
+        for loan in self.loans:
+            first = loan.start_month + loan.paid_periods - self.month
+            for period in range(loan.paid_periods, loan.term_months):
+                offset = max(0, first) + (period - loan.paid_periods)
+                if offset >= months:
+                    break
+                curve[offset] += loan.schedule[period][0]
+        return curve
+
+    def project_debt(self, months, funds, monthly_cash_flow):
+        """
+        假设每月净现金流为 monthly_cash_flow，预测未来 months 个还款日之后的总债务。
+        返回每个还款日之后的 [(资金, 总债务), ...]，不修改当前状态。
+        """
+        curve = self.payment_curve(months)
+        principal_after = self._principal_curve(months)
+        overdue = self.overdue_balance
+        projection = []
+        for m in range(months):
+            funds += monthly_cash_flow
+            due = curve[m] + overdue
+            paid = min(max(funds, 0.0), due)
+            funds -= paid
+            unpaid = due - paid
+            overdue = unpaid * (1 + self.interest_rate_overdue)
+            projection.append((round(funds, 2), round(principal_after[m] + overdue, 2)))
+        return projection
+
+    def _principal_curve(self, months):
+        """按计划还款时，每个还款日之后剩余的本金。"""
+        remaining = [0.0] * months
+        for loan in self.loans:
+            first = max(0, loan.start_month + loan.paid_periods - self.month)
+            for m in range(months):
+                period = loan.paid_periods + (m - first + 1)
+                if period <= loan.paid_periods:
+                    remaining[m] += loan.remaining_principal
+                elif period >= loan.term_months:
+                    continue
+                else:
+                    remaining[m] += loan.schedule[period - 1][3]
+        return remaining
+
+    def to_dict(self):
+        return {
+            "credit_score": self.credit_score,
+            "total_debt": self.total_debt,
+            "month": self.month,
+            "overdue_balance": self.overdue_balance,
+            "loans": [loan.to_dict() for loan in self.loans],
+        }
+
+    def load_dict(self, data):
+        """
+        Restores to_dict() output. Older saves only have total_debt and no loans list; that debt is
+        migrated with _migrate_legacy_debt() into one 0% loan of ceil(debt / base_monthly_payment) equal installments.
+        """
+        self.credit_score = data.get("credit_score", 100)
+        if "loans" in data:
+            self.month = data.get("month", 0)
+            self.overdue_balance = data.get("overdue_balance", 0.0)
+            self.loans = [Loan.from_dict(loan) for loan in data["loans"]]
+            self._next_loan_id = max([loan.loan_id or 0 for loan in self.loans] + [0]) + 1
+        else:
+            self._migrate_legacy_debt(data.get("total_debt", 30000))
+
     def get_status(self):
         """返回当前贷款状态的字符串"""
         if self.total_debt <= 0:
             return "无债务"
         return f"总债务: ￥{self.total_debt:.2f} | 信用分: {self.credit_score} | 最大可贷: ￥{self.max_loan_amount:.2f}"
 
+
+def settle_due(managers, funds):
+    """
+    批量结算多个农场的还款日。managers 与 funds 一一对应，返回每个农场的 (status, amount_paid, message)。
+    先在所有农场的全部借款上走一遍：累加各农场的当期应还并把当期分期结转 (还清或转入逾期)；
+    再按各自的资金逐个农场得出还款结果。各农场之间互不影响。
+    """
+    owing = [manager.total_debt > 0 for manager in managers]
+    due = [0.0] * len(managers)
+    for i, manager in enumerate(managers):
+        if not owing[i]:
+            continue
+        month = manager.month
+        for loan in manager.loans:
+            installment = loan.due_on(month)
+            if installment > 0:
+                due[i] += installment
+                loan.paid_periods += 1
+    results = []
+    for manager, available, has_debt, installments in zip(managers, funds, owing, due):
+        manager.month += 1
+        if not has_debt:
+            results.append(("no_debt", 0, "您已还清所有债务！"))
+            continue
+        manager.loans = [loan for loan in manager.loans if not loan.finished]
+        results.append(manager._apply_payment(round(installments + manager.overdue_balance, 2), available))
+    return results
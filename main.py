@@ -1,18 +1,32 @@
+import time
+_PROCESS_START = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, scrolledtext
 from datetime import datetime, timedelta
-import json
 import os
+import threading
 
-from weather import WeatherDynamic
-from market import Market
-from plant import get_all_crop_data
-from crops import Field
-from storage import Storage
-from loan import LoanManager
+# 模拟模块 (weather/market/crops/storage/loan) 在首帧绘制之后才导入，见 _finish_startup
 
 SAVE_FILE = "farmersimpy_save.json"
 LOG_FILE = "farmersimpy_log.txt"
+ACTION_LOG_FILE = "farmersimpy_actions.ndjson"  # 本局的随机种子与操作记录，可用 farmersim.py verify 回放
+STATE_DB = "farmersimpy_state.db"  # 状态库和账本共用的 SQLite 文件
+STALE_FRESHNESS = 40  # 新鲜度低于此值的批次可以一键清仓
+PRICE_HISTORY_DAYS = 7  # 市场页显示最近几天的价格区间 (来自状态库)
+STARTUP_BUDGET_MS = 400  # 从进程启动到可操作的时间预算
+MAX_LOG_LINES = 2000  # 日志框最多保留的行数，超出后删除最早的行 (长时间运行时内存不再增长)
+TIMELINE_DAYS = 3  # 时间回溯保留的天数 (每天一个检查点 + 每小时增量)
+DAMAGE_REASONS = ["缺水", "积水", "温度", "光照", "病害"]
+DYNAMIC_HOUR_SECONDS = 2.5  # 动态模式下每个模拟小时的间隔
+FRAME_MS = 100  # 动态模式下界面绘制最新快照的间隔
+DEFAULT_AUTOMATION_RULES = [
+    "water when water_level < 35",
+    "pesticide when damage has 病害 and funds > 500",
+    "harvest when matured",
+    "sell when freshness < 40",
+]
 
 class FarmerSimGUI:
     def __init__(self, root):
@@ -22,135 +36,254 @@ class FarmerSimGUI:
         
         self.dynamic_mode = False
         self.timer_running = False
+        self.ready = False
+        # 动态模式下模拟在后台线程运行 (sim_thread.SimulationThread)，界面只绘制它发布的最新快照
+        self.sim_thread = None
+        self.snapshot = None
+        self.rendered_version = None
+        self.tk_thread = threading.current_thread()
 
         self.date = datetime(2025, 3, 1)
-        self.funds = 10000
-        self.weather = WeatherDynamic(self.date)
-        self.market = Market()
-        self.market.update_prices(self.weather)
-        self.crop_data = get_all_crop_data()
-        self.storage = Storage()
-        self.fields = [Field() for _ in range(2)] # Start with two Fields
-        self.field_buttons = []
-        self.field_base_price = 2000
-
-        self.loan_manager = LoanManager()
+        self.weather = None
+        self.market = None
+        self.crop_data = None
+        self.farm = None  # 田地、仓库、贷款与资金，见 farm.Farm
+        self.field_grid = None
 
-        self.info_var = tk.StringVar()
+        self.info_var = tk.StringVar(value="⏳ 正在加载...")
         self.info_label = tk.Label(root, textvariable=self.info_var, font=("Arial", 14), anchor="w", bg="#e6ffe6")
         self.info_label.pack(fill="x", ipady=5)
 
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(expand=True, fill="both")
 
+        # 标签页内容在第一次被查看时才构建
         self.tab_fields = ttk.Frame(self.notebook)
         self.notebook.add(self.tab_fields, text="🌾 田地状态")
-
         self.tab_market = ttk.Frame(self.notebook)
         self.notebook.add(self.tab_market, text="📈 市场行情")
-        self.market_text = tk.Text(self.tab_market, height=12, font=("Arial", 10))
-        self.market_text.pack(expand=True, fill="both")
-
         self.tab_storage = ttk.Frame(self.notebook)
         self.notebook.add(self.tab_storage, text="📦 仓库存储")
-
         self.tab_finance = ttk.Frame(self.notebook)
         self.notebook.add(self.tab_finance, text="💰 财务与贷款")
-        self.finance_text = tk.Text(self.tab_finance, height=12, font=("Arial", 10))
-        self.finance_text.pack(expand=True, fill="both")
-
-        self.setup_field_grid()
+        self.tab_charts = ttk.Frame(self.notebook)
+        self.notebook.add(self.tab_charts, text="📊 统计图表")
+        self.market_text = None
+        self.finance_text = None
+        self.charts_view = None
+        self.tab_builders = {
+            str(self.tab_fields): self.setup_field_grid,
+            str(self.tab_market): self.build_market_tab,
+            str(self.tab_storage): self.refresh_storage,
+            str(self.tab_finance): self.build_finance_tab,
+            str(self.tab_charts): self.build_charts_tab,
+        }
+        self.built_tabs = set()
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
 
+        self.action_buttons = []
         op_frame = tk.Frame(root)
         op_frame.pack(fill="x", pady=5)
-        tk.Button(op_frame, text="查看天气", command=self.show_weather).pack(side="left", padx=5)
-        tk.Button(op_frame, text="播种", command=self.plant_crop).pack(side="left", padx=5)
-        tk.Button(op_frame, text="浇水", command=lambda: self.apply_field_action("water")).pack(side="left", padx=5)
-        tk.Button(op_frame, text="施氮肥(N)", command=lambda: self.apply_fertilizer_action('N')).pack(side="left", padx=5)
-        tk.Button(op_frame, text="施磷肥(P)", command=lambda: self.apply_fertilizer_action('P')).pack(side="left", padx=5)
-        tk.Button(op_frame, text="施钾肥(K)", command=lambda: self.apply_fertilizer_action('K')).pack(side="left", padx=5)
-        tk.Button(op_frame, text="喷药", command=lambda: self.apply_field_action("pesticide")).pack(side="left", padx=5)
-        tk.Button(op_frame, text="收获", command=self.harvest_crop).pack(side="left", padx=5)
-        tk.Button(op_frame, text="借款", command=self.borrow_money).pack(side="left", padx=5)
-        tk.Button(op_frame, text="推进一天", command=self.next_day).pack(side="right", padx=5)
+        self._add_action_button(op_frame, "查看天气", self.show_weather)
+        self._add_action_button(op_frame, "播种", self.plant_crop)
+        self._add_action_button(op_frame, "浇水", lambda: self.apply_field_action("water"))
+        self._add_action_button(op_frame, "施氮肥(N)", lambda: self.apply_fertilizer_action('N'))
+        self._add_action_button(op_frame, "施磷肥(P)", lambda: self.apply_fertilizer_action('P'))
+        self._add_action_button(op_frame, "施钾肥(K)", lambda: self.apply_fertilizer_action('K'))
+        self._add_action_button(op_frame, "喷药", lambda: self.apply_field_action("pesticide"))
+        self._add_action_button(op_frame, "收获", self.harvest_crop)
+        self._add_action_button(op_frame, "批量操作", self.open_bulk_dialog)
+        self._add_action_button(op_frame, "借款", self.borrow_money)
+        self._add_action_button(op_frame, "推进一天", self.next_day, side="right")
 
         log_frame = tk.Frame(root)
         log_frame.pack(fill="both", expand=True)
         self.log_box = scrolledtext.ScrolledText(log_frame, height=15, font=("Arial", 10))
+        self.log_lines = 0
         self.log_box.pack(fill="both", expand=True)
         
         bottom_bar = tk.Frame(root)
         bottom_bar.pack(fill="x", pady=5)
-        tk.Button(bottom_bar, text="保存存档", command=self.save_game).pack(side="left", padx=5)
-        tk.Button(bottom_bar, text="读取存档", command=self.load_game).pack(side="left", padx=5)
-        self.dynamic_button = tk.Button(bottom_bar, text="▶️ 启动动态模式", command=self.toggle_dynamic_mode, bg="#d0f0d0")
+        self._add_action_button(bottom_bar, "保存存档", self.save_game)
+        self._add_action_button(bottom_bar, "读取存档", self.load_game)
+        self._add_action_button(bottom_bar, "🤖 自动化规则", self.open_automation_dialog)
+        self._add_action_button(bottom_bar, "⏪ 时间回溯", self.open_timeline_dialog)
+        self.dynamic_button = tk.Button(bottom_bar, text="▶️ 启动动态模式", command=self.toggle_dynamic_mode, bg="#d0f0d0", state="disabled")
         self.dynamic_button.pack(side="right", padx=5)
+        self.action_buttons.append(self.dynamic_button)
         tk.Button(bottom_bar, text="退出游戏", command=root.quit).pack(side="right", padx=5)
 
+        # 先让窗口画出来，再做市场与天气的初始计算 (_mark_first_frame 之后才调度 _finish_startup)
+        self.first_frame_ms = None
+        self.root.after_idle(self._mark_first_frame)
+
+    def _add_action_button(self, parent, text, command, side="left"):
+        btn = tk.Button(parent, text=text, command=command, state="disabled")
+        btn.pack(side=side, padx=5)
+        self.action_buttons.append(btn)
+        return btn
+
+    def _mark_first_frame(self):
+        """Runs once the event loop is idle: finishes the pending layout and redraw, then schedules _finish_startup."""
+        self.root.update_idletasks()
+        self.first_frame_ms = (time.perf_counter() - _PROCESS_START) * 1000
+        # after(0) 排在下一轮事件循环，首帧的绘制事件先处理完
+        self.root.after(0, self._finish_startup)
+
+    def _finish_startup(self):
+        from weather import WeatherDynamic
+        from market import Market
+        from plant import get_all_crop_data
+        from farm import Farm
+        from economy import Ledger
+        from game_state import StateStore
+        from telemetry import EventBus
+        from metrics import MetricsRecorder
+        from outbreak import OutbreakModel
+        from timeline import Timeline
+        import random
+
+        # 记录随机种子，操作记录才能被确定性地回放 (与 simulation.Simulation 的初始化顺序一致)
+        self.seed = random.randrange(2 ** 31)
+        random.seed(self.seed)
+        self.weather = WeatherDynamic(self.date)
+        self.market = Market()
+        self.market.update_prices(self.weather)
+        self.crop_data = get_all_crop_data()
+        self.ledger = Ledger(STATE_DB)
+        self.state_store = StateStore(STATE_DB)
+        self.events = EventBus()  # 结构化事件，供导出和图表订阅
+        self.metrics = MetricsRecorder()
+        self.outbreaks = OutbreakModel()
+        self.timeline = Timeline(TIMELINE_DAYS)
+        self.farm = Farm(funds=10000, num_fields=2, log=self.log, ledger=self.ledger,
+                         start_time=self.weather.time, events=self.events) # Start with two Fields
+        self.farm.automation.set_rules(DEFAULT_AUTOMATION_RULES)
+        self.action_log = None
+        self.start_action_log()
+
+        self.ready = True
+        for btn in self.action_buttons:
+            btn.config(state="normal")
+        self.on_tab_changed()
         self.update_info_bar()
         self.refresh_all()
 
+        ready_ms = (time.perf_counter() - _PROCESS_START) * 1000
+        level = "info" if ready_ms <= STARTUP_BUDGET_MS else "warn"
+        if self.first_frame_ms is not None:  # _finish_startup 总在 _mark_first_frame 之后运行，直接调用时除外
+            self.log(f"⏱ 启动完成: 首帧 {self.first_frame_ms:.0f}ms, 可操作 {ready_ms:.0f}ms (预算 {STARTUP_BUDGET_MS}ms)", level)
+
+    def start_action_log(self):
+        """Starts a new action log from the current state (new game or loaded save)."""
+        from action_log import ActionLog
+        if self.action_log is not None:
+            self.action_log.close(self.weather.time)
+        self.action_log = ActionLog(ACTION_LOG_FILE, self.seed, [self.farm], self.weather.time)
+
+    def on_tab_changed(self, event=None):
+        if not self.ready:
+            return
+        tab = self.notebook.select()
+        if tab and tab not in self.built_tabs:
+            self.built_tabs.add(tab)
+            self.tab_builders[tab]()
+
+    def is_tab_built(self, tab):
+        return str(tab) in self.built_tabs
+
+    def build_market_tab(self):
+        self.market_text = tk.Text(self.tab_market, height=12, font=("Arial", 10))
+        self.market_text.pack(expand=True, fill="both")
+        self.refresh_market()
+
+    def build_finance_tab(self):
+        self.finance_text = tk.Text(self.tab_finance, height=12, font=("Arial", 10))
+        self.finance_text.pack(expand=True, fill="both")
+        self.refresh_finance()
+
+    def build_charts_tab(self):
+        from charts import ChartsView
+        self.charts_view = ChartsView(self.tab_charts, self.metrics, [p.name for p in self.view.market.products],
+                                      len(self.view.farm.fields))
+        self.charts_view.pack(expand=True, fill="both")
+
+    @property
+    def view(self):
+        """
+        What the Tk side reads (.farm, .weather, .market): the latest snapshot while the simulation
+        thread runs, the live state otherwise. Changes go through command().
+        """
+        return self.snapshot if self.sim_thread is not None else self
+
+    def on_tk(self, fn, *args):
+        """Runs fn(*args) on the Tk thread: now if already there, else at the next frame."""
+        if threading.current_thread() is self.tk_thread:
+            fn(*args)
+        else:
+            self.sim_thread.call_soon(fn, *args)
+
+    def command(self, fn, then=None):
+        """
+        Runs fn() against the live state and then(result) on the Tk thread. Without the simulation thread
+        both run right away (and fn's result is returned); with it fn runs between two simulated hours.
+        """
+        if self.sim_thread is not None:
+            self.sim_thread.submit(fn, then)
+            return None
+        result = fn()
+        if then is not None:
+            then(result)
+        return result
+
     def update_info_bar(self):
-        time_str = self.weather.time.strftime('%Y-%m-%d %H:%M')
-        weather_summary = f"🌡{self.weather.current_temperature}°C | ☀{self.weather.current_sunlight} | 💧{self.weather.current_rainfall}mm"
-        self.info_var.set(f"📅 {time_str}    💰 资金: ￥{self.funds:.2f}    {weather_summary}")
+        if not self.ready:
+            return
+        weather = self.view.weather
+        time_str = weather.time.strftime('%Y-%m-%d %H:%M')
+        weather_summary = f"🌡{weather.current_temperature}°C | ☀{weather.current_sunlight} | 💧{weather.current_rainfall}mm"
+        self.info_var.set(f"📅 {time_str}    💰 资金: ￥{self.view.farm.funds:.2f}    {weather_summary}")
 
     def log(self, msg, level="info"):
-        ts = self.weather.time.strftime("%H:%M")
+        ts = self.weather.time.strftime("%H:%M") if self.weather else "--:--"
         prefix = {"info": "INFO", "warn": "WARN", "error": "ERROR"}.get(level, "INFO")
         entry = f"[{prefix} {ts}] {msg}\n"
+        self.on_tk(self._append_log, entry)
+
+    def _append_log(self, entry):
         self.log_box.insert("end", entry)
+        self.log_lines += entry.count("\n")
+        if self.log_lines > MAX_LOG_LINES * 1.1:  # 成批删除，避免每行都删
+            excess = self.log_lines - MAX_LOG_LINES
+            self.log_box.delete("1.0", f"{excess + 1}.0")
+            self.log_lines -= excess
         self.log_box.see("end")
 
     def setup_field_grid(self):
-        for widget in self.tab_fields.winfo_children():
-            widget.destroy()
-        self.field_buttons.clear()
-
-        grid = tk.Frame(self.tab_fields)
-        grid.pack(expand=True, fill="both", padx=10, pady=10)
-        
-        num_fields = len(self.fields)
-        for i in range(num_fields):
-            btn = tk.Button(
-                grid, text=f"田地 {i+1}\n（空地）", width=25, height=7,
-                relief="groove", bg="#e0ffe0", font=("Arial", 10, "bold"),
-                command=lambda idx=i: self.on_field_click(idx), justify="left", anchor="nw",
-                wraplength=180
-            )
-            btn.grid(row=i//3, column=i % 3, padx=10, pady=10, sticky="nsew")
-            self.field_buttons.append(btn)
-
-        if num_fields < 9:
-            buy_button = tk.Button(
-                grid, text=f"购买新田地\n价格: ￥{self.get_next_field_price()}",
-                width=25, height=7, relief="groove", bg="#d0e0f0",
-                font=("Arial", 10, "bold"), command=self.buy_field
-            )
-            buy_button.grid(row=num_fields//3, column=num_fields % 3, padx=10, pady=10, sticky="nsew")
-
-        for i in range(3):
-            grid.grid_rowconfigure(i, weight=1)
-            grid.grid_columnconfigure(i, weight=1)
-
-    def get_next_field_price(self):
-        return self.field_base_price * (1.5 ** (len(self.fields) - 1))
+        from field_grid import FieldGridView
+        if self.field_grid is None:
+            self.field_grid = FieldGridView(self.tab_fields, on_click=self.on_field_click, on_buy=self.buy_field)
+            self.field_grid.pack(expand=True, fill="both")
+        farm = self.view.farm
+        self.field_grid.set_fields(farm.fields, farm.get_next_field_price(), len(farm.fields) < farm.MAX_FIELDS)
 
     def buy_field(self):
-        price = self.get_next_field_price()
-        if self.funds < price:
-            messagebox.showerror("资金不足", f"购买新田地需要 ￥{price:.2f}")
+        price = self.view.farm.get_next_field_price()
+        if messagebox.askquestion("确认购买", f"确定要花费 ￥{price:.2f} 购买一块新田地吗?") != "yes":
             return
-        
-        if messagebox.askquestion("确认购买", f"确定要花费 ￥{price:.2f} 购买一块新田地吗?") == "yes":
-            self.funds -= price
-            self.fields.append(Field())
-            self.log(f"成功购买了一块新田地，花费 ￥{price:.2f}", "info")
-            self.setup_field_grid()
+
+        def done(result):
+            success, message = result
+            if not success:
+                messagebox.showerror("无法购买", message)
+                return
+            self.log(message, "info")
             self.refresh_all()
 
+        self.command(lambda: self.farm.buy_field(), done)
+
     def on_field_click(self, idx):
-        field = self.fields[idx]
+        field = self.view.farm.fields[idx]
         if not field.crop:
             if messagebox.askquestion("播种", f"田地 {idx+1} 是空的, 是否现在播种?") == "yes":
                 self.manual_plant(idx)
@@ -158,7 +291,7 @@ class FarmerSimGUI:
             self.show_crop_details(idx)
 
     def show_crop_details(self, idx):
-        field = self.fields[idx]
+        field = self.view.farm.fields[idx]
         crop = field.crop
         win = tk.Toplevel(self.root)
         win.title(f"田地 {idx+1} 详情")
@@ -175,9 +308,7 @@ class FarmerSimGUI:
 
         if crop.dead or crop.harvested:
             if messagebox.askquestion("清理田地", "作物已死亡或收获, 是否清理这块田地?") == "yes":
-                field.clear_field()
-                self.log(f"田地 {idx+1} 已被清理。")
-                self.refresh_all()
+                self.command(lambda: self.farm.clear_field(idx), lambda result: self._log_and_refresh(result[1]))
             win.destroy()
             return
 
@@ -199,31 +330,25 @@ class FarmerSimGUI:
             tk.Button(btn_frame, text=text, command=create_action(action), width=12).pack(pady=3)
 
     def apply_direct_field_action(self, idx, action):
-        field = self.fields[idx]
-        crop = field.crop
-        if not crop or crop.dead or crop.harvested:
-            self.log("无效操作: 作物不存在或已处理。", "warn")
-            return
-
-        action_costs = {"water": 10, "pesticide": 120}
-        cost = action_costs.get(action, 0)
-        action_cn = {"water": "浇水", "pesticide": "喷药"}.get(action, action)
-
-        if self.funds < cost:
-            self.log(f"资金不足! 操作 '{action_cn}' 需要 ￥{cost:.2f}", "error")
-            return
-
         if action == "harvest":
             self.manual_harvest(idx)
             return
 
-        self.funds -= cost
-        crop.apply_manual_action(action)
-        self.log(f"在田地 {idx+1} 上执行了 '{action_cn}' 操作, 花费 ￥{cost:.2f}")
+        def done(result):
+            success, message = result
+            if not success:
+                self.log(message, "error" if "资金不足" in message else "warn")
+                return
+            self._log_and_refresh(message)
+
+        self.command(lambda: self.farm.apply_action(idx, action), done)
+
+    def _log_and_refresh(self, message, level="info"):
+        self.log(message, level)
         self.refresh_all()
 
     def manual_plant(self, idx):
-        field = self.fields[idx]
+        field = self.view.farm.fields[idx]
         if field.crop:
             messagebox.showerror("错误", "这块田地已经种上作物了。")
             return
@@ -243,18 +368,16 @@ class FarmerSimGUI:
 
         def plant_action(crop_name):
             crop_data = self.crop_data[crop_name]
-            cost = crop_data.cost_per_mu
-            if self.funds < cost:
-                messagebox.showerror("资金不足", f"播种 {crop_name} 需要 ￥{cost:.2f}", parent=win)
-                return
-            
-            if field.plant_crop(crop_data, self.weather.date.timetuple().tm_yday):
-                self.funds -= cost
-                self.log(f"在田地 {idx+1} 成功播种 {crop_name}, 花费 ￥{cost:.2f}")
-                self.refresh_all()
-                win.destroy()
-            else:
-                messagebox.showerror("错误", "无法播种，请稍后再试。", parent=win)
+
+            def done(result):
+                success, message = result
+                if success:
+                    self._log_and_refresh(message)
+                    win.destroy()
+                else:
+                    messagebox.showerror("无法播种", message, parent=win)
+
+            self.command(lambda: self.farm.plant(idx, crop_data, self.weather.date.timetuple().tm_yday), done)
 
         for name, crop_data in self.crop_data.items():
             frame = tk.Frame(scrollable_frame, borderwidth=2, relief="groove", padx=5, pady=5)
@@ -267,20 +390,12 @@ class FarmerSimGUI:
         scrollbar.pack(side="right", fill="y")
 
     def manual_harvest(self, idx):
-        field = self.fields[idx]
-        if not field.crop: return
-        result = field.crop.harvest()
-        if result:
-            self.storage.add_crop(result)
-            field.clear_field()
-            tags = f" (品质: {', '.join(result['quality_tags'])})" if result['quality_tags'] else ""
-            self.log(f"🎉 成功收获 {result['name']}! 产量: {result['yield']}kg{tags}")
-        else:
-            self.log("无法收获: 作物未成熟, 或已死亡/收获。", "warn")
-        self.refresh_all()
+        if not self.view.farm.fields[idx].crop: return
+        self.command(lambda: self.farm.harvest(idx),
+                     lambda result: self._log_and_refresh(result[1], "info" if result[0] else "warn"))
 
     def show_weather(self):
-        self.log("天气预报: " + self.weather.summary())
+        self.log("天气预报: " + self.view.weather.summary())
 
     def refresh_all(self):
         self.update_info_bar()
@@ -288,42 +403,70 @@ class FarmerSimGUI:
         self.refresh_market()
         self.refresh_storage()
         self.refresh_finance()
+        self.refresh_charts()
 
-    def refresh_field(self):
-        for i, field in enumerate(self.fields):
-            btn = self.field_buttons[i]
-            status_text = field.status()
-            
-            bg_color = "#c8e6c9"
-            if field.crop:
-                if field.crop.dead:
-                    bg_color = "#a0a0a0"
-                elif field.crop.harvested:
-                    bg_color = "#bbdefb"
-                elif field.crop.damage_reasons:
-                    bg_color = "#ffcdd2"
-                else:
-                    bg_color = "#fff9c4"
+    def refresh_charts(self):
+        if self.charts_view is None:
+            return
+        self.charts_view.set_field_count(len(self.view.farm.fields))
+        self.charts_view.refresh()
 
-            btn.config(text=f"田地 {i+1}\n{status_text}", bg=bg_color)
+    def refresh_field(self):
+        if self.field_grid is None:
+            return
+        fields = self.view.farm.fields
+        if len(fields) != len(self.field_grid.fields):
+            self.setup_field_grid()
+        else:
+            self.field_grid.replace_fields(fields)
+        self.field_grid.refresh()
 
     def refresh_market(self):
+        if self.market_text is None:
+            return
         self.market_text.delete("1.0", "end")
-        for p in self.market.products:
-            self.market_text.insert("end", f"{p.info()}\n")
+        ranges = self.current_reports()["prices"]
+        for p in self.view.market.products:
+            sold = f"  (今日已售 {p.sold_today:.0f}{p.unit})" if p.sold_today else ""
+            low, high = ranges.get(p.name, (p.price, p.price))
+            self.market_text.insert("end", f"{p.info()}{sold}  近{PRICE_HISTORY_DAYS}天 ￥{low:.2f}~￥{high:.2f}\n")
 
     def refresh_storage(self):
+        if not self.is_tab_built(self.tab_storage):
+            return
         for widget in self.tab_storage.winfo_children():
             widget.destroy()
 
         op_frame = tk.Frame(self.tab_storage)
         op_frame.pack(fill="x", pady=5)
         tk.Button(op_frame, text="一键出售所有作物", command=self.sell_crop).pack(side="left", padx=10)
+        tk.Button(op_frame, text=f"出售新鲜度低于{STALE_FRESHNESS}%的批次", command=self.sell_stale_lots).pack(side="left", padx=10)
 
-        if not self.storage.stock:
+        storage = self.view.farm.storage
+        market = self.view.market
+        if not storage.stock:
             tk.Label(self.tab_storage, text="📦 仓库为空").pack(pady=20)
             return
 
+        valuation = storage.valuation
+        summary = "  ".join(
+            f"{crop.name}: {crop.lots}批 {crop.weight:.0f}kg 估值￥{crop.value:.0f} 利润￥{crop.profit:.0f}"
+            + (f" ⚠{crop.at_risk}批有风险" if crop.at_risk else "")
+            for crop in valuation.summary(market)
+        )
+        tk.Label(self.tab_storage, text=f"💰 库存估值 ￥{valuation.total(market):.2f}  {summary}",
+                 anchor="w", justify="left", wraplength=880).pack(fill="x", padx=10)
+        capacity = "  ".join(
+            f"{tier}: {storage.used(tier):.0f}/{spec['capacity']:.0f}kg" if spec["capacity"] is not None
+            else f"{tier}: {storage.used(tier):.0f}kg"
+            for tier, spec in storage.tiers.items()
+        )
+        tk.Label(self.tab_storage, text=f"🏠 仓库 {capacity}", anchor="w").pack(fill="x", padx=10)
+        inventory = self.current_reports()["inventory"]
+        stock = "  ".join(f"{name}: 平均新鲜度 {freshness:.0f}% 在田 {growing}块"
+                          for name, _lots, _weight, freshness, growing in inventory)
+        tk.Label(self.tab_storage, text=f"📊 {stock}", anchor="w", justify="left", wraplength=880).pack(fill="x", padx=10)
+
         canvas = tk.Canvas(self.tab_storage)
         scrollbar = ttk.Scrollbar(self.tab_storage, orient="vertical", command=canvas.yview)
         scrollable_frame = ttk.Frame(canvas)
@@ -331,9 +474,12 @@ class FarmerSimGUI:
         canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
         canvas.configure(yscrollcommand=scrollbar.set)
 
-        for i, crop in enumerate(self.storage.stock):
+        rows = valuation.lots(market)
+        for i, (crop, row) in enumerate(zip(storage.stock, rows)):
             tags = f" ({', '.join(crop['quality_tags'])})" if crop.get('quality_tags') else ""
-            btn_text = f"{crop['name']}{tags} ({crop['yield']}kg)\n新鲜度: {crop['freshness']:.0f}% | 营养: {crop['nutrition']}"
+            btn_text = (f"{'⚠ ' if row.at_risk else ''}{crop['name']}{tags} ({crop['yield']}kg) [{crop['tier']}] "
+                        f"估值￥{row.value:.0f}\n"
+                        f"新鲜度: {crop['freshness']:.0f}% | 营养: {crop['nutrition']} | 存放 {crop['days']} 天")
             tk.Button(
                 scrollable_frame, text=btn_text, justify="left",
                 command=lambda idx=i: self.show_storage_item_details(idx)
@@ -343,45 +489,140 @@ class FarmerSimGUI:
         scrollbar.pack(side="right", fill="y")
 
     def show_storage_item_details(self, idx):
-        crop = self.storage.stock[idx]
+        storage = self.view.farm.storage
+        crop = storage.stock[idx]
         win = tk.Toplevel(self.root)
         win.title(f"出售详情: {crop['name']}")
-        win.geometry("320x280")
+        win.geometry("340x340")
 
-        market_price = self.market.get_price(crop['name'])
-        
-        quality_bonus = 1.0 + (len(crop.get('quality_tags', [])) * 0.25)
+        from valuation import quality_bonus
+        market_price = self.view.market.get_price(crop['name'])
+        row = storage.valuation.lot(self.view.market, idx)  # 成交均价含抛售滑点
         tags_str = f" ({', '.join(crop['quality_tags'])})" if crop.get('quality_tags') else ""
-
-        multiplier = (crop['nutrition'] * 0.5 + crop['freshness'] * 0.5) / 100
-        estimated_value = round(crop['yield'] * market_price * multiplier * quality_bonus, 2)
-        profit = estimated_value - crop.get('cost', 0)
+        if row.break_even_days is None:
+            break_even = "不会跌破成本"
+        elif row.break_even_days <= 0:
+            break_even = "已低于成本"
+        else:
+            break_even = f"约 {row.break_even_days:.1f} 天后"
 
         details = f"作物: {crop['name']}{tags_str}\n"
-        details += f"重量: {crop['yield']} kg\n"
+        details += f"重量: {crop['yield']} kg | 仓库: {crop['tier']} | 合并批次: {crop.get('harvests', 1)}\n"
         details += f"新鲜度: {crop['freshness']:.1f}% | 营养值: {crop['nutrition']}\n\n"
         details += f"--- 财务信息 ---\n"
-        details += f"市场价: ￥{market_price:.2f}/kg\n"
-        details += f"品质加成: {quality_bonus:.2f}x\n"
-        details += f"总成本: ￥{crop.get('cost', 0):.2f}\n"
-        details += f"预估售价: ￥{estimated_value:.2f}\n"
-        details += f"预估利润: ￥{profit:.2f}"
+        details += f"市场价: ￥{market_price:.2f}/kg | 成交均价: ￥{row.unit_price:.2f}/kg\n"
+        details += f"品质加成: {quality_bonus(crop):.2f}x\n"
+        details += f"总成本: ￥{row.cost:.2f}\n"
+        details += f"预估售价: ￥{row.value:.2f}\n"
+        details += f"预估利润: ￥{row.profit:.2f}\n"
+        details += f"保本期限: {break_even}" + (" ⚠" if row.at_risk else "")
 
         tk.Label(win, text=details, justify="left", padx=10, pady=10).pack(fill="x")
         
+        lot_id = crop['lot_id']  # 后台模拟期间批次的位置可能变化，按批次号找回
+
         def sell_action():
-            self.sell_crop(idx)
+            self.sell_crop(lot_id=lot_id)
             win.destroy()
 
         tk.Button(win, text=f"以此价格出售", command=sell_action).pack(pady=10)
 
+        def move_action(tier):
+            def move():
+                index = self._lot_index(lot_id)
+                return self.farm.move_lot(index, tier) if index is not None else (False, "该批次已不在仓库中。")
+            self.command(move, lambda result: self._log_and_refresh(result[1], "info" if result[0] else "warn"))
+            win.destroy()
+
+        move_frame = tk.Frame(win)
+        move_frame.pack()
+        for tier in storage.tiers:
+            if tier != crop['tier']:
+                tk.Button(move_frame, text=f"移入{tier}", command=lambda t=tier: move_action(t)).pack(side="left", padx=5)
+
     def refresh_finance(self):
+        if self.finance_text is None:
+            return
         self.finance_text.delete("1.0", "end")
-        status = self.loan_manager.get_status()
-        self.finance_text.insert("end", f"--- 贷款与信用 ---\n{status}")
+        loan_manager = self.view.farm.loan_manager
+        status = loan_manager.get_status()
+        self.finance_text.insert("end", f"--- 贷款与信用 ---\n{status}\n")
+        self.finance_text.insert("end", f"新借款年利率: {loan_manager.interest_rate:.1%} | 下次还款日应还: ￥{loan_manager.amount_due():.2f}\n")
+        if loan_manager.overdue_balance > 0:
+            self.finance_text.insert("end", f"⚠ 逾期欠款: ￥{loan_manager.overdue_balance:.2f}\n")
+
+        self.finance_text.insert("end", "\n--- 借款明细 ---\n")
+        for loan in loan_manager.loans:
+            installment = loan.schedule[loan.paid_periods][0]
+            self.finance_text.insert("end", (
+                f"#{loan.loan_id} 本金 ￥{loan.principal:.2f} | 年利率 {loan.annual_rate:.1%} | "
+                f"已还 {loan.paid_periods}/{loan.term_months} 期 | 每期 ￥{installment:.2f} | "
+                f"剩余本金 ￥{loan.remaining_principal:.2f}\n"
+            ))
+
+        projection = loan_manager.project_debt(12, self.view.farm.funds, 0.0)
+        if projection:
+            funds_after, debt_after = projection[-1]
+            self.finance_text.insert("end", (
+                f"\n--- 预测 (无额外收入) ---\n12个月后: 资金 ￥{funds_after:.2f} | 债务 ￥{debt_after:.2f}\n"
+            ))
+
+        self.finance_text.insert("end", self.view.ledger if self.sim_thread is not None else self.ledger_summary())
+
+    def ledger_summary(self):
+        """The ledger part of the finance tab. Reads the live ledger, so the simulation thread builds it for snapshots."""
+        from economy import CATEGORY_NAMES
+        lines = []
+        key = self.farm.book_key
+        lines.append(f"\n--- 账本 (余额 ￥{self.ledger.balance(key):.2f}) ---\n")
+        for category, (amount, count) in sorted(self.ledger.pnl_by_category(key).items(), key=lambda item: item[1][0]):
+            if category == "opening":
+                continue
+            lines.append(f"{CATEGORY_NAMES.get(category, category)}: ￥{amount:+.2f} ({count}笔)\n")
+
+        by_crop = self.ledger.pnl_by_crop(key)
+        if by_crop:
+            lines.append("\n--- 各作物损益 ---\n")
+            for crop, amounts in sorted(by_crop.items(), key=lambda item: -sum(item[1].values())):
+                income = amounts.get("sale", 0.0)
+                expense = sum(v for k, v in amounts.items() if k != "sale")
+                lines.append(
+                    f"{crop}: 收入 ￥{income:.2f} | 支出 ￥{-expense:.2f} | 净利 ￥{income + expense:+.2f}\n"
+                )
+
+        lines.append("\n--- 最近交易 ---\n")
+        for ts, category, ref, crop, amount, balance in self.ledger.recent(key, 10):
+            detail = " ".join(part for part in (ref, crop) if part)
+            lines.append(
+                f"[{ts}] {CATEGORY_NAMES.get(category, category)} {detail} ￥{amount:+.2f} → ￥{balance:.2f}\n"
+            )
+        return "".join(lines)
+
+    def current_reports(self):
+        """store_reports() for the Tk side: the latest snapshot's while the simulation thread runs."""
+        if self.sim_thread is None:
+            return self.store_reports()
+        return self.view.reports or {"inventory": [], "prices": {}}  # 页面在本快照之后才建好
+
+    def store_reports(self):
+        """
+        Storage and market figures queried from the state DB: {"inventory": [(作物, 批数, 重量, 平均新鲜度, 在田块数)],
+        "prices": {作物: (最低, 最高)}}. Touches the state store, so the simulation thread builds it for snapshots.
+        """
+        self.checkpoint_state()
+        key = self.farm.ledger_key
+        inventory = [(name, lots, weight, freshness, len(self.state_store.crops_by_name(key, name)))
+                     for name, lots, weight, freshness in self.state_store.inventory_summary(key)]
+        since = (self.weather.time - timedelta(days=PRICE_HISTORY_DAYS)).strftime("%Y-%m-%d")
+        prices = {}
+        for product in self.market.products:
+            history = [price for _day, price in self.state_store.price_history(product.name, since)]
+            if history:
+                prices[product.name] = (min(history), max(history))
+        return {"inventory": inventory, "prices": prices}
 
     def plant_crop(self):
-        empty_indices = [i for i, f in enumerate(self.fields) if f.crop is None]
+        empty_indices = [i for i, f in enumerate(self.view.farm.fields) if f.crop is None]
         if not empty_indices:
             messagebox.showinfo("提示", "所有田地都已种植。")
             return
@@ -406,74 +647,153 @@ class FarmerSimGUI:
     def apply_field_action(self, action):
         idx = self._prompt_for_field(
             f"执行 '{action}'",
-            lambda: [i for i, f in enumerate(self.fields) if f.crop and not f.crop.dead and not f.crop.harvested]
+            lambda: [i for i, f in enumerate(self.view.farm.fields) if f.crop and not f.crop.dead and not f.crop.harvested]
         )
         if idx is not None:
             self.apply_direct_field_action(idx, action)
 
     def apply_fertilizer_action(self, nutrient_type):
-        cost = 50
-        if self.funds < cost:
+        from farm import ACTION_COSTS
+        cost = ACTION_COSTS["fertilize"]
+        if self.view.farm.funds < cost:
             messagebox.showerror("资金不足", f"施肥需要 ￥{cost:.2f}")
             return
 
         idx = self._prompt_for_field(
             f"施加 {nutrient_type} 肥",
-            lambda: [i for i, f in enumerate(self.fields)]
+            lambda: [i for i, f in enumerate(self.view.farm.fields)]
         )
         if idx is not None:
-            self.funds -= cost
-            message = self.fields[idx].apply_fertilizer(nutrient_type)
-            self.log(f"在田地 {idx+1} {message} 花费 ￥{cost:.2f}", "info")
-            self.refresh_all()
+            self.command(lambda: self.farm.fertilize(idx, nutrient_type),
+                         lambda result: self._log_and_refresh(result[1], "info" if result[0] else "error"))
 
     def harvest_crop(self):
         idx = self._prompt_for_field(
             "收获作物",
-            lambda: [i for i, f in enumerate(self.fields) if f.crop and f.crop.matured and not f.crop.dead and not f.crop.harvested]
+            lambda: [i for i, f in enumerate(self.view.farm.fields) if f.crop and f.crop.matured and not f.crop.dead and not f.crop.harvested]
         )
         if idx is not None:
             self.manual_harvest(idx)
 
-    def sell_crop(self, index_to_sell=None):
-        if not self.storage.stock:
+    def open_bulk_dialog(self):
+        from farm import FIELD_SELECTORS, ACTION_NAMES, select_fields
+
+        win = tk.Toplevel(self.root)
+        win.title("批量操作")
+        win.geometry("380x300")
+
+        actions = {
+            "💧 浇水": ("water", None),
+            "🧴 喷药": ("pesticide", None),
+            "施氮肥(N)": ("fertilize", "N"),
+            "施磷肥(P)": ("fertilize", "P"),
+            "施钾肥(K)": ("fertilize", "K"),
+            "🎉 收获": ("harvest", None),
+        }
+
+        tk.Label(win, text="操作:").pack(anchor="w", padx=10, pady=(10, 0))
+        action_var = tk.StringVar(value=next(iter(actions)))
+        ttk.Combobox(win, textvariable=action_var, values=list(actions), state="readonly").pack(fill="x", padx=10)
+
+        tk.Label(win, text="选择田地:").pack(anchor="w", padx=10, pady=(10, 0))
+        selector_var = tk.StringVar(value=next(iter(FIELD_SELECTORS)))
+        ttk.Combobox(win, textvariable=selector_var, values=list(FIELD_SELECTORS), state="readonly").pack(fill="x", padx=10)
+
+        preview_var = tk.StringVar()
+        tk.Label(win, textvariable=preview_var, justify="left", wraplength=350).pack(fill="x", padx=10, pady=10)
+
+        def selected_indices():
+            return select_fields(self.view.farm.fields, FIELD_SELECTORS[selector_var.get()])
+
+        def update_preview(*_):
+            indices = selected_indices()
+            action, _nutrient = actions[action_var.get()]
+            if indices:
+                preview_var.set(f"将对 {len(indices)} 块田地{ACTION_NAMES[action]}: {', '.join(str(i + 1) for i in indices)}")
+            else:
+                preview_var.set("没有符合条件的田地。")
+
+        action_var.trace_add("write", update_preview)
+        selector_var.trace_add("write", update_preview)
+        update_preview()
+
+        def run():
+            action, nutrient_type = actions[action_var.get()]
+            self.apply_bulk_action(selected_indices(), action, nutrient_type)
+            win.destroy()
+
+        tk.Button(win, text="执行", command=run).pack(pady=5)
+
+    def apply_bulk_action(self, indices, action, nutrient_type=None):
+        def done(result):
+            if not result.ok:
+                self.log(result.summary(), "error" if result.cost else "warn")
+                return
+            self._log_and_refresh(result.summary(nutrient_type))
+
+        return self.command(lambda: self.farm.bulk_action(indices, action, nutrient_type), done)
+
+    def _lot_index(self, lot_id):
+        """Current position of a lot in the live storage (None if it has been sold or merged)."""
+        return next((i for i, lot in enumerate(self.farm.storage.stock) if lot["lot_id"] == lot_id), None)
+
+    def sell_crop(self, index_to_sell=None, lot_id=None):
+        stock = self.view.farm.storage.stock
+        if not stock:
             self.log("仓库是空的。", "warn")
             return
 
-        if index_to_sell is None:
+        if index_to_sell is None and lot_id is None:
             if messagebox.askquestion("一键出售", "确定要出售仓库里所有的作物吗?") != "yes":
                 return
-            
-            total_revenue = 0
-            num_sold = len(self.storage.stock)
-            
-            for i in range(len(self.storage.stock) - 1, -1, -1):
-                crop = self.storage.stock[i]
-                price = self.market.get_price(crop['name'])
-                quality_bonus = 1.0 + (len(crop.get('quality_tags', [])) * 0.25)
-                name, value = self.storage.sell_crop(i, price, quality_bonus)
-                self.funds += value
-                total_revenue += value
-            
-            self.log(f"💰 一键出售完成! 共售出 {num_sold}批作物, 总收入 ￥{total_revenue:.2f}", "info")
+            self.command(lambda: self.farm.sell_all(self.market), lambda result: self._log_and_refresh(
+                f"💰 一键出售完成! 共售出 {result[0]}批作物, 总收入 ￥{result[1]:.2f}"))
+            return
 
-        else:
+        if lot_id is None:
             try:
                 idx = int(index_to_sell)
-                if not (0 <= idx < len(self.storage.stock)): raise ValueError
-                crop = self.storage.stock[idx]
-                price = self.market.get_price(crop['name'])
-                quality_bonus = 1.0 + (len(crop.get('quality_tags', [])) * 0.25)
-                name, value = self.storage.sell_crop(idx, price, quality_bonus)
-                self.funds += value
-                self.log(f"💰 成功出售 {name}, 获得 ￥{value:.2f}")
+                if not (0 <= idx < len(stock)): raise ValueError
+                lot_id = stock[idx]["lot_id"]
             except (ValueError, TypeError):
                 self.log("无效的编号。", "error")
-        
-        self.refresh_all()
+                return
+
+        def sell():
+            index = self._lot_index(lot_id)
+            return self.farm.sell_lot(index, self.market) if index is not None else None
+
+        def done(result):
+            if result is None:
+                self.log("该批次已不在仓库中。", "warn")
+                return
+            name, value = result
+            self._log_and_refresh(f"💰 成功出售 {name}, 获得 ￥{value:.2f}")
+
+        self.command(sell, done)
+
+    def sell_stale_lots(self):
+        def sell():
+            self.checkpoint_state()
+            stale = set(self.state_store.lots_below_freshness(self.farm.ledger_key, STALE_FRESHNESS))
+            indices = [i for i, lot in enumerate(self.farm.storage.stock) if lot["lot_id"] in stale]
+            return self.farm.sell_lots(indices, self.market) if indices else None
+
+        def done(sold):
+            if not sold:
+                self.log(f"没有新鲜度低于{STALE_FRESHNESS}%的批次。", "info")
+                return
+            revenue = sum(value for _name, value, _lot_id in sold)
+            self._log_and_refresh(f"💰 清仓完成! 共售出 {len(sold)}批不新鲜的作物, 总收入 ￥{revenue:.2f}")
+
+        self.command(sell, done)
+
+    def checkpoint_state(self):
+        """Writes the rows that changed since the last checkpoint to the state DB (one transaction)."""
+        self.state_store.checkpoint(self.farm, self.weather.time, self.market)
 
     def next_day(self):
-        if self.timer_running:
+        if self.timer_running or self.sim_thread is not None:
             self.log("请先暂停动态模式。", "warn")
             return
         self.log("--- 新的一天开始了 ---", "info")
@@ -483,140 +803,140 @@ class FarmerSimGUI:
         self.refresh_all()
 
     def save_game(self):
-        data = {
-            "date": self.weather.time.strftime("%Y-%m-%d %H:%M:%S"),
-            "funds": self.funds,
-            "fields": [],
-            "storage": self.storage.stock,
-            "loan_info": {
-                "total_debt": self.loan_manager.total_debt,
-                "credit_score": self.loan_manager.credit_score
-            }
-        }
-        
-        for field in self.fields:
-            field_data = {"soil_npk": field.soil_npk, "crop": None}
-            if field.crop:
-                crop = field.crop
-                field_data["crop"] = {
-                    "crop_data_name": crop.crop_data.name,
-                    "planted_day": crop.planted_day,
-                    "day_counter": crop.day_counter,
-                    "hour_counter": crop.hour_counter,
-                    "growth_points": crop.growth_points,
-                    "matured": crop.matured,
-                    "dead": crop.dead,
-                    "harvested": crop.harvested,
-                    "health": crop.health,
-                    "water_level": crop.water_level,
-                    "sun_stress": crop.sun_stress,
-                    "nutrient_satisfaction": crop.nutrient_satisfaction,
-                    "quality_tags": list(crop.quality_tags),
-                    "pesticide_effect_hours": crop.pesticide_effect_hours,
-                    "damage_reasons": list(crop.damage_reasons),
-                    "total_cost": crop.total_cost,
-                }
-            data["fields"].append(field_data)
+        from game_state import save_to_dict, write_save
+        log_text = self.log_box.get("1.0", "end")
 
-        try:
-            with open(SAVE_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            with open(LOG_FILE, "w", encoding="utf-8") as f:
-                f.write(self.log_box.get("1.0", "end"))
-            self.log("💾 游戏已保存。", "info")
-        except Exception as e:
-            self.log(f"❌ 保存失败: {e}", "error")
+        def save():
+            try:
+                write_save(SAVE_FILE, save_to_dict(self.farm, self.weather.time))
+                with open(LOG_FILE, "w", encoding="utf-8") as f:
+                    f.write(log_text)
+                self.ledger.flush()
+                self.action_log.flush()
+                self.checkpoint_state()
+            except Exception as e:
+                return e
+            return None
+
+        def done(error):
+            if error is None:
+                self.log("💾 游戏已保存。", "info")
+            else:
+                self.log(f"❌ 保存失败: {error}", "error")
+
+        self.command(save, done)
 
     def load_game(self):
+        if self.sim_thread is not None:
+            self.log("请先暂停动态模式。", "warn")
+            return
         if not os.path.exists(SAVE_FILE):
             self.log("没有找到存档文件。", "warn")
             return
+        import random
+        from weather import WeatherDynamic
+        from market import Market
+        from game_state import load_from_dict, read_save
         try:
-            with open(SAVE_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
+            data = read_save(SAVE_FILE)
+            # 读档时重新播种并重建天气和市场，顺序与 Simulation.from_saves 一致，新的操作记录才能回放
+            self.seed = random.randrange(2 ** 31)
+            random.seed(self.seed)
             self.date = datetime.strptime(data["date"], "%Y-%m-%d %H:%M:%S")
             self.weather = WeatherDynamic(self.date)
+            self.market = Market()
+            self.market.update_prices(self.weather)
             self.weather.time = self.date
-            
-            self.funds = data["funds"]
-            self.storage.stock = data["storage"]
-            
-            if "loan_info" in data:
-                self.loan_manager.total_debt = data["loan_info"].get("total_debt", 30000)
-                self.loan_manager.credit_score = data["loan_info"].get("credit_score", 100)
-            
-            self.fields = []
-            from crops import CropInstance
-            for field_data in data["fields"]:
-                new_field = Field()
-                new_field.soil_npk = field_data["soil_npk"]
-                if field_data.get("crop"):
-                    crop_save_data = field_data["crop"]
-                    crop_data_name = crop_save_data["crop_data_name"]
-                    crop_data = self.crop_data[crop_data_name]
-                    
-                    new_crop = CropInstance(crop_data, crop_save_data["planted_day"], new_field)
-                    
-                    for key, value in crop_save_data.items():
-                        if key == "damage_reasons" or key == "quality_tags":
-                            setattr(new_crop, key, set(value))
-                        elif key not in ["crop_data_name", "field"]:
-                            setattr(new_crop, key, value)
-                    new_field.crop = new_crop
-                self.fields.append(new_field)
+            self.farm.open_book()  # 读档是一局新游戏：存档里的资金作为新账簿的期初资金
+            load_from_dict(data, self.farm, self.crop_data)
+            self.timeline.clear()
+            self.start_action_log()
 
-            self.setup_field_grid()
-            self.market.update_prices(self.weather)
+            if self.is_tab_built(self.tab_fields):
+                self.setup_field_grid()
             self.log("📂 游戏已加载。", "info")
             self.refresh_all()
         except Exception as e:
             self.log(f"❌ 加载失败: {e}", "error")
 
     def toggle_dynamic_mode(self):
+        from sim_thread import SimulationThread
+        if not self.dynamic_mode and self.sim_thread is not None:
+            self.log("上一次的动态模式还在停止中，请稍候。", "warn")
+            return
         self.dynamic_mode = not self.dynamic_mode
         if self.dynamic_mode:
-            self.log("▶️ 动态模式已启动。游戏将每2.5秒更新一小时。", "info")
+            self.log(f"▶️ 动态模式已启动。模拟在后台运行，每{DYNAMIC_HOUR_SECONDS}秒更新一小时。", "info")
             self.dynamic_button.config(text="⏸️ 暂停动态模式", bg="#f0d0d0")
             self.timer_running = True
-            self.root.after(2500, self.update_dynamic_hour)
+            self.sim_thread = SimulationThread(self.update_hour_logic, self.build_snapshot, DYNAMIC_HOUR_SECONDS,
+                                               on_error=self.on_simulation_error)
+            self.snapshot = self.sim_thread.start().latest
+            self.root.after(FRAME_MS, self.render_frame)
         else:
             self.log("⏸️ 动态模式已暂停。", "info")
-            self.dynamic_button.config(text="▶️ 启动动态模式", bg="#d0f0d0")
-            self.timer_running = False
+            self.stop_dynamic_mode()
+
+    def stop_dynamic_mode(self):
+        """Asks the simulation thread to stop; render_frame hands the live state back to Tk once it has."""
+        self.dynamic_mode = False
+        self.timer_running = False
+        self.dynamic_button.config(text="▶️ 启动动态模式", bg="#d0f0d0")
+        if self.sim_thread is not None:
+            self.sim_thread.stop()
+
+    def build_snapshot(self, version):
+        """Detached copy of the live state for the Tk thread (runs on the simulation thread)."""
+        from sim_thread import Snapshot, copy_farm, copy_weather, copy_market
+        reports = self.market_text is not None or self.is_tab_built(self.tab_storage)
+        return Snapshot(version, copy_farm(self.farm, self.weather.time, self.crop_data), copy_weather(self.weather),
+                        copy_market(self.market), self.ledger_summary() if self.finance_text is not None else None,
+                        self.store_reports() if reports else None)
+
+    def render_frame(self):
+        """Draws the latest snapshot at FRAME_MS intervals; never waits for the simulation thread."""
+        thread = self.sim_thread
+        if thread is None:
+            return
+        snapshot = thread.pump()
+        if thread.finished:
+            # 线程已退出，实时状态交还 Tk 线程
+            self.sim_thread = None
+            self.snapshot = None
+            self.rendered_version = None
+            if self.dynamic_mode:  # 出错停止
+                self.stop_dynamic_mode()
+            self.refresh_all()
+            return
+        if snapshot.version != self.rendered_version:
+            self.snapshot = snapshot
+            self.rendered_version = snapshot.version
+            self.refresh_all()
+        self.root.after(FRAME_MS, self.render_frame)
+
+    def on_simulation_error(self, error):
+        self.log(f"❌ 后台模拟出错: {error!r}", "error")
 
     def update_hour_logic(self):
         is_new_day = self.weather.is_new_day()
         if is_new_day:
-            if self.weather.time.day == self.loan_manager.repayment_day:
+            self.action_log.record_day([self.farm], self.market, self.weather.time)
+            if self.weather.time.day == self.farm.loan_manager.repayment_day:
                 self.handle_loan_payment()
 
-            self.weather.start_new_day(self.weather.time)
-            self.market.update_prices(self.weather)
+            from simulation import advance_world_day
+            # 与 Simulation.start_new_day 走同一个步骤，回放时随机数顺序一致 (单个地点，没有农场间连接)
+            key = self.farm.ledger_key
+            advance_world_day(self.weather, self.market, {key: self.farm}, {key: self.weather}, self.outbreaks,
+                              events=self.events)
             self.log('📈 市场价格已刷新。', "info")
-            fee = self.storage.update_all()
-            if fee > 0:
-                self.funds -= fee
-                self.log(f"📦 支付了仓储费 ￥{fee:.2f}", "info")
 
         self.weather.update_hour()
 
-        log_messages = []
-        for i, field in enumerate(self.fields):
-            if field.crop and not field.crop.dead and not field.crop.harvested:
-                old_reasons = set(field.crop.damage_reasons)
-                
-                field.crop.update_hourly(self.weather)
-                
-                new_reasons = set(field.crop.damage_reasons)
-                newly_added_reasons = new_reasons - old_reasons
-                if newly_added_reasons:
-                    log_messages.append(f"田地{i+1} ({field.crop.crop_data.name}) 出现问题: {', '.join(newly_added_reasons)}")
-
-                if field.crop.dead:
-                    self.log(f"田地{i+1} ({field.crop.crop_data.name}) 已经死亡。原因: {', '.join(field.crop.damage_reasons)}", "warn")
-                elif field.crop.matured and not old_reasons and field.crop.growth_points >= field.crop.crop_data.grow_days:
-                     self.log(f"田地{i+1} ({field.crop.crop_data.name}) 已经成熟，可以收获了！", "info")
+        log_messages = self.farm.update_hour(self.weather, self.market)
+        self.on_tk(self.metrics.record_sample, self.metrics.sample(self.farm, self.market), self.weather.time)
+        self.checkpoint_state()
+        self.timeline.record(self.farm, self.weather.time)
 
         if self.weather.time.hour % 6 == 0:
              log_messages.append(self.weather.summary())
@@ -624,54 +944,148 @@ class FarmerSimGUI:
         if log_messages:
             self.log("\n".join(log_messages), "warn" if any("问题" in m for m in log_messages) else "info")
 
-    def update_dynamic_hour(self):
-        if not self.timer_running:
+    def open_automation_dialog(self):
+        # 审计记录只在实时状态里，由模拟线程复制一份交回界面
+        self.command(lambda: list(self.farm.automation.audit)[-50:], self._show_automation_dialog)
+
+    def _show_automation_dialog(self, audit):
+        from automation import RuleError, compile_rules
+
+        automation = self.view.farm.automation
+        win = tk.Toplevel(self.root)
+        win.title("自动化规则")
+        win.geometry("520x520")
+
+        enabled_var = tk.BooleanVar(value=automation.enabled)
+        tk.Checkbutton(win, text="启用自动化 (每小时执行)", variable=enabled_var).pack(anchor="w", padx=10, pady=5)
+
+        tk.Label(win, text="规则 (每行一条: <操作> when <条件> and <条件>):", justify="left").pack(anchor="w", padx=10)
+        rules_text = tk.Text(win, height=8, font=("Arial", 10))
+        rules_text.pack(fill="x", padx=10)
+        rules_text.insert("1.0", "\n".join(automation.rule_texts))
+
+        tk.Label(win, text="最近的自动操作:", justify="left").pack(anchor="w", padx=10, pady=(10, 0))
+        audit_box = scrolledtext.ScrolledText(win, height=12, font=("Arial", 9))
+        audit_box.pack(fill="both", expand=True, padx=10)
+        for timestamp, rule_text, action, targets, amount in audit:
+            targets_str = ", ".join(map(str, targets))
+            audit_box.insert("end", f"[{timestamp}] {rule_text} -> {targets_str} (￥{amount:+.2f})\n")
+        audit_box.see("end")
+
+        def apply_rules():
+            lines = rules_text.get("1.0", "end").splitlines()
+            enabled = enabled_var.get()
+            try:
+                rules = compile_rules(lines)  # 先在界面线程检查，规则有误时不提交
+            except RuleError as e:
+                messagebox.showerror("规则错误", str(e), parent=win)
+                return
+            state = "已启用" if enabled else "已停用"
+            self.command(lambda: self.farm.configure_automation(lines, enabled),
+                         lambda _result: self.log(f"🤖 自动化{state}，共 {len(rules)} 条规则。", "info"))
+            win.destroy()
+
+        tk.Button(win, text="保存", command=apply_rules).pack(pady=5)
+
+    def open_timeline_dialog(self):
+        """Read-only view of the farm at any recorded hour of the last TIMELINE_DAYS days."""
+        if self.sim_thread is not None:
+            self.log("请先暂停动态模式。", "warn")
             return
-        
-        self.update_hour_logic()
-        self.refresh_all()
-        self.root.after(2500, self.update_dynamic_hour)
+        if not len(self.timeline):
+            self.log("时间线上还没有记录，请先推进时间。", "warn")
+            return
+        win = tk.Toplevel(self.root)
+        win.title("⏪ 时间回溯")
+        win.geometry("560x560")
+
+        time_var = tk.StringVar()
+        tk.Label(win, textvariable=time_var, font=("Arial", 12, "bold")).pack(anchor="w", padx=10, pady=5)
+        scale = tk.Scale(win, from_=0, to=len(self.timeline) - 1, orient="horizontal", showvalue=False)
+        scale.pack(fill="x", padx=10)
+
+        search = tk.Frame(win)
+        search.pack(fill="x", padx=10, pady=5)
+        reason_var = tk.StringVar(value=DAMAGE_REASONS[0])
+        ttk.Combobox(search, textvariable=reason_var, values=DAMAGE_REASONS, width=8).pack(side="left")
+        tk.Button(search, text="首次出现", command=lambda: find_first()).pack(side="left", padx=5)
+        found_var = tk.StringVar()
+        tk.Label(search, textvariable=found_var, justify="left", anchor="w").pack(side="left", fill="x", padx=5)
+
+        state_box = scrolledtext.ScrolledText(win, height=20, font=("Arial", 10))
+        state_box.pack(fill="both", expand=True, padx=10, pady=5)
+
+        def show(position):
+            position = int(position)
+            farm = self.timeline.farm_at(position, self.crop_data)
+            time_var.set(f"🕒 {self.timeline.time_at(position).strftime('%Y-%m-%d %H:%M')}"
+                         f"  ({position + 1}/{len(self.timeline)})    💰 ￥{farm.funds:.2f}")
+            state_box.delete("1.0", "end")
+            for i, field in enumerate(farm.fields):
+                state_box.insert("end", f"【田地{i + 1}】 {field.status()}\n\n")
+            state_box.insert("end", f"📦 仓库: {len(farm.storage.stock)} 批次    "
+                                    f"💳 债务: ￥{farm.loan_manager.total_debt:.2f}\n")
+
+        def find_first():
+            reason = reason_var.get()
+            found = self.timeline.first_damage(reason)
+            if not found:
+                found_var.set(f"保留的 {self.timeline.retention_days} 天内没有出现「{reason}」。")
+                return
+            found_var.set("；".join(f"田地{i + 1}: {t.strftime('%m-%d %H:%M')}" for i, t in sorted(found.items())))
+            times = self.timeline.times()
+            scale.set(times.index(min(found.values())))
+
+        scale.config(command=show)
+        scale.set(len(self.timeline) - 1)
+        show(len(self.timeline) - 1)
 
     def borrow_money(self):
-        max_loan = self.loan_manager.max_loan_amount
+        max_loan = self.view.farm.loan_manager.max_loan_amount
         amount_str = simpledialog.askstring("借款", f"请输入借款金额 (最多 ￥{max_loan:.2f}):")
         if not amount_str: return
 
         try:
             amount = float(amount_str)
-            success, message = self.loan_manager.borrow_money(amount)
+        except ValueError:
+            messagebox.showerror("输入无效", "请输入一个有效的数字。")
+            return
+
+        def done(result):
+            success, message = result
             if success:
-                self.funds += amount
                 self.log(message, "info")
                 messagebox.showinfo("借款成功", message)
             else:
                 self.log(message, "error")
                 messagebox.showerror("借款失败", message)
             self.refresh_all()
-        except ValueError:
-            messagebox.showerror("输入无效", "请输入一个有效的数字。")
+
+        self.command(lambda: self.farm.borrow(amount), done)
 
     def handle_loan_payment(self):
         self.log("--- 还款日 ---", "info")
-        status, amount_paid, message = self.loan_manager.handle_repayment(self.funds)
+        status, message = self.farm.repay_loan()
         
+        # 动态模式下这里运行在模拟线程上，弹窗和刷新交给 Tk 线程
         if status == "paid_full" or status == "paid_partial":
-            self.funds -= amount_paid
             self.log(message, "info")
-            messagebox.showinfo("还款成功", message)
+            self.on_tk(messagebox.showinfo, "还款成功", message)
         elif status == "overdue":
             self.log(message, "warn")
-            messagebox.showwarning("还款逾期", message)
+            self.on_tk(messagebox.showwarning, "还款逾期", message)
         else:
             self.log(message, "info")
 
-        if self.loan_manager.credit_score <= 0:
-            self.game_over("你的信用分已降至0，无法继续经营，游戏结束。")
+        if self.farm.loan_manager.credit_score <= 0:
+            self.on_tk(self.game_over, "你的信用分已降至0，无法继续经营，游戏结束。")
         
-        self.refresh_all()
+        self.on_tk(self.refresh_all)
 
     def game_over(self, reason):
         self.timer_running = False
+        if self.sim_thread is not None:
+            self.sim_thread.stop()
         messagebox.showinfo("游戏结束", reason)
         self.log(f"--- 游戏结束: {reason} ---", "error")
         for child in self.root.winfo_children():
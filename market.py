@@ -1,16 +1,57 @@
 # market.py
 
+import math
 import random
 
+from catalog import get_catalog
+
+IMPACT_RECOVERY = 0.6  # 每天保留的抛售冲击比例（其余部分随时间恢复）
+
 class Product:
-    def __init__(self, name, base_price, min_price, max_price, unit):
+    def __init__(self, name, base_price, min_price, max_price, unit, rain_sensitive=False, depth=5000.0):
         self.name = name
         self.base_price = base_price
         self.min_price = min_price
         self.max_price = max_price
         self.unit = unit
+        self.rain_sensitive = rain_sensitive
+        self.depth = depth          # 市场深度: 当天卖出 depth 公斤使价格降为 1/e
+        self.fundamental = base_price  # 不含抛售冲击的基准价
+        self.impact = 0.0           # 抛售造成的对数价格冲击 (<= 0)
+        self.sold_today = 0.0
         self.price = base_price
 
+    def _clamp(self, price):
+        return min(max(price, self.min_price), self.max_price)
+
+    def _refresh_price(self):
+        self.price = round(self._clamp(self.fundamental * math.exp(self.impact)), 2)
+
+    def quote(self, quantity):
+        """
+        卖出 quantity 公斤的平均成交价（不改变价格）。
+        价格随卖出量按 exp(-q/depth) 下滑，跌到 min_price 后不再下降。
+        """
+        start = self._clamp(self.fundamental * math.exp(self.impact))
+        if quantity <= 0:
+            return start
+        if start <= self.min_price:
+            return self.min_price
+        # 价格跌到底价之前能卖出的量
+        to_floor = self.depth * math.log(start / self.min_price)
+        sliding = min(quantity, to_floor)
+        revenue = start * self.depth * (1 - math.exp(-sliding / self.depth))
+        revenue += self.min_price * (quantity - sliding)
+        return revenue / quantity
+
+    def execute_sale(self, quantity):
+        """Sells quantity kg, moves the price down and returns the average execution price."""
+        avg_price = self.quote(quantity)
+        self.impact -= quantity / self.depth
+        self.sold_today += quantity
+        self._refresh_price()
+        return avg_price
+
     def update_price(self, weather=None):
         # 基础波动 ±5%
         change_rate = random.uniform(-0.05, 0.05)
@@ -18,39 +59,34 @@ class Product:
         # 天气影响
         if weather:
             if weather.rainfall > 20:
-                if self.name in ["小麦", "玉米", "草莓", "番茄", "大豆", "大米", "辣椒"]:
+                if self.rain_sensitive:
                     change_rate += 0.03  # 降雨致减产 → 提价
             if weather.extreme_event:
                 change_rate += 0.05
 
-        new_price = self.price * (1 + change_rate)
-        self.price = round(min(max(new_price, self.min_price), self.max_price), 2)
+        self.fundamental = self._clamp(self.fundamental * (1 + change_rate))
+        self.impact *= IMPACT_RECOVERY
+        self.sold_today = 0.0
+        self._refresh_price()
 
     def info(self):
         return f"{self.name}: ￥{self.price}/{self.unit}"
 
 
 class Market:
-    def __init__(self):
+    def __init__(self, catalog=None):
+        self.catalog = catalog or get_catalog()
         self.products = []
+        self._by_name = {}
         self.init_products()
 
     def init_products(self):
         self.products = [
-            Product("小麦", 2.0, 1.5, 2.5, "公斤"),
-            Product("玉米", 2.2, 1.6, 2.8, "公斤"),
-            Product("大米", 2.6, 2.0, 3.2, "公斤"),
-            Product("大豆", 3.1, 2.4, 4.0, "公斤"),
-            Product("草莓", 10.0, 6.0, 15.0, "公斤"),
-            Product("番茄", 3.5, 2.5, 4.8, "公斤"),
-            Product("辣椒", 6.5, 4.5, 8.5, "公斤"),
-            Product("苹果", 4.0, 3.0, 5.5, "公斤"),
-            Product("黄瓜", 3.2, 2.2, 4.5, "公斤"),
-            Product("葡萄", 6.0, 4.0, 8.0, "公斤"),
-            Product("鸡蛋", 5.0, 3.8, 6.5, "公斤"),
-            Product("牛奶", 4.2, 3.5, 5.0, "公斤"),
-            Product("猪肉", 24.0, 18.0, 32.0, "公斤")
+            Product(spec.name, spec.base_price, spec.min_price, spec.max_price, spec.unit,
+                    spec.rain_sensitive, spec.depth)
+            for spec in self.catalog.products.values()
         ]
+        self._by_name = {product.name: product for product in self.products}
 
     def update_prices(self, weather=None):
         for product in self.products:
@@ -61,8 +97,29 @@ class Market:
         for product in self.products:
             print("  -", product.info())
 
+    def get_product(self, name):
+        return self._by_name.get(name)
+
     def get_price(self, name):
-        for product in self.products:
-            if product.name == name:
-                return product.price
-        return None
+        product = self._by_name.get(name)
+        return product.price if product else None
+
+    def quote(self, name, quantity):
+        """Average price for selling quantity kg of name now, including slippage."""
+        product = self._by_name.get(name)
+        return product.quote(quantity) if product else None
+
+    def sell_batch(self, orders):
+        """
+        一次撮合一批卖单。orders 为 (作物名, 公斤数) 列表。
+        同一作物的所有卖单合并成一笔成交，按同一个平均价结算，价格只移动一次。
+        返回与 orders 一一对应的成交均价（无此商品时为 None）。
+        """
+        volume = {}
+        for name, quantity in orders:
+            volume[name] = volume.get(name, 0.0) + quantity
+        avg_price = {}
+        for name, quantity in volume.items():
+            product = self._by_name.get(name)
+            avg_price[name] = product.execute_sale(quantity) if product else None
+        return [avg_price[name] for name, _quantity in orders]
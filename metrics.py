@@ -0,0 +1,139 @@
+# metrics.py
+# 指标记录：每个模拟小时采样一次资金、债务、信用分、每块田地的健康/水分和各作物价格。
+# 每条序列保存三个分辨率 (小时 / 天 / 周) 的环形缓冲区，缓冲区用 array 预先分配，
+# 长时间运行时内存固定；图表按显示宽度选用合适的分辨率。
+
+from array import array
+
+# 分辨率 -> 每个点包含的小时数
+LEVEL_HOURS = {"hour": 1, "day": 24, "week": 24 * 7}
+DEFAULT_CAPACITY = {"hour": 24 * 90, "day": 365 * 10, "week": 52 * 50}
+# 田地序列数量随田地数增长 (最多 2 x 500 条)，保留的历史短一些
+FIELD_CAPACITY = {"hour": 24 * 30, "day": 365 * 2, "week": 52 * 10}
+
+
+class RingBuffer:
+    """Fixed-size ring of doubles. total counts every value ever appended."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = array("d", bytes(8 * capacity))
+        self.total = 0
+
+    def append(self, value):
+        self.data[self.total % self.capacity] = value
+        self.total += 1
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def tail(self, n):
+        """The last n values (fewer if not that many are kept), oldest first."""
+        n = min(n, len(self))
+        end = self.total % self.capacity
+        start = end - n
+        if start >= 0:
+            return self.data[start:end]
+        return self.data[start:] + self.data[:end]
+
+
+class Series:
+    """
+    一条指标序列。小时级每个点是一个采样；天/周级每个点保存该时段的平均值、最小值和最大值。
+    start 是第一个采样所在的小时序号 (MetricsRecorder.hours)，后加入的田地从中途开始记录。
+    """
+
+    def __init__(self, start=0, capacity=None):
+        capacity = {**DEFAULT_CAPACITY, **(capacity or {})}
+        self.start = start
+        hourly = RingBuffer(capacity["hour"])  # 小时级的平均/最小/最大是同一个值，只存一份
+        self.levels = {"hour": (hourly, hourly, hourly)}
+        for level in ("day", "week"):
+            self.levels[level] = tuple(RingBuffer(capacity[level]) for _ in range(3))
+        # 正在累积的天/周: [sum, count, min, max]
+        self._pending = {level: [0.0, 0, 0.0, 0.0] for level in LEVEL_HOURS if level != "hour"}
+
+    def append(self, value):
+        self.levels["hour"][0].append(value)
+        for level, acc in self._pending.items():
+            if acc[1] == 0:
+                acc[2] = acc[3] = value
+            else:
+                acc[2] = min(acc[2], value)
+                acc[3] = max(acc[3], value)
+            acc[0] += value
+            acc[1] += 1
+            if acc[1] == LEVEL_HOURS[level]:
+                mean, low, high = self.levels[level]
+                mean.append(acc[0] / acc[1])
+                low.append(acc[2])
+                high.append(acc[3])
+                acc[0], acc[1] = 0.0, 0
+
+    @property
+    def last(self):
+        mean = self.levels["hour"][0]
+        return mean.tail(1)[0] if mean.total else None
+
+    def window(self, level, n):
+        """
+        Returns (first_hour, mean, low, high) for the last n points of a level.
+        first_hour is the recorder hour at which the first returned point starts.
+        """
+        mean, low, high = self.levels[level]
+        count = min(n, len(mean))
+        first_hour = self.start + (mean.total - count) * LEVEL_HOURS[level]
+        return first_hour, mean.tail(count), low.tail(count), high.tail(count)
+
+
+class MetricsRecorder:
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+        self.series = {}
+        self.hours = 0          # 已记录的采样数 (模拟小时)
+        self.start_time = None  # 第一个采样的模拟时间
+
+    def _series(self, name, capacity=None):
+        series = self.series.get(name)
+        if series is None:
+            series = self.series[name] = Series(self.hours, {**(capacity or {}), **(self.capacity or {})})
+        return series
+
+    def record(self, farm, market, now):
+        """Samples one simulated hour."""
+        self.record_sample(self.sample(farm, market), now)
+
+    def sample(self, farm, market):
+        """One hour's values as plain tuples, so another thread can record them (see sim_thread.py)."""
+        fields = []
+        for field in farm.fields:
+            crop = field.crop
+            growing = crop is not None and not crop.dead and not crop.harvested
+            fields.append((crop.health, crop.water_level) if growing else (0.0, 0.0))
+        return (farm.funds, farm.loan_manager.total_debt, farm.loan_manager.credit_score, tuple(fields),
+                tuple((product.name, product.price) for product in market.products))
+
+    def record_sample(self, sample, now):
+        funds, debt, credit_score, fields, prices = sample
+        if self.start_time is None:
+            self.start_time = now
+        self._series("funds").append(funds)
+        self._series("debt").append(debt)
+        self._series("credit_score").append(credit_score)
+        for i, (health, water) in enumerate(fields):
+            self._series(f"field{i + 1}.health", FIELD_CAPACITY).append(health)
+            self._series(f"field{i + 1}.water", FIELD_CAPACITY).append(water)
+        for name, price in prices:
+            self._series(f"price.{name}").append(price)
+        self.hours += 1
+
+    def names(self, prefix=""):
+        return [name for name in self.series if name.startswith(prefix)]
+
+    def best_level(self, span_hours, max_points):
+        """Finest level that shows span_hours in at most max_points points and still keeps that much history."""
+        capacity = {**DEFAULT_CAPACITY, **(self.capacity or {})}
+        for level, hours in LEVEL_HOURS.items():
+            if span_hours / hours <= max_points and span_hours <= capacity[level] * hours:
+                return level
+        return "week"
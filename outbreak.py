@@ -0,0 +1,142 @@
+# outbreak.py
+# 病虫害传播：每天 (日期变更时) 对所有农场的所有在田作物做一次批量更新。
+#
+# 作物图：同一农场编号相邻的田地互为邻居 (与土壤网格的排布一致)，相邻农场之间按农场的
+# 平均感染程度互相施加压力 (农场数多时不必逐块连边)。每块田地的感染压力
+#   压力 = 田地传播率 × Σ 邻居感染度 × 宿主系数 + 农场传播率 × Σ 相邻农场同种作物平均感染度 × 宿主系数
+# 宿主系数：同种作物 1，不同作物 OTHER_HOST。
+# 未感染的作物以 1 - (1 - 自发概率) × exp(-压力 × 天气系数) 的概率被感染 (自发概率即原来的 disease_chance)，
+# 喷药有效期内概率乘以 0.1。降雨越多天气系数越大 (潮湿利于病害)。
+# 已感染的作物感染度按 logistic 增长，每天按感染度扣健康；喷药会清除感染。
+#
+# 感染度 (crop.infection, 0~1) 和最近一次计算的感染压力 (crop.infection_risk) 保存在作物上，
+# 自动化规则可以用 infection / infection_risk 作为条件。
+
+import math
+import random
+
+FIELD_SPREAD = 0.4     # 邻居田地的传播率
+FARM_SPREAD = 0.15     # 相邻农场的传播率
+OTHER_HOST = 0.2       # 不同作物之间的宿主系数
+GROWTH = 0.35          # 感染度每天的 logistic 增长率
+INITIAL = 0.1          # 新感染时的感染度
+DAMAGE = 4.0           # 感染度为 1 时每天扣除的健康
+INFECTION_HIT = 10     # 新感染时立即扣除的健康
+PESTICIDE_FACTOR = 0.1
+
+
+def weather_factor(weather):
+    """Wet days favour disease: 1 on a dry day, up to 3 on very rainy days."""
+    return 1 + min(2.0, weather.rainfall_today / 10)
+
+
+class OutbreakResult:
+    def __init__(self):
+        self.new_infections = []  # (farm_id, 田地下标, 作物名)
+        self.infected = 0         # 更新后处于感染状态的作物数
+
+    def __bool__(self):
+        return bool(self.new_infections)
+
+
+class OutbreakModel:
+    def __init__(self, field_spread=FIELD_SPREAD, farm_spread=FARM_SPREAD, other_host=OTHER_HOST):
+        self.field_spread = field_spread
+        self.farm_spread = farm_spread
+        self.other_host = other_host
+
+    def step(self, farms, weathers, links=None):
+        """
+        One day of spread over every growing crop of farms ({farm_id: Farm}).
+        weathers: {farm_id: weather of the farm}; links: {farm_id: [neighbouring farm ids]}
+        (default: every farm is linked to every other). Returns an OutbreakResult.
+        """
+        result = OutbreakResult()
+        # 节点：所有在田作物；邻接只存在于同一农场的相邻编号之间
+        nodes = []  # (farm_id, 田地下标, crop)
+        for farm_id, farm in farms.items():
+            for i, field in enumerate(farm.fields):
+                crop = field.crop
+                if crop is not None and not crop.dead and not crop.harvested:
+                    nodes.append((farm_id, i, crop))
+        if not nodes:
+            return result
+
+        infection = [crop.infection for _f, _i, crop in nodes]
+        names = [crop.crop_data.name for _f, _i, crop in nodes]
+
+        # 每个农场、每种作物的平均感染度 (农场之间的传播只看这个汇总)
+        totals = {}
+        for (farm_id, _i, _crop), name, level in zip(nodes, names, infection):
+            entry = totals.setdefault(farm_id, {}).setdefault(name, [0.0, 0])
+            entry[0] += level
+            entry[1] += 1
+        farm_means = {farm_id: {name: s / n for name, (s, n) in by_name.items()} for farm_id, by_name in totals.items()}
+
+        pressure = [0.0] * len(nodes)
+        # 同一农场内相邻田地：nodes 按农场、田地顺序排列，只需比较前后两个节点
+        for a in range(len(nodes) - 1):
+            b = a + 1
+            if nodes[a][0] != nodes[b][0] or nodes[b][1] != nodes[a][1] + 1:
+                continue
+            if not (infection[a] or infection[b]):
+                continue
+            host = 1.0 if names[a] == names[b] else self.other_host
+            pressure[a] += self.field_spread * host * infection[b]
+            pressure[b] += self.field_spread * host * infection[a]
+
+        if self.farm_spread and len(farm_means) > 1:
+            outside = {}
+            for farm_id in farm_means:
+                neighbours = links.get(farm_id, ()) if links is not None else [f for f in farm_means if f != farm_id]
+                by_name = {}
+                for other in neighbours:
+                    for name, level in farm_means.get(other, {}).items():
+                        by_name[name] = by_name.get(name, 0.0) + level
+                outside[farm_id] = by_name
+            for n, ((farm_id, _i, _crop), name) in enumerate(zip(nodes, names)):
+                for other_name, level in outside[farm_id].items():
+                    if level:
+                        pressure[n] += self.farm_spread * level * (1.0 if other_name == name else self.other_host)
+
+        factors = {farm_id: weather_factor(weather) for farm_id, weather in weathers.items()}
+        for (farm_id, i, crop), level, load in zip(nodes, infection, pressure):
+            wet = factors[farm_id]
+            crop.infection_risk = round(load * wet, 4)
+            protected = crop.pesticide_effect_hours > 0
+            if level > 0:
+                if protected:
+                    level *= 0.5
+                level = min(1.0, level + GROWTH * wet * level * (1 - level))
+                crop.infection = level
+                crop.health = max(0, crop.health - DAMAGE * level)
+                crop.damage_reasons.add("病害")
+                result.infected += 1
+                continue
+            chance = 1 - (1 - crop.crop_data.disease_chance) * math.exp(-load * wet)
+            if protected:
+                chance *= PESTICIDE_FACTOR
+            if random.random() < chance:
+                crop.infection = INITIAL
+                crop.health = max(0, crop.health - INFECTION_HIT)
+                crop.damage_reasons.add("病害")
+                result.new_infections.append((farm_id, i, crop.crop_data.name))
+                result.infected += 1
+
+        for farm_id, i, name in result.new_infections:
+            farm = farms[farm_id]
+            farm.log(f"田地{i+1} ({name}) 出现病害。", "warn")
+            farm.emit("damage", field=i + 1, crop=name, reasons=["病害"])
+        return result
+
+
+def distance_links(farm_locations, locations, radius_km):
+    """{farm_id: [farm ids whose locations are within radius_km]} for regional weather."""
+    links = {}
+    for farm_id, index in farm_locations.items():
+        x, y = locations[index]
+        links[farm_id] = [
+            other for other, j in farm_locations.items()
+            if other != farm_id and math.hypot(locations[j][0] - x, locations[j][1] - y) <= radius_km
+        ]
+    return links
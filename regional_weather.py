@@ -0,0 +1,179 @@
+# regional_weather.py
+# 区域天气：一次生成 N 个地点的逐小时气温、降雨和日照，相邻地点的天气相关。
+#
+# 每个地点的每日随机量 (正午/午夜气温、是否下雨、雨量) 来自一个空间相关的标准正态变量：
+#   z_i = ρ × (Σ_k w_ik g_k / |w_i|) + √(1-ρ²) × e_i
+# g_k 是 K 个锚点上的独立正态数，w_ik = exp(-d²/2L²) 随地点到锚点的距离衰减，e_i 是地点自身的噪声。
+# 再经过正态分布函数变成 [0, 1) 的均匀数，所以每个地点单独看时与 WeatherDynamic 的分布相同。
+# 极端天气 (雷暴台风、暴风雪、强风)、风速和日照的云量噪声全区域共享。
+#
+# 每个农场通过 view(i) 拿到一个 LocationWeather，接口与 WeatherDynamic 相同 (作物、土壤、
+# 日响应表都能直接使用)，读取的是区域共享数组中的第 i 项，不再各自运行 WeatherDynamic。
+
+import math
+import random
+from array import array
+from datetime import datetime, timedelta
+
+from weather import MONTH_TEMP, MONTH_RAIN, roll_extreme_event
+
+CORRELATION_KM = 50.0  # 相关长度 L
+SHARED = 0.8           # ρ：区域共同部分所占的比重
+ANCHORS = 4            # 每个方向的锚点数 (共 ANCHORS² 个)
+
+
+def _uniform(z):
+    """Standard normal -> uniform [0, 1)."""
+    return min(0.5 * (1 + math.erf(z / math.sqrt(2))), 1 - 1e-12)
+
+
+def grid_locations(count, spacing_km=10.0):
+    """count locations on a square grid spacing_km apart, row by row."""
+    cols = math.ceil(math.sqrt(count))
+    return [((i % cols) * spacing_km, (i // cols) * spacing_km) for i in range(count)]
+
+
+class RegionalWeather:
+    def __init__(self, date: datetime, locations, correlation_km=CORRELATION_KM, shared=SHARED, anchors=ANCHORS):
+        self.locations = [tuple(loc) for loc in locations]
+        self.n = len(self.locations)
+        if not self.n:
+            raise ValueError("区域天气至少需要一个地点")
+        self.correlation_km = correlation_km
+        self.shared = shared
+        self._weights = self._anchor_weights(anchors, correlation_km)
+
+        self.date = date
+        self.time = datetime(date.year, date.month, date.day, 0, 0)
+        self.extreme_event = None
+        self.current_wind = 0.0
+        zeros = array("d", [0.0]) * self.n
+        self.temperature = array("d", zeros)
+        self.rain = array("d", zeros)
+        self.sunlight = array("d", zeros)
+        self._generate_day()
+
+    def _anchor_weights(self, anchors, length):
+        xs = [x for x, _y in self.locations]
+        ys = [y for _x, y in self.locations]
+        step = lambda lo, hi, i: lo + (hi - lo) * i / (anchors - 1) if anchors > 1 else (lo + hi) / 2
+        points = [(step(min(xs), max(xs), i), step(min(ys), max(ys), j)) for i in range(anchors) for j in range(anchors)]
+        weights = []
+        for x, y in self.locations:
+            w = [math.exp(-((x - ax) ** 2 + (y - ay) ** 2) / (2 * length ** 2)) for ax, ay in points]
+            norm = math.sqrt(sum(v * v for v in w)) or 1.0
+            weights.append([v / norm for v in w])
+        return weights
+
+    def correlated_uniforms(self):
+        """One spatially correlated uniform [0, 1) number per location."""
+        g = [random.gauss(0, 1) for _ in self._weights[0]]
+        local = math.sqrt(1 - self.shared ** 2)
+        return [
+            _uniform(self.shared * sum(wk * gk for wk, gk in zip(w, g)) + local * random.gauss(0, 1))
+            for w in self._weights
+        ]
+
+    def _generate_day(self):
+        month = self.date.month
+        low, high = MONTH_TEMP[month]
+        mid = (high + low) / 2
+        middays = [mid + (high - mid) * u for u in self.correlated_uniforms()]
+        midnights = [low + (mid - low) * u for u in self.correlated_uniforms()]
+        self.curves = [
+            [round(night + (day - night) * (1 - abs(h - 12) / 6 if 6 <= h <= 18 else 0) + random.uniform(-0.3, 0.3), 1)
+             for h in range(24)]
+            for day, night in zip(middays, midnights)
+        ]
+
+        chance, (rain_low, rain_high) = MONTH_RAIN[month]
+        wet = self.correlated_uniforms()
+        amounts = self.correlated_uniforms()
+        self.rainfall_today = array("d", (round(rain_low + (rain_high - rain_low) * a, 1) if u < chance else 0.0
+                                          for u, a in zip(wet, amounts)))
+        # 同一场雨在区域内大致同时开始，各地点再错开 ±2 小时
+        start = random.randint(0, 20)
+        self.rain_start = [min(20, max(0, start + random.randint(-2, 2))) if r > 0 else None for r in self.rainfall_today]
+        self.rain_duration = [random.randint(1, 4) if r > 0 else 0 for r in self.rainfall_today]
+        self.extreme_event = roll_extreme_event(month)
+
+    def start_new_day(self, date):
+        self.date = date
+        self.time = datetime(date.year, date.month, date.day, 0, 0)
+        self._generate_day()
+
+    def update_hour(self):
+        """Computes this hour's temperature, rain and sunlight for every location."""
+        hour = self.time.hour
+        self.current_wind = round(random.uniform(0.5, 5.0), 1)
+        self.temperature = array("d", (curve[hour] for curve in self.curves))
+        self.rain = array("d", (
+            round(total / duration, 1) if start is not None and start <= hour < start + duration else 0.0
+            for total, start, duration in zip(self.rainfall_today, self.rain_start, self.rain_duration)
+        ))
+        if 6 <= hour <= 18:
+            base = (1 - abs(hour - 12) / 6) * 10 + random.uniform(-1, 1)  # 云量噪声全区域共享
+            self.sunlight = array("d", [round(max(0.0, base), 1)]) * self.n
+        else:
+            self.sunlight = array("d", [0.0]) * self.n
+        self.time += timedelta(hours=1)
+
+    def is_new_day(self):
+        return self.time.hour == 0 and self.time.minute == 0
+
+    def view(self, index):
+        if not 0 <= index < self.n:
+            raise ValueError(f"地点 {index} 不存在 (共 {self.n} 个)")
+        return LocationWeather(self, index)
+
+    # --- 区域平均值：供市场价格等全区域共用的逻辑使用 ---
+
+    @property
+    def rainfall(self):
+        return sum(self.rainfall_today) / self.n
+
+    @property
+    def daily_temperature_curve(self):
+        return [round(sum(curve[h] for curve in self.curves) / self.n, 1) for h in range(24)]
+
+    def summary(self):
+        hour = (self.time.hour - 1) % 24
+        mean_temp = sum(curve[hour] for curve in self.curves) / self.n
+        raining = sum(1 for r in self.rain if r > 0)
+        return (
+            f"[{self.time.strftime('%m-%d %H:%M')}] 区域 {self.n} 个地点 | 🌡平均 {mean_temp:.1f}℃ | "
+            f"☔ {raining} 个地点降雨 | 💨风速: {self.current_wind}m/s"
+            + (f" | ⚠ {self.extreme_event}" if self.extreme_event else "")
+        )
+
+
+class LocationWeather:
+    """One location of a RegionalWeather, with the same attributes as WeatherDynamic (read from the shared arrays)."""
+    __slots__ = ("region", "index")
+
+    def __init__(self, region, index):
+        self.region = region
+        self.index = index
+
+    time = property(lambda self: self.region.time)
+    date = property(lambda self: self.region.date)
+    extreme_event = property(lambda self: self.region.extreme_event)
+    current_wind = property(lambda self: self.region.current_wind)
+    current_temperature = property(lambda self: self.region.temperature[self.index])
+    current_rainfall = property(lambda self: self.region.rain[self.index])
+    current_sunlight = property(lambda self: self.region.sunlight[self.index])
+    daily_temperature_curve = property(lambda self: self.region.curves[self.index])
+    rainfall_today = property(lambda self: self.region.rainfall_today[self.index])
+    rainfall = rainfall_today
+    rain_start = property(lambda self: self.region.rain_start[self.index])
+    rain_duration = property(lambda self: self.region.rain_duration[self.index])
+
+    def is_new_day(self):
+        return self.region.is_new_day()
+
+    def summary(self):
+        return (
+            f"[{self.time.strftime('%m-%d %H:%M')}] 🌡{self.current_temperature}℃ | ☔{self.current_rainfall}mm | "
+            f"☀ 日照: {self.current_sunlight} | 💨风速: {self.current_wind}m/s"
+            + (f" | ⚠ {self.extreme_event}" if self.extreme_event else "")
+        )
@@ -0,0 +1,238 @@
+# server.py
+# 多农场模拟服务器：多个农场共享同一个天气区域和市场，按小时同步推进。
+# 客户端通过本地 socket 发送一行一个 JSON 的请求 (NDJSON)，进程内可直接用 LocalClient。
+#
+#   python server.py --farms 4 --port 8765 --speed 10
+
+import argparse
+import asyncio
+import json
+from collections import deque
+from datetime import datetime, timedelta
+
+from simulation import Simulation
+from farm import Farm
+from economy import Ledger
+from game_state import StateStore
+from telemetry import EventBus, NDJSONSink
+
+MAX_TICK_HOURS = 24 * 7  # 一次 tick 请求最多推进的小时数，避免单个请求长时间占住事件循环
+PRICE_HISTORY_DAYS = 7  # prices 请求默认返回的天数
+
+
+class FarmServer(Simulation):
+    def __init__(self, start_date=datetime(2025, 3, 1), seed=None, log_size=200, ledger_path=":memory:", state_path=None,
+                 locations=None):
+        super().__init__(start_date, seed, ledger=Ledger(ledger_path), events=EventBus(),
+                         state_store=StateStore(state_path) if state_path else None, locations=locations)
+        self.logs = {}
+        self.log_size = log_size
+        self.clock_running = False  # run_clock 驱动时钟期间不接受客户端的 tick，所有农场保持同步
+
+    def add_farm(self, farm_id, funds=10000, num_fields=2, location=None):
+        if farm_id in self.farms:
+            raise ValueError(f"农场 '{farm_id}' 已存在。")
+        log = deque(maxlen=self.log_size)
+        self.logs[farm_id] = log
+        stamp = lambda: self.weather.time.strftime("%m-%d %H:%M")
+        return super().add_farm(farm_id, funds, num_fields,
+                                log=lambda msg, level="info": log.append((stamp(), level, msg)), location=location)
+
+    async def run_clock(self, hours_per_second=1.0):
+        """Ticks the world in the background until cancelled."""
+        interval = 1.0 / hours_per_second
+        self.clock_running = True
+        try:
+            while True:
+                self.tick()
+                await asyncio.sleep(interval)
+        finally:
+            self.clock_running = False
+
+    # --- 请求处理 ---
+
+    def handle(self, request):
+        """Handles one request dict and returns a JSON-friendly response dict."""
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "请求必须是一个 JSON 对象。"}
+        op = request.get("op")
+        try:
+            if op == "join":
+                bad = self._check_join(request)
+                if bad:
+                    return {"ok": False, "error": bad}
+                self.add_farm(request["farm"], request.get("funds", 10000), request.get("fields", 2),
+                              request.get("location"))
+                return {"ok": True, "farm": request["farm"]}
+            if op == "tick":
+                if self.clock_running:
+                    return {"ok": False, "error": "服务器时钟正在运行，不能手动推进。"}
+                hours = request.get("hours", 1)
+                if not isinstance(hours, int) or isinstance(hours, bool) or not 1 <= hours <= MAX_TICK_HOURS:
+                    return {"ok": False, "error": f"hours 必须是 1~{MAX_TICK_HOURS} 的整数。"}
+                self.tick(hours)
+                return {"ok": True, "time": self.weather.time.strftime("%Y-%m-%d %H:%M")}
+            if op == "world":
+                return {
+                    "ok": True,
+                    "time": self.weather.time.strftime("%Y-%m-%d %H:%M"),
+                    "weather": self.weather.summary(),
+                    "prices": {p.name: p.price for p in self.market.products},
+                    "farms": list(self.farms),
+                }
+            if op in ("inventory", "prices") and self.state_store is None:
+                return {"ok": False, "error": "服务器没有状态库 (--state)，不能查询。"}
+            if op == "prices":
+                days = request.get("days", PRICE_HISTORY_DAYS)
+                if not isinstance(days, int) or isinstance(days, bool) or days < 1:
+                    return {"ok": False, "error": "days 必须是正整数。"}
+                self.checkpoint()
+                since = (self.weather.time - timedelta(days=days)).strftime("%Y-%m-%d")
+                return {"ok": True, "prices": self.state_store.price_history(request["name"], since)}
+
+            farm = self.farms.get(request.get("farm"))
+            if farm is None:
+                return {"ok": False, "error": f"未知农场 '{request.get('farm')}'"}
+            if op == "state":
+                return {"ok": True, "state": farm.status()}
+            if op == "weather":
+                return {"ok": True, "weather": self.farm_weather[farm.farm_id].summary()}
+            if op == "pnl":
+                return {"ok": True, "by_category": self.ledger.pnl_by_category(farm.book_key),
+                        "by_crop": self.ledger.pnl_by_crop(farm.book_key)}
+            if op == "inventory":
+                self.checkpoint()
+                key = farm.ledger_key
+                return {"ok": True, "inventory": [
+                    {"name": name, "lots": lots, "weight": weight, "freshness": round(freshness, 1),
+                     "growing": [idx for idx, _health, _water in self.state_store.crops_by_name(key, name)]}
+                    for name, lots, weight, freshness in self.state_store.inventory_summary(key)
+                ]}
+            if op == "log":
+                log = self.logs[farm.farm_id]
+                entries = list(log)
+                log.clear()
+                return {"ok": True, "log": entries}
+            if op == "act":
+                return self._act(farm, request.get("action"), request.get("args", {}))
+        except (KeyError, ValueError, TypeError, IndexError) as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {"ok": False, "error": f"未知请求 '{op}'"}
+
+    @staticmethod
+    def _check_join(request):
+        farm_id, funds, fields = request.get("farm"), request.get("funds", 10000), request.get("fields", 2)
+        if not isinstance(farm_id, str) or not farm_id:
+            return "farm 必须是非空字符串。"
+        if isinstance(funds, bool) or not isinstance(funds, (int, float)) or not 0 <= funds < float("inf"):
+            return f"无效的初始资金: {funds!r}"
+        if not isinstance(fields, int) or isinstance(fields, bool) or not 1 <= fields <= Farm.MAX_FIELDS:
+            return f"田地数量必须是 1~{Farm.MAX_FIELDS} 的整数。"
+        return None
+
+    def _act(self, farm, action, args):
+        ok, message = self.act(farm, action, args)
+        return {"ok": ok, "message": message, "funds": round(farm.funds, 2)}
+
+    # --- socket 服务 ---
+
+    async def _serve_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    response = self.handle(json.loads(line))
+                except json.JSONDecodeError as e:
+                    response = {"ok": False, "error": f"无效的 JSON: {e}"}
+                except Exception as e:  # 单个请求出错只返回错误，不断开连接
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, path=None):
+        """Starts the socket server (a Unix socket if path is given, otherwise local TCP)."""
+        if path:
+            return await asyncio.start_unix_server(self._serve_client, path=path)
+        return await asyncio.start_server(self._serve_client, host, port)
+
+
+class LocalClient:
+    """In-process client stub. Requests go through the same JSON encoding as the socket protocol."""
+
+    def __init__(self, server, farm_id=None):
+        self.server = server
+        self.farm_id = farm_id
+
+    def request(self, op, **kwargs):
+        if self.farm_id is not None:
+            kwargs.setdefault("farm", self.farm_id)
+        payload = json.loads(json.dumps(dict(op=op, **kwargs), ensure_ascii=False))
+        return json.loads(json.dumps(self.server.handle(payload), ensure_ascii=False))
+
+    def act(self, action, /, **args):
+        return self.request("act", action=action, args=args)
+
+
+class SocketClient:
+    """Thin asyncio client for a running FarmServer."""
+
+    def __init__(self, reader, writer, farm_id=None):
+        self.reader = reader
+        self.writer = writer
+        self.farm_id = farm_id
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, path=None, farm_id=None):
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, farm_id)
+
+    async def request(self, op, **kwargs):
+        if self.farm_id is not None:
+            kwargs.setdefault("farm", self.farm_id)
+        self.writer.write(json.dumps(dict(op=op, **kwargs), ensure_ascii=False).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def act(self, action, /, **args):
+        return await self.request("act", action=action, args=args)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def _main(args):
+    from regional_weather import grid_locations
+    server = FarmServer(seed=args.seed, ledger_path=args.db or ":memory:", state_path=args.db,
+                        locations=grid_locations(args.region) if args.region else None)
+    if args.events:
+        server.events.subscribe(NDJSONSink(args.events))
+    for i in range(args.farms):
+        server.add_farm(f"farm{i + 1}")
+    sock = await server.serve(args.host, args.port, args.path)
+    clock = asyncio.create_task(server.run_clock(args.speed))
+    print(f"FarmServer: {args.farms} 个农场, {args.speed} 小时/秒, 监听 {args.path or f'{args.host}:{args.port}'}")
+    try:
+        async with sock:
+            await sock.serve_forever()
+    finally:
+        clock.cancel()
+        server.events.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FarmerSimPy 多农场模拟服务器")
+    parser.add_argument("--farms", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", help="使用 Unix socket 而不是 TCP")
+    parser.add_argument("--speed", type=float, default=1.0, help="每秒推进的模拟小时数")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--db", help="保存账本和状态库的 SQLite 文件")
+    parser.add_argument("--events", help="把模拟事件以 NDJSON 追加写入此文件")
+    parser.add_argument("--region", type=int, help="使用 N 个地点的区域天气 (相距 10km 的方格)，农场依次分配")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,149 @@
+# sim_thread.py
+# 后台模拟线程：动态模式下模拟在工作线程上按小时推进，Tk 线程只负责绘制和接收输入，两边互不等待。
+#   - 工作线程 -> Tk：每推进一小时 (或执行完一条命令) 生成一份新的不可变快照，构建完成后整体替换
+#     latest 引用 (双缓冲：读者拿到的要么是旧快照要么是新快照，不会看到一半)。Tk 按自己的帧率只绘制最新的一份，
+#     中间来不及绘制的快照直接丢弃。日志、弹窗等必须在 Tk 线程执行的调用经 call_soon() 排队，由 pump() 执行。
+#   - Tk -> 工作线程：玩家操作以命令 (无参函数) 提交到队列，工作线程在两个小时之间执行，结果再排队交回 Tk。
+# 运行期间实时状态 (农场、天气、市场、账本、状态库) 只由工作线程访问；停止后交还给 Tk 线程。
+
+import copy
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from game_state import save_to_dict, load_from_dict
+
+
+class Snapshot(namedtuple("Snapshot", "version farm weather market ledger reports")):
+    """
+    One published state. farm/weather/market are detached copies that nobody mutates after publishing;
+    ledger is the finance tab's ledger text and reports the state DB figures of the storage and market
+    tabs (None when not requested).
+    """
+    __slots__ = ()
+
+
+def copy_farm(farm, now, crop_data):
+    """A detached copy of farm (no ledger, log or event bus), built through the save format."""
+    from farm import Farm
+    detached = Farm(funds=0, num_fields=0, farm_id=farm.farm_id, soil_grid=farm.soil_grid)
+    load_from_dict(save_to_dict(farm, now), detached, crop_data)
+    return detached
+
+
+def copy_weather(weather):
+    """A shallow copy is enough: the weather replaces its values every hour and day instead of mutating them."""
+    return copy.copy(weather)
+
+
+def copy_market(market):
+    """A detached copy of market's current prices (products are copied, the catalog is shared and read-only)."""
+    frozen = copy.copy(market)
+    frozen.products = [copy.copy(product) for product in market.products]
+    frozen._by_name = {product.name: product for product in frozen.products}
+    return frozen
+
+
+class SimulationThread:
+    """
+    Runs step() every interval seconds on a daemon thread and publishes snapshot() after each step and
+    after each batch of commands. None of the methods used by the Tk thread block.
+    """
+
+    def __init__(self, step, snapshot, interval=2.5, on_error=None):
+        self.step = step          # 推进一小时 (工作线程)
+        self.snapshot = snapshot  # version -> Snapshot (工作线程)
+        self.interval = interval
+        self.on_error = on_error or (lambda error: None)  # 在 Tk 线程上报告命令或 step() 的异常
+        self.latest = None        # 最新发布的快照
+        self.hours = 0
+        self.error = None         # step() 抛出的异常，线程随之停止
+        self._version = 0
+        self._commands = queue.SimpleQueue()  # (fn, then)：Tk -> 工作线程
+        self._calls = queue.SimpleQueue()     # (fn, args)：工作线程 -> Tk
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="simulation", daemon=True)
+
+    def start(self):
+        self._publish()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Asks the thread to stop after the current hour; returns at once. See finished."""
+        self._stopping = True
+        self._wake.set()
+
+    @property
+    def finished(self):
+        return not self._thread.is_alive() and self._thread.ident is not None
+
+    # --- Tk 线程 ---
+
+    def submit(self, fn, then=None):
+        """Queues fn() to run on the simulation thread between two hours; then(result) runs later in pump()."""
+        self._commands.put((fn, then))
+        self._wake.set()
+
+    def pump(self):
+        """Runs the queued Tk-side calls and returns the latest snapshot. Call from the Tk thread only."""
+        if self.finished:
+            # 线程已退出：停止前最后一刻提交的命令由 Tk 线程直接执行
+            self._run_commands()
+        while True:
+            try:
+                fn, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            fn(*args)
+        return self.latest
+
+    # --- 工作线程 ---
+
+    def call_soon(self, fn, *args):
+        """Queues fn(*args) to run on the Tk thread at its next frame."""
+        self._calls.put((fn, args))
+
+    def _publish(self):
+        self._version += 1
+        self.latest = self.snapshot(self._version)  # 新快照构建完成后才替换引用
+
+    def _run_commands(self):
+        ran = False
+        while True:
+            try:
+                fn, then = self._commands.get_nowait()
+            except queue.Empty:
+                return ran
+            ran = True
+            try:
+                result = fn()
+            except Exception as e:
+                self.call_soon(self.on_error, e)
+                continue
+            if then is not None:
+                self.call_soon(then, result)
+
+    def _loop(self):
+        next_hour = time.monotonic() + self.interval
+        while not self._stopping:
+            self._wake.clear()  # 先清除再检查队列，检查之后才提交的命令会让下面的 wait 立即返回
+            if self._run_commands():
+                self._publish()
+            wait = next_hour - time.monotonic()
+            if wait > 0:
+                self._wake.wait(wait)
+                continue
+            try:
+                self.step()
+            except Exception as e:
+                self.error = e
+                self.call_soon(self.on_error, e)
+                break
+            self.hours += 1
+            next_hour = max(next_hour + self.interval, time.monotonic())
+            self._publish()
+        if self._run_commands():
+            self._publish()
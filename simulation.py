@@ -0,0 +1,333 @@
+# simulation.py
+# 无界面的模拟核心：一个天气区域、一个市场和若干农场，按小时同步推进。
+# 默认所有农场共用一个地点的天气 (WeatherDynamic)；给出 locations 时使用区域天气
+# (regional_weather.RegionalWeather)，每个农场读取自己所在地点的天气。
+# 服务器 (server.py) 和命令行 (farmersim.py) 都基于它；不依赖 Tk 和 asyncio。
+
+import random
+from datetime import datetime, timedelta
+
+from weather import WeatherDynamic
+from market import Market
+from plant import get_all_crop_data
+from farm import Farm, ACTION_COSTS, NUTRIENTS
+from outbreak import OutbreakModel, distance_links
+from loan import settle_due
+
+
+def advance_world_day(weather, market, farms, farm_weather, outbreaks, links=None, events=None):
+    """
+    新一天的天气、价格、各农场日结算和病害传播，按固定顺序执行。
+    Simulation.start_new_day 和界面 (main.py) 的时钟共用这一步，随机数的抽取顺序因此一致，操作记录才能回放。
+    farms 与 farm_weather 以 farm_id 为键 (界面的单个农场用操作记录里的键 farm.ledger_key)。
+    """
+    weather.start_new_day(weather.time)
+    market.update_prices(weather)
+    if events is not None:
+        events.publish("price", weather.time.strftime("%Y-%m-%d %H:%M"),
+                       prices={p.name: p.price for p in market.products})
+    for farm_id, farm in farms.items():
+        farm.start_new_day(farm_weather[farm_id])
+    return outbreaks.step(farms, farm_weather, links)
+
+
+# Simulation.act 接受的操作名称
+ACTIONS = {"plant", "water", "pesticide", "fertilize", "harvest", "clear", "bulk", "sell", "store", "sell_all",
+           "borrow", "buy_field", "automation"}
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _check_indices(indices, count, what):
+    """Error message unless indices are distinct ints in range(count), else None."""
+    if len({repr(i) for i in indices}) != len(indices):
+        return f"{what}编号不能重复。"
+    for i in indices:
+        if not _is_int(i) or not 0 <= i < count:
+            return f"无效的{what}编号: {i!r} (共 {count} 个，编号从 0 开始)"
+    return None
+
+
+class Simulation:
+    def __init__(self, start_date=datetime(2025, 3, 1), seed=None, ledger=None, events=None, state_store=None,
+                 locations=None):
+        if seed is not None:
+            random.seed(seed)
+        if locations:
+            from regional_weather import RegionalWeather
+            self.weather = RegionalWeather(start_date, locations)
+        else:
+            self.weather = WeatherDynamic(start_date)
+        self.market = Market()
+        self.market.update_prices(self.weather)
+        self.crop_data = get_all_crop_data()
+        self.ledger = ledger            # economy.Ledger，所有农场共用，按 farm_id 区分
+        self.events = events            # telemetry.EventBus
+        self.state_store = state_store  # game_state.StateStore，每小时一个事务写入所有农场的增量
+        self.farms = {}
+        self.farm_weather = {}  # farm_id -> 该农场读取的天气 (单点模式下就是 self.weather)
+        self.outbreaks = OutbreakModel()
+        self.farm_link_km = 15.0  # 区域天气下相距不超过此距离的农场之间传播病害
+        self.hours = 0
+        self.day_listeners = []  # 每天开始 (结算之前) 调用 listener(simulation)，例如记录状态哈希
+        self.strategies = {}  # farm_id -> strategy.StrategyHost，每小时结束时运行
+        self.compactor = None  # compaction.Compactor：长时间运行模式，每天开始时整理状态
+        self.timelines = {}  # farm_id -> timeline.Timeline，每小时结束时记录，用于时间回溯
+
+    @classmethod
+    def from_save(cls, data, farm_id="main", **kwargs):
+        """Builds a one-farm simulation from a JSON save (game_state.save_to_dict). Returns (simulation, farm)."""
+        sim = cls.from_saves({farm_id: data}, **kwargs)
+        return sim, sim.farms[farm_id]
+
+    @classmethod
+    def from_saves(cls, saves, farm_locations=None, **kwargs):
+        """
+        Builds a simulation with one farm per save ({farm_id: save}). The world starts at the first save's date.
+        With regional weather (locations=...), farm_locations maps farm_id to its location index.
+        """
+        from game_state import load_from_dict
+        start = datetime.strptime(next(iter(saves.values()))["date"], "%Y-%m-%d %H:%M:%S")
+        sim = cls(start_date=start, **kwargs)
+        sim.weather.time = start
+        for farm_id, data in saves.items():
+            location = (farm_locations or {}).get(farm_id)
+            load_from_dict(data, sim.add_farm(farm_id, location=location), sim.crop_data)
+        return sim
+
+    @property
+    def regional(self):
+        return hasattr(self.weather, "view")
+
+    def world_config(self):
+        """What besides the seed and the saves is needed to rebuild this world (regional weather only)."""
+        if not self.regional:
+            return None
+        return {
+            "locations": [list(loc) for loc in self.weather.locations],
+            "farm_locations": {farm_id: w.index for farm_id, w in self.farm_weather.items()},
+        }
+
+    @property
+    def now(self):
+        return self.weather.time
+
+    @property
+    def day_of_year(self):
+        return self.weather.date.timetuple().tm_yday
+
+    def add_farm(self, farm_id, funds=10000, num_fields=2, log=None, soil_grid=None, location=None):
+        """location: index into the regional weather's locations (default: the next one, round robin)."""
+        if farm_id in self.farms:
+            raise ValueError(f"农场 '{farm_id}' 已存在。")
+        if self.regional:
+            weather = self.weather.view(len(self.farms) % self.weather.n if location is None else location)
+        else:
+            weather = self.weather
+        farm = Farm(funds=funds, num_fields=num_fields, farm_id=farm_id, log=log, ledger=self.ledger,
+                    start_time=self.weather.time, events=self.events, soil_grid=soil_grid)
+        self.farms[farm_id] = farm
+        self.farm_weather[farm_id] = weather
+        return farm
+
+    def enable_long_run(self, **kwargs):
+        """Long-run mode: compacts state every day so memory stays flat (see compaction.py). Not for recorded runs."""
+        from compaction import Compactor
+        self.compactor = Compactor(**kwargs)
+        return self.compactor
+
+    def record_timeline(self, farm_id, retention_days=3):
+        """Keeps the last retention_days days of farm_id hour by hour (see timeline.py)."""
+        from timeline import Timeline
+        self.timelines[farm_id] = Timeline(retention_days)
+        return self.timelines[farm_id]
+
+    def _record_timelines(self):
+        for farm_id, timeline in self.timelines.items():
+            timeline.record(self.farms[farm_id], self.weather.time)
+
+    def attach_strategy(self, farm_id, host):
+        """Runs a strategy.StrategyHost for farm_id at the end of every hour (its actions go through act())."""
+        host.bind(self, self.farms[farm_id], self.farm_weather[farm_id])
+        self.strategies[farm_id] = host
+        return host
+
+    def _run_strategies(self):
+        # 在两个小时之间执行，与操作记录回放时执行操作的时机相同
+        for host in self.strategies.values():
+            host.run_hour()
+
+    def tick(self, hours=1):
+        """Advances every farm by the given number of hours in lockstep."""
+        for _ in range(hours):
+            if self.weather.is_new_day():
+                self.start_new_day()
+
+            # 天气每小时只计算一次，所有农场的作物用同一份天气批量推进
+            self.weather.update_hour()
+            for farm_id, farm in self.farms.items():
+                for message in farm.update_hour(self.farm_weather[farm_id], self.market):
+                    farm.log(message, "info")
+            self.checkpoint()
+            self._record_timelines()
+            self.hours += 1
+            self._run_strategies()
+
+    def run_days(self, days, fast=False):
+        """
+        Advances by whole days. fast=True steps each day at once with the memoized growth
+        tables instead of 24 hourly updates: much quicker for planning and Monte Carlo runs,
+        but approximate, so it must not be used for recorded or replayed sessions.
+        """
+        if not fast:
+            self.tick(24 * days)
+            return
+        while not self.weather.is_new_day():
+            self.tick(1)
+        for _ in range(days):
+            self.start_new_day()
+            for farm_id, farm in self.farms.items():
+                for message in farm.advance_day(self.farm_weather[farm_id], self.market):
+                    farm.log(message, "info")
+            self.weather.time += timedelta(days=1)
+            self.checkpoint()
+            self._record_timelines()
+            self.hours += 24
+            self._run_strategies()
+
+    def checkpoint(self):
+        """Writes every farm's changes to the state store (if any) in one transaction."""
+        if self.state_store is not None:
+            self.state_store.checkpoint_many(self.farms.values(), self.weather.time, self.market)
+
+    def start_new_day(self):
+        for listener in self.day_listeners:
+            listener(self)
+        self._settle_loans(self.weather.time.day)
+        advance_world_day(self.weather, self.market, self.farms, self.farm_weather, self.outbreaks,
+                          self.farm_links(), self.events)
+        if self.compactor is not None:
+            self.compactor.run(self)
+
+    def farm_links(self):
+        """Which farms can infect each other: all of them on a single location, nearby ones with regional weather."""
+        if not self.regional:
+            return None
+        locations = {farm_id: weather.index for farm_id, weather in self.farm_weather.items()}
+        return distance_links(locations, self.weather.locations, self.farm_link_km)
+
+    def _settle_loans(self, day):
+        """到了还款日的农场一起结算 (loan.settle_due)。"""
+        due = [farm for farm in self.farms.values() if day == farm.loan_manager.repayment_day]
+        if not due:
+            return
+        results = settle_due([farm.loan_manager for farm in due], [farm.funds for farm in due])
+        for farm, (status, amount_paid, message) in zip(due, results):
+            farm.settle_repayment(status, amount_paid)
+            farm.log(message, "warn" if status == "overdue" else "info")
+
+    # --- 玩家操作 ---
+
+    def act(self, farm, action, args):
+        """
+        Applies one named player action to farm and returns (ok, message).
+        服务器请求和操作记录的回放共用这一组操作名称和参数。参数来自客户端，先由 check_args 检查，
+        不合法的请求直接拒绝，既不扣费也不写入操作记录。
+        """
+        bad = self.check_args(farm, action, args)
+        if bad:
+            return False, bad
+        if action == "plant":
+            return farm.plant(args["field"], self.crop_data[args["crop"]], args.get("day") or self.day_of_year)
+        if action in ("water", "pesticide"):
+            return farm.apply_action(args["field"], action)
+        if action == "fertilize":
+            return farm.fertilize(args["field"], args["nutrient"], args.get("cell"))
+        if action == "harvest":
+            result, message = farm.harvest(args["field"])
+            return result is not None, message
+        if action == "clear":
+            return farm.clear_field(args["field"])
+        if action == "bulk":
+            result = farm.bulk_action(args["fields"], args["action"], args.get("nutrient"))
+            return result.ok, result.summary(args.get("nutrient"))
+        if action == "sell":
+            sold = farm.sell_lots(args["lots"] if "lots" in args else [args["lot"]], self.market)
+            if not sold:
+                return False, "没有可出售的批次。"
+            names = ", ".join(sorted({name for name, _value, _lot_id in sold}))
+            return True, f"💰 成功出售 {names}, 获得 ￥{sum(value for _name, value, _lot_id in sold):.2f}"
+        if action == "store":
+            return farm.move_lot(args["lot"], args["tier"])
+        if action == "sell_all":
+            num_sold, revenue = farm.sell_all(self.market)
+            return True, f"💰 共售出 {num_sold}批作物, 总收入 ￥{revenue:.2f}"
+        if action == "borrow":
+            return farm.borrow(args["amount"])
+        if action == "buy_field":
+            return farm.buy_field()
+        if action == "automation":
+            farm.configure_automation(args["rules"], args["enabled"])
+            return True, f"🤖 自动化{'已启用' if args['enabled'] else '已停用'}，共 {len(farm.automation.rules)} 条规则。"
+        raise ValueError(f"未知操作 '{action}'")
+
+    def check_args(self, farm, action, args):
+        """Error message if args is not a valid request for action on farm (see act), else None."""
+        if action not in ACTIONS:
+            return f"未知操作 '{action}'"
+        if not isinstance(args, dict):
+            return "参数必须是一个对象。"
+        if action in ("plant", "water", "pesticide", "fertilize", "harvest", "clear"):
+            bad = _check_indices([args.get("field")], len(farm.fields), "田地")
+            if bad:
+                return bad
+        if action == "plant":
+            if args.get("crop") not in self.crop_data:
+                return f"未知作物 '{args.get('crop')}'"
+            day = args.get("day")
+            if day is not None and not (_is_int(day) and 1 <= day <= 366):
+                return f"无效的播种日期: {day!r} (应为 1~366 的整数)"
+        elif action == "fertilize":
+            if args.get("nutrient") not in NUTRIENTS:
+                return f"无效的肥料类型: {args.get('nutrient')!r} (可用: {', '.join(NUTRIENTS)})"
+            cell = args.get("cell")
+            if cell is not None and not (isinstance(cell, list) and len(cell) == 2 and all(map(_is_int, cell))):
+                return f"无效的格子: {cell!r} (应为 [行, 列])"
+        elif action == "bulk":
+            fields = args.get("fields")
+            if not isinstance(fields, list) or not fields:
+                return "田地编号必须是非空列表。"
+            bad = _check_indices(fields, len(farm.fields), "田地")
+            if bad:
+                return bad
+            if args.get("action") not in ACTION_COSTS:
+                return f"未知批量操作 '{args.get('action')}'"
+            if args["action"] == "fertilize" and args.get("nutrient") not in NUTRIENTS:
+                return f"无效的肥料类型: {args.get('nutrient')!r} (可用: {', '.join(NUTRIENTS)})"
+        elif action == "sell":
+            lots = args["lots"] if "lots" in args else [args.get("lot")]
+            if not isinstance(lots, list):
+                return "批次编号必须是列表。"
+            return _check_indices(lots, len(farm.storage.stock), "批次")
+        elif action == "store":
+            if args.get("tier") not in farm.storage.tiers:
+                return f"未知仓库 '{args.get('tier')}'"
+            return _check_indices([args.get("lot")], len(farm.storage.stock), "批次")
+        elif action == "borrow":
+            amount = args.get("amount")
+            if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not 0 < amount < float("inf"):
+                return f"无效的借款金额: {amount!r}"
+        elif action == "automation":
+            rules = args.get("rules")
+            if not isinstance(rules, list) or not all(isinstance(line, str) for line in rules):
+                return "规则必须是字符串列表。"
+            if not isinstance(args.get("enabled"), bool):
+                return "enabled 必须是 true 或 false。"
+            from automation import RuleError, compile_rules
+            try:
+                compile_rules(rules)
+            except RuleError as e:
+                return f"规则错误: {e}"
+        return None
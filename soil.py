@@ -0,0 +1,177 @@
+# soil.py
+# 土壤网格：每块田地分成 rows×cols 个格子，每格有 N/P/K 和土壤水分。
+# 每天一次 (Farm.start_new_day)：
+#   - 降雨和蒸发改变水分，水分超过田间持水量时养分随水流失 (N 最快，P 几乎不流失)；
+#   - 养分和水分在相邻格子之间扩散 (五点差分)，相邻田地 (按编号排成一排) 通过共享边界交换。
+# 作物从每个格子里各吸收 1/格子数 的需求量；Field.soil_npk 始终是网格的平均值，
+# 所以界面、自动化规则和存档摘要仍然只读 soil_npk。
+#
+# 网格通常是均匀的 (整块施肥、均匀吸收、均匀降雨)，此时扩散不会改变任何值，
+# 只对一个数计算后整层填充；只有定点施肥或相邻田地养分不同时才逐格计算。
+
+from array import array
+
+NUTRIENTS = ("N", "P", "K")
+LAYERS = NUTRIENTS + ("moisture",)
+DIFFUSION = {"N": 0.12, "P": 0.02, "K": 0.06, "moisture": 0.2}  # 每天与每个相邻格子交换差值的比例 (<= 0.25)
+LEACHING = {"N": 0.05, "P": 0.005, "K": 0.02}  # 水分饱和时每天流失的比例
+FIELD_CAPACITY = 80.0  # 超过此水分开始淋溶
+MAX_MOISTURE = 120.0
+DEFAULT_GRID = (8, 8)
+UNIFORM_EPSILON = 1e-9
+
+
+class SoilGrid:
+    def __init__(self, rows, cols, npk, moisture=60.0):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        values = dict(npk, moisture=moisture)
+        self.layers = {name: array("d", [float(values[name])]) * self.size for name in LAYERS}
+        self.uniform = True  # 所有格子各层数值相同
+
+    def mean(self, name):
+        layer = self.layers[name]
+        return layer[0] if self.uniform else sum(layer) / self.size
+
+    def means(self):
+        return {name: self.mean(name) for name in NUTRIENTS}
+
+    def _fill(self, name, value):
+        self.layers[name] = array("d", [value]) * self.size
+
+    def add(self, name, amount, cell=None):
+        """Adds amount to every cell, or amount × cell count to one cell (row, col) (spot application)."""
+        if cell is None:
+            if self.uniform:
+                self._fill(name, self.layers[name][0] + amount)
+            else:
+                self.layers[name] = array("d", (v + amount for v in self.layers[name]))
+            return
+        row, col = cell
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            raise ValueError(f"格子 ({row}, {col}) 超出 {self.rows}×{self.cols} 网格")
+        self.layers[name][row * self.cols + col] += amount * self.size
+        self.uniform = False
+
+    def uptake(self, demand):
+        """
+        Removes up to demand[n] / cell count of each nutrient from every cell.
+        Returns the field-level amounts actually taken (same units as Field.soil_npk).
+        """
+        taken = {}
+        for name in NUTRIENTS:
+            want = demand[name]
+            layer = self.layers[name]
+            if self.uniform:
+                got = min(want, layer[0])
+                self._fill(name, layer[0] - got)
+            else:
+                left = self.layers[name] = array("d", (v - want if v > want else 0.0 for v in layer))
+                got = (sum(layer) - sum(left)) / self.size
+            taken[name] = got
+        return taken
+
+    def daily_update(self, rainfall, temperature):
+        """Rain / evaporation, leaching and diffusion for one day."""
+        change = rainfall * 2 - max(0.0, temperature) * 0.4
+        span = MAX_MOISTURE - FIELD_CAPACITY
+        moisture = self.layers["moisture"]
+        if self.uniform or max(moisture) - min(moisture) <= UNIFORM_EPSILON:
+            # 水分均匀 (最常见)：淋溶对每个格子是同一个比例
+            level = max(0.0, min(MAX_MOISTURE, moisture[0] + change))
+            self._fill("moisture", level)
+            excess = max(0.0, level - FIELD_CAPACITY) / span
+            if excess > 0:
+                for name in NUTRIENTS:
+                    factor = 1 - LEACHING[name] * excess
+                    if self.uniform:
+                        self._fill(name, self.layers[name][0] * factor)
+                    else:
+                        self.layers[name] = array("d", (v * factor for v in self.layers[name]))
+            if self.uniform:
+                return
+        else:
+            self.layers["moisture"] = moisture = array("d", (max(0.0, min(MAX_MOISTURE, m + change)) for m in moisture))
+            for name in NUTRIENTS:
+                rate = LEACHING[name] / span
+                self.layers[name] = array("d", (v * (1 - rate * (m - FIELD_CAPACITY)) if m > FIELD_CAPACITY else v
+                                                for v, m in zip(self.layers[name], moisture)))
+        for name in LAYERS:
+            self._diffuse(name)
+        self.check_uniform()
+
+    def _diffuse(self, name):
+        layer = self.layers[name]
+        if max(layer) - min(layer) <= UNIFORM_EPSILON:
+            return
+        d = DIFFUSION[name]
+        cols = self.cols
+        # 每对相邻格子交换 d × 差值，总量守恒；边缘格子没有外侧邻居 (相邻田地另由 exchange_border 处理)
+        # 横向和纵向的通量各用一次 zip 计算，避免逐格查邻居
+        across = [d * (b - a) for a, b in zip(layer, layer[1:])]
+        for k in range(cols - 1, len(across), cols):
+            across[k] = 0.0  # 行尾与下一行行首不相邻
+        down = [d * (b - a) for a, b in zip(layer, layer[cols:])]
+        zeros = [0.0] * cols
+        self.layers[name] = array("d", (
+            v + right - left + below - above
+            for v, right, left, below, above in zip(layer, across + [0.0], [0.0] + across, down + zeros, zeros + down)
+        ))
+
+    def check_uniform(self):
+        self.uniform = all(max(layer) - min(layer) <= UNIFORM_EPSILON for layer in self.layers.values())
+        if self.uniform:
+            for name, layer in self.layers.items():
+                self._fill(name, layer[0])
+
+    def to_dict(self):
+        data = {"rows": self.rows, "cols": self.cols}
+        for name, layer in self.layers.items():
+            data[name] = layer[0] if self.uniform else list(layer)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        grid = cls(data["rows"], data["cols"], {name: 0.0 for name in NUTRIENTS})
+        for name in LAYERS:
+            value = data[name]
+            if isinstance(value, list):
+                grid.layers[name] = array("d", value)
+            else:
+                grid._fill(name, value)
+        grid.check_uniform()
+        return grid
+
+
+def exchange_border(left, right):
+    """Diffusion across the shared border of two same-height grids (left's last column, right's first column)."""
+    if left.rows != right.rows:
+        return
+    if left.uniform and right.uniform and all(left.layers[n][0] == right.layers[n][0] for n in LAYERS):
+        return
+    for name in LAYERS:
+        d = DIFFUSION[name]
+        a, b = left.layers[name], right.layers[name]
+        for row in range(left.rows):
+            i, j = row * left.cols + left.cols - 1, row * right.cols
+            flow = d * (b[j] - a[i])
+            a[i] += flow
+            b[j] -= flow
+    left.check_uniform()
+    right.check_uniform()
+
+
+def update_fields(fields, weather):
+    """Daily soil update of a farm's fields (fields without a grid are skipped)."""
+    grids = [field.grid for field in fields]
+    if not any(grids):
+        return
+    temperature = sum(weather.daily_temperature_curve) / len(weather.daily_temperature_curve)
+    for left, right in zip(grids, grids[1:]):
+        if left is not None and right is not None:
+            exchange_border(left, right)
+    for field, grid in zip(fields, grids):
+        if grid is not None:
+            grid.daily_update(weather.rainfall_today, temperature)
+            field.sync_soil()
@@ -1,37 +1,224 @@
 import random
 
+from catalog import get_catalog
+from valuation import InventoryValuation, lot_value, quality_bonus
+
+# 仓库分层: 容量 (公斤，None 为不限)、腐烂速度倍数、每公斤每天的仓储费
+# 收获默认进常温库，常温库放满后放在露天 (不收费但腐烂更快)；冷藏库需要手动移入。
+STORAGE_TIERS = {
+    "常温": {"capacity": 20000.0, "decay": 1.0, "fee": 0.005},
+    "冷藏": {"capacity": 5000.0, "decay": 0.3, "fee": 0.02},
+    "露天": {"capacity": None, "decay": 2.0, "fee": 0.0},
+}
+DEFAULT_TIER = "常温"
+OVERFLOW_TIER = "露天"
+
+
+def merge_key(lot):
+    """Lots with the same key are interchangeable and are kept as one aggregated batch (see merge_into)."""
+    return lot["name"], lot.get("tier", DEFAULT_TIER), lot["days"], tuple(sorted(lot.get("quality_tags", ())))
+
+
+def merge_into(target, lot):
+    """Adds lot to target: weights add up, nutrition and freshness become yield-weighted averages."""
+    total = target["yield"] + lot["yield"]
+    if total > 0:
+        for key in ("nutrition", "freshness"):
+            target[key] = round((target[key] * target["yield"] + lot[key] * lot["yield"]) / total, 2)
+    target["yield"] = round(total, 1)
+    target["cost"] = round(target.get("cost", 0) + lot.get("cost", 0), 2)
+    target["harvests"] = target.get("harvests", 1) + lot.get("harvests", 1)
+
+
 class Storage:
-    def __init__(self):
+    """
+    库存批次 (stock) 按仓库分层存放。同一作物、同一仓库、同样存放天数和品质标签的收获自动合并成一批，
+    所以批次数只随作物种类和收获日期增长，不随收获次数增长。新鲜度降为 0 的批次由 compact() 跨天数合并。
+    """
+
+    def __init__(self, catalog=None, tiers=None):
+        self.catalog = catalog or get_catalog()
+        self.tiers = {name: dict(spec) for name, spec in (tiers or STORAGE_TIERS).items()}
         self.stock = []
+        self.next_lot_id = 1
+        self.version = 0  # 库存每次变化加一，估值缓存据此失效
+        self.valuation = InventoryValuation(self)
+
+    def used(self, tier):
+        return sum(lot["yield"] for lot in self.stock if lot.get("tier", DEFAULT_TIER) == tier)
 
-    def add_crop(self, crop_info):
-        self.stock.append({
+    def free(self, tier):
+        capacity = self.tiers[tier]["capacity"]
+        return None if capacity is None else max(0.0, capacity - self.used(tier))
+
+    def _fits(self, tier, weight):
+        free = self.free(tier)
+        return free is None or weight <= free + 1e-9
+
+    def _find(self, key, exclude=None):
+        for lot in self.stock:
+            if lot is not exclude and merge_key(lot) == key:
+                return lot
+        return None
+
+    def add_crop(self, crop_info, tier=DEFAULT_TIER):
+        """Adds a harvest (merged into a matching batch if there is one) and returns its lot_id."""
+        if not self.catalog.is_tradable(crop_info["name"]):
+            raise ValueError(f"未知作物 '{crop_info['name']}'，目录中没有它的市场价格。")
+        self.version += 1
+        if not self._fits(tier, crop_info["yield"]):
+            tier = OVERFLOW_TIER
+        lot = {
+            "lot_id": self.next_lot_id,
             "name": crop_info["name"],
             "yield": crop_info["yield"],
             "nutrition": crop_info["nutrition"],
             "freshness": crop_info["freshness"],
             "cost": crop_info.get("cost", 0), # Get cost, default to 0 if not present
-            "days": 0
-        })
+            "days": 0,
+            "tier": tier,
+            "quality_tags": sorted(crop_info.get("quality_tags", ())),
+        }
+        existing = self._find(merge_key(lot))
+        if existing is not None:
+            merge_into(existing, lot)
+            return existing["lot_id"]
+        self.stock.append(lot)
+        self.next_lot_id += 1
+        return self.next_lot_id - 1
+
+    def move_lot(self, index, tier):
+        """
+        Moves a lot to another warehouse tier. If the tier cannot hold all of it, the part that
+        fits is split off into a new lot. Returns (ok, message).
+        """
+        if tier not in self.tiers:
+            return False, f"未知仓库 '{tier}'。"
+        if not 0 <= index < len(self.stock):
+            return False, "无效的批次。"
+        lot = self.stock[index]
+        if lot.get("tier", DEFAULT_TIER) == tier:
+            return False, f"该批次已经在{tier}库。"
+        free = self.free(tier)
+        if free is not None and free < 1:
+            return False, f"{tier}库已满。"
+        self.version += 1
+        if free is not None and lot["yield"] > free:
+            share = free / lot["yield"]
+            moved = dict(lot, lot_id=self.next_lot_id, cost=round(lot.get("cost", 0) * share, 2))
+            moved["yield"] = round(free, 1)
+            lot["yield"] = round(lot["yield"] - moved["yield"], 1)
+            lot["cost"] = round(lot.get("cost", 0) - moved["cost"], 2)
+            self.next_lot_id += 1
+            self.stock.append(moved)
+            index = len(self.stock) - 1
+        lot = self.stock[index]
+        lot["tier"] = tier
+        existing = self._find(merge_key(lot), exclude=lot)
+        if existing is not None:
+            merge_into(existing, lot)
+            self.stock.pop(index)
+        return True, f"📦 {lot['name']} {lot['yield']:.0f}kg 已移入{tier}库。"
+
+    def load_stock(self, stock):
+        """Restores lots from a save, numbering lots from older saves that have no lot_id."""
+        self.stock = stock
+        self.version += 1
+        self.next_lot_id = max([lot.get("lot_id") or 0 for lot in stock] + [0]) + 1
+        for lot in stock:
+            lot.setdefault("tier", DEFAULT_TIER)
+            if not lot.get("lot_id"):
+                lot["lot_id"] = self.next_lot_id
+                self.next_lot_id += 1
 
-    def update_all(self, storage_cost_per_crop=2.0):
+    def update_all(self):
+        """Ages every lot by one day (per-crop decay curve × tier factor) and returns the day's storage fee."""
         total_cost = 0
+        self.version += 1
         for crop in self.stock:
             crop['days'] += 1
-            # 更加平滑的腐烂曲线，初期腐烂较慢
-            decay_factor = 0.5 + (crop['days'] / 30) # 腐烂速度随时间增加
+            tier = self.tiers[crop.get('tier', DEFAULT_TIER)]
+            base, per_day = self.catalog.product(crop['name']).decay
+            # 腐烂速度随存放时间增加，冷藏按倍数减缓
+            decay_factor = (base + crop['days'] * per_day) * tier['decay']
             decay = random.uniform(0.8, 1.2) * decay_factor
             crop['freshness'] = max(0.0, crop['freshness'] - decay)
-            total_cost += storage_cost_per_crop
+            total_cost += crop['yield'] * tier['fee']
+        self.merge_lots()
         return round(total_cost, 2)
 
-    def sell_crop(self, index, market_price, quality_bonus=1.0):
+    def merge_lots(self):
+        """Merges lots that share a merge_key (keeps the oldest lot_id). Returns how many lots were merged away."""
+        seen = {}
+        kept = []
+        for lot in self.stock:
+            key = merge_key(lot)
+            if key in seen:
+                merge_into(seen[key], lot)
+            else:
+                seen[key] = lot
+                kept.append(lot)
+        merged = len(self.stock) - len(kept)
+        self.stock = kept
+        return merged
+
+    def compact(self, max_days=None):
+        """
+        Long-run housekeeping (compaction.py). Lots at zero freshness no longer change, so they are merged
+        regardless of their age (keeping the oldest age); lots stored longer than max_days are written off.
+        Returns (lots merged away, expired lots).
+        """
+        spent = {}
+        kept = []
+        expired = []
+        for lot in self.stock:
+            if max_days is not None and lot["days"] > max_days:
+                expired.append(lot)
+                continue
+            if lot["freshness"] <= 0:
+                key = (lot["name"], lot.get("tier", DEFAULT_TIER), tuple(sorted(lot.get("quality_tags", ()))))
+                target = spent.get(key)
+                if target is not None:
+                    merge_into(target, lot)
+                    target["days"] = max(target["days"], lot["days"])
+                    continue
+                spent[key] = lot
+            kept.append(lot)
+        merged = len(self.stock) - len(kept) - len(expired)
+        if merged or expired:
+            self.stock = kept
+            self.version += 1
+        return merged, expired
+
+    def sell_crop(self, index, market_price):
         if index < 0 or index >= len(self.stock):
             return None, 0.0
         crop = self.stock.pop(index)
-        multiplier = (crop['nutrition'] * 0.5 + crop['freshness'] * 0.5) / 100
-        final_price = round(crop['yield'] * market_price * multiplier * quality_bonus, 2)
-        return crop['name'], final_price
+        self.version += 1
+        return crop['name'], lot_value(crop, market_price)
+
+    def lot_indices(self, indices):
+        """Positions in stock without duplicates (first occurrence kept); ValueError if any is not a valid position."""
+        unique = list(dict.fromkeys(indices))
+        for i in unique:
+            if not isinstance(i, int) or isinstance(i, bool) or not 0 <= i < len(self.stock):
+                raise ValueError(f"无效的批次编号: {i!r}")
+        return unique
+
+    def sell_lots(self, indices, market):
+        """
+        把多批作物作为一次撮合卖给市场：同一作物的总重量一起影响价格，
+        每批按同一成交均价结算。返回 [(作物名, 售价, 批次号), ...]，顺序与去重后的 indices 一致。
+        编号无效时抛出 ValueError，不会产生任何成交。
+        """
+        indices = self.lot_indices(indices)
+        lots = [self.stock[i] for i in indices]
+        avg_prices = market.sell_batch([(lot['name'], lot['yield']) for lot in lots])
+        results = [(lot['name'], lot_value(lot, price), lot.get('lot_id')) for lot, price in zip(lots, avg_prices)]
+        for i in sorted(indices, reverse=True):
+            self.stock.pop(i)
+        self.version += 1
+        return results
 
     def list_storage(self):
         if not self.stock:
@@ -0,0 +1,401 @@
+# strategy.py
+# 策略脚本：用 Python 类编写农场策略，比自动化规则 (automation.py) 更灵活。
+#
+#   class MyPolicy(Strategy):
+#       def on_hour(self, farm):
+#           return [("water", {"field": f.index}) for f in farm.fields if f.growing and f.water_level < 35]
+#       def on_repayment_day(self, farm):
+#           if farm.funds < farm.loans.amount_due():
+#               return [("sell_all", {})]
+#
+# 钩子 on_hour / on_day / on_harvest / on_repayment_day 收到只读的 FarmView (田地、仓库、市场、贷款)，
+# 返回一批操作 [(操作, 参数), ...]，名称和参数与 Simulation.act 相同，所以会被操作记录 (action_log.py)
+# 原样记录，回放时不需要策略文件。
+#
+# StrategyHost 负责运行一个策略文件：
+#   - 热加载：文件修改后在下一个小时重新加载，新实例继承旧实例的 state 和 rng；加载失败时保留旧版本。
+#   - 沙箱：脚本只能使用一部分内置函数和 ALLOWED_MODULES 中的模块 (防止误用，不是安全边界)。
+#     不能使用全局 random (会打乱模拟的随机序列、破坏回放)，请用 self.rng。
+#   - 时间预算：钩子超过 budget_ms 时这次返回的操作作废；连续 max_failures 次超时或出错后暂停该钩子，
+#     直到文件重新加载。
+#   - 缓存：on_hour 的输入 (FarmView.fingerprint()，量化后的田地状态、库存版本、价格、资金) 与上次相同时
+#     直接跳过，不调用策略。依赖小时等其他输入的策略可以设 cache = False 或重写 fingerprint()。
+#
+# 调用时机 (Simulation.tick 每小时结束时，与回放执行操作的时机相同)：每小时 on_hour；到 0 点时先
+# on_repayment_day (当天是还款日，结算之前)，再 on_day (新一天的价格刷新之前)；收获后 on_harvest。
+
+import builtins
+import os
+import random
+import time
+from types import MappingProxyType
+
+from farm import is_growing, is_harvestable
+
+ACTIONS = {"plant", "water", "pesticide", "fertilize", "harvest", "clear", "bulk",
+           "sell", "sell_all", "store", "borrow", "buy_field"}
+ALLOWED_MODULES = {"math", "statistics", "collections", "itertools", "functools", "heapq", "bisect",
+                   "dataclasses", "strategy"}
+SAFE_BUILTINS = (
+    "abs", "all", "any", "bool", "dict", "divmod", "enumerate", "filter", "float", "frozenset", "getattr",
+    "hasattr", "int", "isinstance", "issubclass", "len", "list", "map", "max", "min", "print", "range",
+    "repr", "reversed", "round", "set", "slice", "sorted", "str", "sum", "super", "tuple", "zip",
+    "object", "property", "staticmethod", "classmethod", "Exception", "ValueError", "KeyError",
+    "IndexError", "TypeError", "ZeroDivisionError", "__build_class__",
+)
+HOOKS = ("on_hour", "on_day", "on_harvest", "on_repayment_day")
+MAX_ACTIONS_PER_CALL = 20
+
+
+class Strategy:
+    """Base class of a farm policy. Every hook returns an iterable of (action, args) or None."""
+    cache = True  # on_hour 输入未变化时跳过
+
+    def __init__(self):
+        self.state = {}             # 跨热加载保留
+        self.rng = random.Random()  # 策略自己的随机数，不影响模拟
+
+    def on_hour(self, farm):
+        return None
+
+    def on_day(self, farm):
+        return None
+
+    def on_harvest(self, farm, harvest):
+        return None
+
+    def on_repayment_day(self, farm):
+        return None
+
+    def fingerprint(self, farm):
+        return farm.fingerprint()
+
+
+# --- 只读视图 ---
+
+class FieldView:
+    __slots__ = ("_field", "index")
+
+    def __init__(self, field, index):
+        self._field = field
+        self.index = index
+
+    crop = property(lambda self: self._field.crop.crop_data.name if self._field.crop else None)
+    empty = property(lambda self: self._field.crop is None)
+    growing = property(lambda self: is_growing(self._field))
+    harvestable = property(lambda self: is_harvestable(self._field))
+    matured = property(lambda self: bool(self._field.crop and self._field.crop.matured))
+    dead = property(lambda self: bool(self._field.crop and self._field.crop.dead))
+    water_level = property(lambda self: self._field.crop.water_level if self._field.crop else None)
+    health = property(lambda self: self._field.crop.health if self._field.crop else None)
+    growth_points = property(lambda self: self._field.crop.growth_points if self._field.crop else None)
+    days = property(lambda self: self._field.crop.day_counter if self._field.crop else None)
+    infection = property(lambda self: self._field.crop.infection if self._field.crop else None)
+    infection_risk = property(lambda self: self._field.crop.infection_risk if self._field.crop else None)
+    pesticide_hours = property(lambda self: self._field.crop.pesticide_effect_hours if self._field.crop else None)
+    damage = property(lambda self: frozenset(self._field.crop.damage_reasons) if self._field.crop else frozenset())
+    soil = property(lambda self: MappingProxyType(self._field.soil_npk))
+
+    @property
+    def progress(self):
+        crop = self._field.crop
+        return crop.growth_points / crop.crop_data.grow_days if crop else None
+
+
+class StorageView:
+    __slots__ = ("_storage", "_market", "_lots", "_version")
+
+    def __init__(self, storage, market):
+        self._storage = storage
+        self._market = market
+        self._lots = ()
+        self._version = None
+
+    @property
+    def lots(self):
+        """Read-only lot dicts, in stock order (the index is what "sell" / "store" expect)."""
+        if self._version != self._storage.version:
+            self._lots = tuple(MappingProxyType(lot) for lot in self._storage.stock)
+            self._version = self._storage.version
+        return self._lots
+
+    @property
+    def tiers(self):
+        return tuple(self._storage.tiers)
+
+    def used(self, tier):
+        return self._storage.used(tier)
+
+    def free(self, tier):
+        return self._storage.free(tier)
+
+    def valuation(self):
+        """valuation.LotValue rows (value, profit, break-even days, at_risk) for every lot."""
+        return self._storage.valuation.lots(self._market)
+
+    def total_value(self):
+        return self._storage.valuation.total(self._market)
+
+
+class MarketView:
+    __slots__ = ("_market",)
+
+    def __init__(self, market):
+        self._market = market
+
+    def price(self, name):
+        return self._market.get_price(name)
+
+    def quote(self, name, quantity):
+        return self._market.quote(name, quantity)
+
+    @property
+    def prices(self):
+        return {p.name: p.price for p in self._market.products}
+
+
+class LoanView:
+    __slots__ = ("_loans",)
+
+    def __init__(self, loans):
+        self._loans = loans
+
+    total_debt = property(lambda self: self._loans.total_debt)
+    credit_score = property(lambda self: self._loans.credit_score)
+    repayment_day = property(lambda self: self._loans.repayment_day)
+    interest_rate = property(lambda self: self._loans.interest_rate)
+    overdue_balance = property(lambda self: self._loans.overdue_balance)
+
+    def amount_due(self):
+        return self._loans.amount_due()
+
+
+class FarmView:
+    """What a strategy sees of one farm. Built once per farm and reused; it always reads the live state."""
+
+    def __init__(self, sim, farm, weather):
+        self._sim = sim
+        self._farm = farm
+        self._weather = weather
+        self._fields = ()
+        self.storage = StorageView(farm.storage, sim.market)
+        self.market = MarketView(sim.market)
+        self.loans = LoanView(farm.loan_manager)
+
+    farm_id = property(lambda self: self._farm.ledger_key)
+    funds = property(lambda self: self._farm.funds)
+    now = property(lambda self: self._sim.now)
+    day_of_year = property(lambda self: self._sim.day_of_year)
+    temperature = property(lambda self: self._weather.current_temperature)
+    rainfall_today = property(lambda self: self._weather.rainfall_today)
+    extreme_event = property(lambda self: self._weather.extreme_event)
+    crops = property(lambda self: tuple(self._sim.crop_data))
+
+    @property
+    def fields(self):
+        fields = self._farm.fields
+        if len(self._fields) != len(fields):
+            self._fields = tuple(FieldView(field, i) for i, field in enumerate(fields))
+        return self._fields
+
+    def fingerprint(self):
+        """Quantized inputs of on_hour: field states, storage version, prices, funds."""
+        fields = []
+        for field in self._farm.fields:
+            crop = field.crop
+            if crop is None:
+                fields.append(None)
+            else:
+                fields.append((crop.crop_data.name, crop.matured, crop.dead or crop.harvested,
+                               int(crop.water_level // 5), int(crop.health // 5),
+                               crop.pesticide_effect_hours > 0, crop.infection > 0))
+        return (tuple(fields), self._farm.storage.version, int(self._farm.funds // 100),
+                tuple(p.price for p in self._sim.market.products))
+
+
+# --- 加载与运行 ---
+
+class StrategyError(Exception):
+    """Raised when a strategy file cannot be loaded."""
+
+
+def _guarded_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level != 0 or name.split(".")[0] not in ALLOWED_MODULES:
+        raise ImportError(f"策略脚本不能导入 '{name}'")
+    return __import__(name, globals, locals, fromlist, level)
+
+
+def load_strategy(source, filename="<strategy>"):
+    """Executes strategy source in a restricted namespace and returns an instance of its Strategy subclass."""
+    safe = {name: getattr(builtins, name) for name in SAFE_BUILTINS}
+    safe["__import__"] = _guarded_import
+    namespace = {"__builtins__": safe, "__name__": "strategy_script", "Strategy": Strategy}
+    try:
+        exec(compile(source, filename, "exec"), namespace)
+    except Exception as e:
+        raise StrategyError(f"{type(e).__name__}: {e}") from e
+    classes = [obj for obj in namespace.values()
+               if isinstance(obj, type) and issubclass(obj, Strategy) and obj is not Strategy]
+    if len(classes) != 1:
+        raise StrategyError(f"{filename} 中应当正好定义一个 Strategy 子类 (找到 {len(classes)} 个)")
+    try:
+        return classes[0]()
+    except Exception as e:
+        raise StrategyError(f"{type(e).__name__}: {e}") from e
+
+
+class HookStats:
+    __slots__ = ("calls", "cached", "elapsed", "overruns", "errors", "failures", "suspended")
+
+    def __init__(self):
+        self.calls = 0
+        self.cached = 0
+        self.elapsed = 0.0
+        self.overruns = 0
+        self.errors = 0
+        self.failures = 0    # 连续超时或出错的次数
+        self.suspended = False
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != "elapsed"} | {
+            "elapsed_ms": round(self.elapsed * 1000, 2)}
+
+
+class StrategyHost:
+    """
+    Runs one strategy for one farm of a Simulation (Simulation.attach_strategy).
+    path: a strategy file (hot-reloaded), or strategy: a Strategy instance.
+    """
+
+    def __init__(self, path=None, strategy=None, budget_ms=5.0, max_failures=3, reload_interval=1.0):
+        if (path is None) == (strategy is None):
+            raise ValueError("需要 path 或 strategy 中的一个")
+        self.path = path
+        self.budget = budget_ms / 1000
+        self.max_failures = max_failures
+        self.reload_interval = reload_interval
+        self.strategy = strategy
+        self.stats = {hook: HookStats() for hook in HOOKS}
+        self.reloads = 0
+        self.actions = 0
+        self._mtime = None
+        self._checked = 0.0
+        self._last_key = None
+        self._harvests = []
+        self.sim = self.farm = self.view = None
+        if path is not None:
+            self._mtime = os.stat(path).st_mtime_ns
+            self.strategy = self._load()
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return load_strategy(f.read(), self.path)
+
+    def bind(self, sim, farm, weather):
+        self.sim = sim
+        self.farm = farm
+        self.view = FarmView(sim, farm, weather)
+        farm.harvest_listeners.append(self._harvests.append)
+
+    def check_reload(self):
+        """Reloads the strategy file if it changed (at most every reload_interval seconds)."""
+        if self.path is None:
+            return False
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return False
+        self._checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            strategy = self._load()
+        except (OSError, StrategyError) as e:
+            self.farm.log(f"策略重新加载失败，继续使用旧版本: {e}", "error")
+            return False
+        strategy.state = self.strategy.state
+        strategy.rng = self.strategy.rng
+        self.strategy = strategy
+        self.reloads += 1
+        self._last_key = None
+        for stats in self.stats.values():
+            stats.failures = 0
+            stats.suspended = False
+        self.farm.log(f"🔄 策略已重新加载 ({os.path.basename(self.path)})", "info")
+        return True
+
+    def run_hour(self):
+        """Runs the hooks due at the end of this hour and applies their actions."""
+        self.check_reload()
+        now = self.sim.now
+        if now.hour == 0 and now.minute == 0:
+            if now.day == self.farm.loan_manager.repayment_day:
+                self._call("on_repayment_day")
+            self._call("on_day")
+        while self._harvests:
+            harvest = self._harvests.pop(0)
+            self._call("on_harvest", MappingProxyType(harvest))
+        stats = self.stats["on_hour"]
+        if self.strategy.cache and not stats.suspended:
+            key = self.strategy.fingerprint(self.view)
+            if key == self._last_key:
+                stats.cached += 1
+                return
+            self._last_key = key
+        self._call("on_hour")
+
+    def _call(self, hook, *args):
+        stats = self.stats[hook]
+        if stats.suspended:
+            return
+        stats.calls += 1
+        start = time.perf_counter()
+        try:
+            actions = list(getattr(self.strategy, hook)(self.view, *args) or ())
+        except Exception as e:
+            stats.errors += 1
+            self._fail(hook, stats, f"{type(e).__name__}: {e}")
+            return
+        elapsed = time.perf_counter() - start
+        stats.elapsed += elapsed
+        if elapsed > self.budget:
+            stats.overruns += 1
+            self._fail(hook, stats, f"耗时 {elapsed * 1000:.1f}ms 超过预算 {self.budget * 1000:.1f}ms，本次操作作废")
+            return
+        stats.failures = 0
+        self._apply(hook, actions)
+
+    def _fail(self, hook, stats, reason):
+        stats.failures += 1
+        self.farm.log(f"策略 {hook}: {reason}", "error")
+        if stats.failures >= self.max_failures:
+            stats.suspended = True
+            self.farm.log(f"策略 {hook} 连续失败 {stats.failures} 次，已暂停 (修改策略文件后重新启用)。", "error")
+
+    def _apply(self, hook, actions):
+        for item in actions[:MAX_ACTIONS_PER_CALL]:
+            try:
+                action, args = item
+            except (TypeError, ValueError):
+                self.farm.log(f"策略 {hook}: 无效的操作 {item!r}", "warn")
+                continue
+            if action not in ACTIONS:
+                self.farm.log(f"策略 {hook}: 不支持的操作 '{action}'", "warn")
+                continue
+            try:
+                ok, message = self.sim.act(self.farm, action, dict(args))
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                self.farm.log(f"策略 {hook}: 操作 {action} 参数错误 ({type(e).__name__}: {e})", "warn")
+                continue
+            self.actions += 1
+            self.farm.log(f"🧠 {message}", "info" if ok else "warn")
+        if len(actions) > MAX_ACTIONS_PER_CALL:
+            self.farm.log(f"策略 {hook}: 一次最多执行 {MAX_ACTIONS_PER_CALL} 个操作，其余忽略。", "warn")
+
+    def summary(self):
+        return {"reloads": self.reloads, "actions": self.actions,
+                "hooks": {hook: stats.to_dict() for hook, stats in self.stats.items()}}
@@ -0,0 +1,184 @@
+# telemetry.py
+# 模拟事件总线：引擎发布带类型的结构化事件，订阅者按批写出 (NDJSON 文件、本地 socket、回调)。
+# 没有订阅者时 publish() 直接返回，不影响模拟速度。
+#
+#   bus = EventBus()
+#   bus.subscribe(NDJSONSink("events.ndjson"), kinds={"harvest", "sale"})
+#   farm = Farm(events=bus)
+
+import abc
+import json
+import queue
+import socket
+import threading
+from collections import namedtuple
+
+# 事件类型 -> 附带的数据字段
+EVENT_KINDS = {
+    "transaction": ("category", "amount", "ref", "crop", "balance"),  # 每一笔资金变动 (与账本类别一致)
+    "damage": ("field", "crop", "reasons"),         # 作物新出现的问题
+    "matured": ("field", "crop"),
+    "died": ("field", "crop", "reasons"),
+    "harvest": ("field", "crop", "yield", "quality_tags", "lot_id"),
+    "sale": ("lot_id", "crop", "value"),
+    "repayment": ("status", "amount", "debt", "credit_score"),
+    "price": ("prices",),                           # 每日价格刷新 {作物: 价格}
+}
+
+
+class Event(namedtuple("Event", "kind ts farm data")):
+    __slots__ = ()
+
+    def to_dict(self):
+        return {"kind": self.kind, "ts": self.ts, "farm": self.farm, **self.data}
+
+
+class EventBus:
+    def __init__(self):
+        self._subscribers = []  # (事件类型集合或 None, sink)
+
+    @property
+    def active(self):
+        return bool(self._subscribers)
+
+    def subscribe(self, sink, kinds=None):
+        """Routes events of the given kinds (all kinds if None) to sink. Returns sink."""
+        if kinds is not None:
+            unknown = set(kinds) - set(EVENT_KINDS)
+            if unknown:
+                raise ValueError(f"未知事件类型: {', '.join(sorted(unknown))}")
+            kinds = frozenset(kinds)
+        self._subscribers.append((kinds, sink))
+        return sink
+
+    def unsubscribe(self, sink):
+        self._subscribers = [(kinds, s) for kinds, s in self._subscribers if s is not sink]
+
+    def publish(self, kind, ts, farm=None, **data):
+        if not self._subscribers:
+            return
+        event = Event(kind, ts, farm, data)
+        for kinds, sink in self._subscribers:
+            if kinds is None or kind in kinds:
+                sink.put(event)
+
+    def flush(self):
+        for _kinds, sink in self._subscribers:
+            sink.flush()
+
+    def close(self):
+        for _kinds, sink in self._subscribers:
+            sink.close()
+        self._subscribers = []
+
+
+class BatchSink(abc.ABC):
+    """Buffers events and hands them to write_batch() batch_size at a time."""
+
+    def __init__(self, batch_size=256):
+        self.batch_size = batch_size
+        self.batch = []
+        self.written = 0
+
+    def put(self, event):
+        self.batch.append(event)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            batch, self.batch = self.batch, []
+            self.write_batch(batch)
+            self.written += len(batch)
+
+    @abc.abstractmethod
+    def write_batch(self, events):
+        """Writes one batch of events; subclasses decide where they go."""
+
+    def close(self):
+        self.flush()
+
+
+def encode_ndjson(events):
+    return "".join(json.dumps(event.to_dict(), ensure_ascii=False) + "\n" for event in events).encode("utf-8")
+
+
+class NDJSONSink(BatchSink):
+    """Appends one JSON object per line to a file (path or binary file object)."""
+
+    def __init__(self, target, batch_size=256):
+        super().__init__(batch_size)
+        self._owns_file = isinstance(target, str)
+        self.file = open(target, "ab") if self._owns_file else target
+
+    def write_batch(self, events):
+        self.file.write(encode_ndjson(events))
+
+    def close(self):
+        self.flush()
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class CallbackSink(BatchSink):
+    """Calls callback(events) with each batch, e.g. to feed an in-process dashboard."""
+
+    def __init__(self, callback, batch_size=64):
+        super().__init__(batch_size)
+        self.callback = callback
+
+    def write_batch(self, events):
+        self.callback(events)
+
+
+class SocketSink(BatchSink):
+    """
+    把事件以 NDJSON 发送到本地 socket (TCP 或 Unix socket)。
+    发送在后台线程中进行，模拟线程只把编码好的批次放进有界队列：
+    - block=True: 队列满时模拟等待发送线程 (背压)
+    - block=False: 队列满时丢弃这一批并计入 dropped
+    """
+
+    def __init__(self, host="127.0.0.1", port=8766, path=None, batch_size=256, max_pending=64, block=True):
+        super().__init__(batch_size)
+        if path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.block = block
+        self.dropped = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._send_loop, name="telemetry-socket", daemon=True)
+        self._thread.start()
+
+    def write_batch(self, events):
+        if self.error is not None:
+            self.dropped += len(events)
+            return
+        payload = encode_ndjson(events)
+        try:
+            self._queue.put((payload, len(events)), block=self.block)
+        except queue.Full:
+            self.dropped += len(events)
+
+    def _send_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            payload, count = item
+            try:
+                self.sock.sendall(payload)
+            except OSError as e:
+                self.error = e
+                self.dropped += count
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self.sock.close()
@@ -0,0 +1,51 @@
+import pytest
+
+from automation import AutomationEngine, RuleError, compile_rules
+
+
+@pytest.mark.parametrize("line", [
+    "water when water_level < 40",
+    "pesticide when damage has 病害 and health >= 50",
+    "harvest when matured",
+    "fertilize_N when soil_N < 60 and crop == 小麦",
+    "sell when freshness < 70 and name != 玉米",
+    "sell when tags has 优质 and days > 3",
+    "water when funds > 1000 and hour == 6",
+])
+def test_valid_rules_compile(line):
+    (rule,) = compile_rules([line])
+    assert rule.text == line
+
+
+@pytest.mark.parametrize("line", [
+    "water when water_level < abc",     # 数值属性需要数字
+    "sell when freshness >= fresh",
+    "water when funds > lots",
+    "water when health has 病害",       # has 只能用于集合属性
+    "water when crop has 小麦",
+    "water when damage == 缺水",        # 集合属性只能用 has
+    "sell when tags > 1",
+    "water when crop < 小麦",           # 文字属性只能用 == / !=
+    "water when water_level ~ 40",      # 未知运算符
+    "water when moisture < 40",         # 未知属性
+    "sell when water_level < 40",       # 库存规则不能用田地属性
+    "dance when health < 40",           # 未知操作
+    "water if water_level < 40",        # 缺少 when
+    "water when water_level <",
+])
+def test_bad_rules_are_rejected_at_compile_time(line):
+    with pytest.raises(RuleError):
+        compile_rules([line])
+
+
+def test_comments_and_blank_lines_are_ignored():
+    rules = compile_rules(["# 浇水", "", "   ", "water when water_level < 40"])
+    assert [rule.action for rule in rules] == ["water"]
+
+
+def test_bad_rule_keeps_previous_rules():
+    engine = AutomationEngine()
+    engine.set_rules(["water when water_level < 40"])
+    with pytest.raises(RuleError):
+        engine.set_rules(["harvest when matured", "water when health has 病害"])
+    assert engine.rule_texts == ["water when water_level < 40"]
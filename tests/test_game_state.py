@@ -0,0 +1,75 @@
+import json
+
+import farmersim
+from game_state import StateStore, save_to_dict
+from server import FarmServer, LocalClient
+from simulation import Simulation
+
+
+def stocked_sim(store):
+    sim = Simulation(seed=3, state_store=store)
+    farm = sim.add_farm("a", num_fields=3)
+    for idx, crop in enumerate(("小麦", "小麦", "玉米")):
+        assert sim.act(farm, "plant", {"field": idx, "crop": crop})[0]
+    farm.storage.add_crop({"name": "小麦", "yield": 300, "nutrition": 70, "freshness": 90, "cost": 100})
+    farm.storage.add_crop({"name": "小麦", "yield": 100, "nutrition": 70, "freshness": 30, "cost": 40}, tier="冷藏")
+    farm.storage.add_crop({"name": "玉米", "yield": 200, "nutrition": 60, "freshness": 50, "cost": 80})
+    sim.tick(2)
+    return sim, farm
+
+
+def plan(store, sql, *params):
+    return " ".join(row[-1] for row in store.conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+def test_queries_use_their_indexes():
+    store = StateStore()
+    assert "lots_name" in plan(store, "SELECT name, COUNT(*) FROM lots WHERE farm = ? GROUP BY name", "a")
+    assert "crops_name" in plan(store, "SELECT field_idx FROM crops WHERE farm = ? AND name = ?", "a", "小麦")
+    assert "prices_name_day" in plan(store, "SELECT day, price FROM prices WHERE name = ? AND day >= ?", "小麦", "")
+
+
+def test_inventory_and_crop_queries():
+    store = StateStore()
+    sim, farm = stocked_sim(store)
+    wheat, corn = store.inventory_summary("a")
+    assert wheat[:3] == ("小麦", 2, 400)
+    assert corn[:3] == ("玉米", 1, 200)
+    assert [idx for idx, _health, _water in store.crops_by_name("a", "小麦")] == [0, 1]
+    assert [idx for idx, _health, _water in store.crops_by_name("a", "玉米")] == [2]
+    assert len(store.price_history("小麦")) == 1
+
+
+def test_load_save_matches_the_last_checkpoint():
+    store = StateStore()
+    sim, farm = stocked_sim(store)
+    data = store.load_save("a")
+    expected = json.loads(json.dumps(save_to_dict(farm, sim.now)))
+    assert data == expected
+    assert store.load_save("missing") is None
+
+
+def test_server_report_ops():
+    server = FarmServer(seed=1, state_path=":memory:")
+    client = LocalClient(server, "a")
+    client.request("join", fields=2)
+    assert client.act("plant", field=1, crop="玉米")["ok"]
+    server.farms["a"].storage.add_crop({"name": "小麦", "yield": 50, "nutrition": 70, "freshness": 80})
+    inventory = client.request("inventory")
+    assert inventory["ok"]
+    assert inventory["inventory"] == [{"name": "小麦", "lots": 1, "weight": 50, "freshness": 80.0, "growing": []}]
+    client.request("tick", hours=1)
+    assert len(client.request("prices", name="小麦")["prices"]) == 1
+    assert not LocalClient(FarmServer(seed=1), "a").request("prices", name="小麦")["ok"]
+
+
+def test_replay_from_state_db(tmp_path, capsys):
+    path = tmp_path / "state.db"
+    store = StateStore(str(path))
+    sim, farm = stocked_sim(store)
+    store.close()
+    assert farmersim.main(["replay", str(path), "--from-state", "a", "--days", "1"]) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result["fields"] == 3
+    assert result["lots"] == 3
+    assert farmersim.main(["replay", str(path), "--from-state", "b", "--days", "1"]) == 1
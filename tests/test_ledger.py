@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+
+from economy import Ledger
+from farm import Farm
+from game_state import load_from_dict, save_to_dict
+from plant import get_all_crop_data
+
+START = datetime(2025, 3, 1)
+
+
+def new_game(path, funds=10000):
+    ledger = Ledger(str(path))
+    return ledger, Farm(funds=funds, ledger=ledger, start_time=START)
+
+
+def test_balance_follows_funds(tmp_path):
+    ledger, farm = new_game(tmp_path / "state.db")
+    farm.transact("seed", -300, crop="小麦")
+    farm.transact("sale", 120.5, crop="小麦")
+    assert farm.book_key == "main#1"
+    assert ledger.balance(farm.book_key) == pytest.approx(farm.funds) == pytest.approx(9820.5)
+    pnl = ledger.pnl_by_category(farm.book_key)
+    assert pnl["opening"] == (10000, 1)
+    assert pnl["seed"] == (-300, 1)
+
+
+def test_each_new_game_gets_its_own_book(tmp_path):
+    path = tmp_path / "state.db"
+    for _session in range(3):
+        ledger, farm = new_game(path)
+        farm.transact("seed", -300)
+        ledger.close()
+    ledger = Ledger(str(path))
+    for game in (1, 2, 3):
+        assert ledger.balance(f"main#{game}") == pytest.approx(9700)
+        assert ledger.pnl_by_category(f"main#{game}")["opening"] == (10000, 1)
+    assert ledger.open_book("main") == "main#4"
+
+
+def test_loaded_save_opens_a_book_at_saved_funds(tmp_path):
+    path = tmp_path / "state.db"
+    ledger, farm = new_game(path)
+    farm.transact("seed", -300)
+    save = save_to_dict(farm, START)
+    ledger.close()
+
+    ledger, farm = new_game(path)
+    farm.transact("sale", 5000)
+    farm.open_book()
+    load_from_dict(save, farm, get_all_crop_data())
+    farm.transact("seed", -200)
+    ledger.close()
+
+    ledger = Ledger(str(path))
+    assert ledger.pnl_by_category("main#3") == {"opening": (9700, 1), "seed": (-200, 1)}
+    assert ledger.balance("main#3") == pytest.approx(9500)
+    assert ledger.balance("main#1") == pytest.approx(9700)  # 之前的游戏记录保留
+    assert ledger.balance("main#2") == pytest.approx(15000)
+
+
+def test_farms_keep_separate_books(tmp_path):
+    ledger = Ledger(str(tmp_path / "state.db"))
+    a = Farm(funds=1000, farm_id="a", ledger=ledger, start_time=START)
+    b = Farm(funds=2000, farm_id="b", ledger=ledger, start_time=START)
+    a.transact("seed", -100)
+    assert (a.book_key, b.book_key) == ("a#1", "b#1")
+    assert ledger.balance("a#1") == pytest.approx(900)
+    assert ledger.balance("b#1") == pytest.approx(2000)
+
+
+def test_compact_keeps_counts(tmp_path):
+    ledger, farm = new_game(tmp_path / "state.db")
+    for day in range(1, 4):
+        farm.now = f"2025-03-0{day} 08:00"
+        farm.transact("water", -10)
+        farm.transact("water", -10)
+    assert ledger.compact("2025-04-01 00:00") > 0
+    assert ledger.pnl_by_category(farm.book_key)["water"] == (-60, 6)
+    assert ledger.pnl_by_category(farm.book_key, since="2025-03-01")["water"] == (-60, 6)
+    assert ledger.balance_at(farm.book_key, "2025-03-31 23:59") == pytest.approx(9940)
@@ -0,0 +1,107 @@
+import pytest
+
+from loan import LoanManager, amortization_schedule, settle_due
+
+
+def test_schedule_pays_off_principal():
+    schedule = amortization_schedule(12000, 0.06, 12)
+    assert len(schedule) == 12
+    assert sum(principal for _payment, _interest, principal, _left in schedule) == pytest.approx(12000, abs=0.05)
+    assert schedule[-1][3] == 0.0
+    remaining = [left for *_rest, left in schedule]
+    assert remaining == sorted(remaining, reverse=True)
+
+
+def test_schedule_matches_annuity_formula():
+    r = 0.06 / 12
+    payment = 12000 * r / (1 - (1 + r) ** -12)
+    schedule = amortization_schedule(12000, 0.06, 12)
+    assert all(row[0] == pytest.approx(payment, abs=0.02) for row in schedule)
+    assert schedule[0][1] == pytest.approx(60.0)  # 第一期利息 = 本金 × 月利率
+    interest = [row[1] for row in schedule]
+    assert interest == sorted(interest, reverse=True)
+
+
+def test_zero_rate_schedule_is_equal_installments():
+    schedule = amortization_schedule(9000, 0.0, 3)
+    assert [row[0] for row in schedule] == [3000.0, 3000.0, 3000.0]
+    assert all(row[1] == 0.0 for row in schedule)
+
+
+def test_repayment_follows_schedule():
+    loans = LoanManager(initial_debt=0)
+    ok, _message = loans.borrow_money(6000, term_months=6)
+    assert ok
+    loan = loans.loans[0]
+    assert loans.handle_repayment(10 ** 6)[:2] == ("no_due", 0)  # 第一期在下一个完整周期到期
+    for period in range(6):
+        due = loans.amount_due()
+        assert due == pytest.approx(loan.schedule[period][0])
+        status, paid, _message = loans.handle_repayment(10 ** 6)
+        assert (status, paid) == ("paid_full", due)
+    assert loans.loans == []
+    assert loans.total_debt == 0
+
+
+def test_missed_payment_becomes_overdue():
+    loans = LoanManager(initial_debt=0)
+    loans.borrow_money(6000, term_months=6)
+    loans.handle_repayment(0)
+    due = loans.amount_due()
+    status, paid, _message = loans.handle_repayment(0)
+    assert (status, paid) == ("overdue", 0)
+    assert loans.overdue_balance == pytest.approx(due * (1 + loans.interest_rate_overdue))
+    assert loans.amount_due() > loans.loans[0].due_on(loans.month)
+
+
+def test_payment_curve_matches_schedule():
+    loans = LoanManager(initial_debt=0)
+    loans.borrow_money(4000, term_months=4)
+    schedule = loans.loans[0].schedule
+    assert loans.payment_curve(6) == pytest.approx([0.0] + [row[0] for row in schedule] + [0.0])
+
+
+def test_legacy_total_debt_is_migrated():
+    loans = LoanManager()
+    loans.load_dict({"total_debt": 7000, "credit_score": 80})
+    assert loans.credit_score == 80
+    assert loans.total_debt == pytest.approx(7000)
+    (loan,) = loans.loans
+    assert (loan.annual_rate, loan.term_months) == (0.0, 3)
+
+
+def test_to_dict_round_trip():
+    loans = LoanManager()
+    loans.borrow_money(5000)
+    loans.handle_repayment(10 ** 6)
+    restored = LoanManager()
+    restored.load_dict(loans.to_dict())
+    assert restored.to_dict() == loans.to_dict()
+
+
+def test_new_loan_starts_next_full_period():
+    loans = LoanManager()
+    first_due = loans.amount_due()
+    loans.borrow_money(6000, term_months=6)
+    assert loans.amount_due() == first_due  # 还款日前借的款本期不用还
+    loans.handle_repayment(10 ** 6)
+    assert loans.amount_due() == pytest.approx(first_due + loans.loans[-1].schedule[0][0])
+
+
+def test_batch_settlement_keeps_farms_independent():
+    def managers():
+        rich, broke, clear = LoanManager(), LoanManager(), LoanManager(initial_debt=0)
+        rich.borrow_money(8000, term_months=3)
+        broke.borrow_money(2000)
+        return [rich, broke, clear]
+
+    batch, single = managers(), managers()
+    first = settle_due(batch, [10 ** 6, 500, 0])
+    assert [status for status, _paid, _message in first] == ["paid_full", "paid_partial", "no_debt"]
+    assert [paid for _status, paid, _message in first] == [3000, 500, 0]
+    for manager, funds in zip(single, [10 ** 6, 500, 0]):
+        manager.handle_repayment(funds)
+    for _month in range(4):
+        funds = [10 ** 6, 500, 0]
+        assert settle_due(batch, funds) == [m.handle_repayment(f) for m, f in zip(single, funds)]
+        assert [m.to_dict() for m in batch] == [m.to_dict() for m in single]
@@ -0,0 +1,54 @@
+import math
+
+import pytest
+
+from market import IMPACT_RECOVERY, Market, Product
+
+
+def product():
+    return Product("小麦", 3.0, 1.0, 6.0, "kg", depth=1000.0)
+
+
+def test_quote_slides_with_volume():
+    wheat = product()
+    assert wheat.quote(0) == pytest.approx(3.0)
+    small, large = wheat.quote(100), wheat.quote(2000)
+    assert 3.0 > small > large > wheat.min_price
+    # 到底价之前按 exp(-q/depth) 下滑：卖出 q 公斤的平均价 = start × depth × (1 - e^(-q/depth)) / q
+    assert small == pytest.approx(3.0 * 1000 * (1 - math.exp(-0.1)) / 100)
+
+
+def test_quote_does_not_go_below_floor():
+    wheat = product()
+    assert wheat.quote(10 ** 7) == pytest.approx(wheat.min_price, rel=1e-3)
+
+
+def test_sale_moves_price_and_next_quote():
+    wheat = product()
+    expected = wheat.quote(500)
+    assert wheat.execute_sale(500) == pytest.approx(expected)
+    assert wheat.impact == pytest.approx(-0.5)
+    assert wheat.sold_today == 500
+    assert wheat.price == pytest.approx(round(3.0 * math.exp(-0.5), 2))
+    assert wheat.quote(500) < expected
+
+
+def test_impact_recovers_over_days():
+    wheat = product()
+    wheat.execute_sale(1000)
+    wheat.fundamental = 3.0
+    for day in range(1, 4):
+        wheat.update_price()
+        assert wheat.impact == pytest.approx(-1.0 * IMPACT_RECOVERY ** day)
+        assert wheat.sold_today == 0.0
+    assert wheat.price > 3.0 * math.exp(-1.0) * 0.9
+
+
+def test_sell_batch_merges_orders_of_one_crop():
+    market = Market()
+    name = market.products[0].name
+    expected = market.quote(name, 300)
+    prices = market.sell_batch([(name, 100), (name, 200), ("不存在", 50)])
+    assert prices[0] == prices[1] == pytest.approx(expected)
+    assert prices[2] is None
+    assert market.get_product(name).sold_today == 300
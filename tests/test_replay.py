@@ -0,0 +1,54 @@
+import json
+
+import farmersim
+from action_log import read_log, replay
+
+RULES = "water when water_level < 40\nharvest when matured\nsell when freshness < 70\n"
+
+
+def record(tmp_path, capsys, days=60):
+    rules = tmp_path / "rules.txt"
+    rules.write_text(RULES, encoding="utf-8")
+    path = tmp_path / "session.ndjson"
+    assert farmersim.main(["run", "--days", str(days), "--crop", "小麦", "--seed", "7",
+                           "--strategy", str(rules), "--record", str(path)]) == 0
+    capsys.readouterr()
+    return path
+
+
+def test_recorded_run_verifies(tmp_path, capsys):
+    path = record(tmp_path, capsys)
+    assert farmersim.main(["verify", str(path)]) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result["ok"]
+    assert result["days_checked"] == 60
+    assert result["actions"] > 0
+
+
+def test_replay_is_repeatable(tmp_path, capsys):
+    path = record(tmp_path, capsys, days=20)
+    first, second = replay(str(path)), replay(str(path))
+    assert first.ok and second.ok
+    assert (first.days_checked, first.actions, first.hours) == (second.days_checked, second.actions, second.hours)
+
+
+def test_tampered_hash_is_reported(tmp_path, capsys):
+    path = record(tmp_path, capsys, days=10)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    index = next(i for i, line in enumerate(lines) if line.startswith('["h"') and i > 3)
+    entry = json.loads(lines[index])
+    entry[2] = "0" * 16
+    lines[index] = json.dumps(entry)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    assert farmersim.main(["verify", str(path)]) == 1
+    result = json.loads(capsys.readouterr().out)
+    assert result["mismatch"]["time"] == entry[1]
+    assert result["mismatch"]["recorded"] == "0" * 16
+
+
+def test_log_header_has_seed_and_farm(tmp_path, capsys):
+    header, entries = read_log(str(record(tmp_path, capsys, days=2)))
+    assert header["seed"] == 7
+    assert list(header["farms"]) == ["main"]
+    assert entries[-1][0] == "e"
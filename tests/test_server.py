@@ -0,0 +1,72 @@
+import pytest
+
+from farm import Farm
+from server import MAX_TICK_HOURS, FarmServer, LocalClient
+
+
+@pytest.fixture
+def client():
+    server = FarmServer(seed=1)
+    client = LocalClient(server, "a")
+    assert client.request("join")["ok"]
+    return client
+
+
+@pytest.mark.parametrize("action, args", [
+    ("plant", {"field": -1, "crop": "小麦"}),
+    ("plant", {"field": 2, "crop": "小麦"}),
+    ("plant", {"field": "0", "crop": "小麦"}),
+    ("plant", {"field": 0, "crop": "仙人掌"}),
+    ("plant", {"field": 0, "crop": "小麦", "day": "abc"}),
+    ("fertilize", {"field": 0, "nutrient": "X"}),
+    ("fertilize", {"field": 0, "nutrient": "N", "cell": "a1"}),
+    ("bulk", {"fields": [0, 0], "action": "water"}),
+    ("bulk", {"fields": [0], "action": "dance"}),
+    ("store", {"lot": 0, "tier": "冷藏"}),
+    ("store", {"lot": 0, "tier": "地窖"}),
+    ("borrow", {"amount": "1000"}),
+    ("borrow", {"amount": -1000}),
+    ("automation", {"rules": ["water when health has 病害"], "enabled": True}),
+    ("dance", {}),
+])
+def test_invalid_actions_are_rejected_without_charge_or_record(client, action, args):
+    farm = client.server.farms["a"]
+    recorded = []
+    farm.recorder = lambda *entry: recorded.append(entry)
+    response = client.act(action, **args)
+    assert not response["ok"]
+    assert response["funds"] == 10000
+    assert recorded == []
+
+
+def test_valid_action_is_recorded(client):
+    farm = client.server.farms["a"]
+    recorded = []
+    farm.recorder = lambda *entry: recorded.append(entry)
+    assert client.act("fertilize", field=0, nutrient="N")["funds"] == 9950
+    assert [entry[2] for entry in recorded] == ["fertilize"]
+
+
+def test_farm_fertilize_checks_nutrient_before_charging():
+    farm = Farm(funds=100)
+    assert farm.fertilize(0, "X") == (False, "无效的肥料类型。")
+    assert farm.funds == 100
+
+
+@pytest.mark.parametrize("request_", [
+    [1, 2],
+    {"op": "act", "farm": "a", "action": "water", "args": [1]},
+    {"op": "tick", "hours": MAX_TICK_HOURS + 1},
+    {"op": "tick", "hours": "24"},
+    {"op": "join", "farm": "b", "fields": Farm.MAX_FIELDS + 1},
+    {"op": "join", "farm": "", "fields": 2},
+])
+def test_bad_requests_get_an_error(client, request_):
+    assert client.server.handle(request_)["ok"] is False
+
+
+def test_tick_is_refused_while_the_clock_runs(client):
+    client.server.clock_running = True
+    assert not client.request("tick")["ok"]
+    client.server.clock_running = False
+    assert client.request("tick", hours=2)["ok"]
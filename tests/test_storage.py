@@ -0,0 +1,72 @@
+import pytest
+
+from market import Market
+from simulation import Simulation
+from storage import Storage
+
+
+def stocked():
+    storage = Storage()
+    storage.add_crop({"name": "小麦", "yield": 400, "nutrition": 70, "freshness": 90, "cost": 100})
+    storage.add_crop({"name": "玉米", "yield": 300, "nutrition": 60, "freshness": 80, "cost": 80})
+    storage.add_crop({"name": "小麦", "yield": 200, "nutrition": 70, "freshness": 95}, tier="冷藏")
+    return storage
+
+
+def test_sell_lots_sells_each_lot_once():
+    storage, market = stocked(), Market()
+    sold = storage.sell_lots([2, 0, 2, 0], market)
+    assert [lot_id for _name, _value, lot_id in sold] == [3, 1]
+    assert [lot["name"] for lot in storage.stock] == ["玉米"]
+    assert market.get_product("小麦").sold_today == 600
+
+
+@pytest.mark.parametrize("indices", [[-1], [3], [0, 5], [True], ["0"], [0.0]])
+def test_invalid_indices_sell_nothing(indices):
+    storage, market = stocked(), Market()
+    prices = [product.price for product in market.products]
+    with pytest.raises(ValueError):
+        storage.sell_lots(indices, market)
+    assert len(storage.stock) == 3
+    assert [product.price for product in market.products] == prices
+
+
+def test_act_rejects_bad_lot_indices():
+    sim = Simulation(seed=1)
+    farm = sim.add_farm("a")
+    farm.storage.add_crop({"name": "小麦", "yield": 100, "nutrition": 70, "freshness": 90})
+    for args in ({"lots": [0, 0]}, {"lot": -1}, {"lots": 0}, {"lots": [1]}):
+        ok, _message = sim.act(farm, "sell", args)
+        assert not ok
+    assert len(farm.storage.stock) == 1
+    ok, _message = sim.act(farm, "sell", {"lots": [0]})
+    assert ok and farm.storage.stock == []
+
+
+def test_same_day_harvests_merge():
+    storage = Storage()
+    storage.add_crop({"name": "小麦", "yield": 100, "nutrition": 70, "freshness": 80, "cost": 10})
+    storage.add_crop({"name": "小麦", "yield": 300, "nutrition": 70, "freshness": 100, "cost": 30})
+    (lot,) = storage.stock
+    assert lot["yield"] == 400
+    assert lot["freshness"] == pytest.approx(95)
+    assert lot["cost"] == 40
+    assert lot["harvests"] == 2
+
+
+def test_fresh_harvest_is_not_averaged_into_an_older_lot():
+    storage = Storage()
+    storage.add_crop({"name": "小麦", "yield": 100, "nutrition": 70, "freshness": 80})
+    storage.stock[0]["days"] = 4
+    storage.add_crop({"name": "小麦", "yield": 300, "nutrition": 70, "freshness": 100})
+    assert [(lot["days"], lot["freshness"]) for lot in storage.stock] == [(4, 80), (0, 100)]
+
+
+def test_compact_merges_only_spent_lots():
+    storage = Storage()
+    for days, freshness in ((9, 0.0), (3, 0.0), (2, 50.0), (1, 0.0)):
+        storage.add_crop({"name": "小麦", "yield": 100, "nutrition": 70, "freshness": freshness})
+        storage.stock[-1]["days"] = days
+    merged, expired = storage.compact(max_days=5)
+    assert (merged, [lot["days"] for lot in expired]) == (1, [9])
+    assert [(lot["days"], lot["yield"], lot["freshness"]) for lot in storage.stock] == [(3, 200, 0.0), (2, 100, 50.0)]
@@ -0,0 +1,35 @@
+import pytest
+
+from market import Market
+from storage import Storage
+from valuation import lot_value
+
+
+def stocked():
+    storage = Storage()
+    storage.add_crop({"name": "小麦", "yield": 400, "nutrition": 70, "freshness": 90, "cost": 100})
+    storage.add_crop({"name": "玉米", "yield": 300, "nutrition": 60, "freshness": 80, "cost": 80})
+    storage.add_crop({"name": "小麦", "yield": 200, "nutrition": 70, "freshness": 95}, tier="冷藏")
+    return storage
+
+
+def test_sale_price_matches_valuation():
+    storage, market = stocked(), Market()
+    expected = storage.valuation.total(market)
+    sold = storage.sell_lots([0, 1, 2], market)
+    assert sum(value for _name, value, _lot_id in sold) == pytest.approx(expected)
+
+
+def test_lots_of_one_crop_share_the_batch_price():
+    storage, market = stocked(), Market()
+    average = market.quote("小麦", 600)
+    sold = storage.sell_lots([0, 2], market)
+    assert [value for _name, value, _lot_id in sold] == [lot_value(lot, average) for lot in (
+        {"yield": 400, "nutrition": 70, "freshness": 90}, {"yield": 200, "nutrition": 70, "freshness": 95})]
+
+
+def test_valuation_follows_stock_changes():
+    storage, market = stocked(), Market()
+    before = storage.valuation.total(market)
+    storage.sell_lots([1], market)
+    assert storage.valuation.total(Market()) < before
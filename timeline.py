@@ -0,0 +1,206 @@
+# timeline.py
+# 时间回溯：保留最近 retention_days 天的农场状态，可以重建其中任意一个小时。
+#   - 每个模拟日的第一个小时存一份检查点 (save_to_dict 格式的 JSON，zlib 压缩)；
+#   - 之后每小时只存相对上一小时发生变化的叶子值 (资金、每块田地作物的各项数值、仓库、贷款……)；
+#   - 重建某个小时 = 解压当天的检查点，再依次应用当天在它之前的增量，最多 23 次。
+# 天数按环形缓冲区 (deque) 保存，超过保留天数的整天连同检查点一起丢弃，内存有上限。
+
+import json
+import zlib
+from collections import deque
+from datetime import timedelta
+
+from game_state import save_to_dict, load_from_dict
+
+_MISSING = object()
+
+
+def flatten(save):
+    """
+    save_to_dict() 存档 -> {键: 值}，值都是不可变的标量或 JSON 文本，可以直接比较。
+    作物的每个存档字段是一个叶子，所以一小时的增量只包含真正变化了的数值。
+    """
+    flat = {}
+    for key, value in save.items():
+        if key == "fields":
+            flat["fields"] = len(value)
+            for i, field in enumerate(value):
+                crop = field.get("crop")
+                flat[("soil", i)] = json.dumps(field["soil_npk"], sort_keys=True)
+                if "soil_grid" in field:
+                    flat[("grid", i)] = json.dumps(field["soil_grid"], sort_keys=True)
+                for crop_key, crop_value in (crop or {}).items():
+                    # 列表和字典 (品质标签、受损原因、营养满足度) 是作物上的活对象，存成 JSON 文本
+                    if isinstance(crop_value, (dict, list)):
+                        flat[("crop_json", i, crop_key)] = json.dumps(crop_value, sort_keys=True, ensure_ascii=False)
+                    else:
+                        flat[("crop", i, crop_key)] = crop_value
+        elif isinstance(value, (dict, list)):
+            flat[key] = json.dumps(value, sort_keys=True, ensure_ascii=False)
+        else:
+            flat[key] = value
+    return flat
+
+
+def unflatten(flat):
+    """flatten() 的逆过程，返回可以交给 game_state.load_from_dict 的存档。"""
+    save = {}
+    fields = [{"soil_npk": None, "crop": None} for _ in range(flat["fields"])]
+    for key, value in flat.items():
+        if key == "fields":
+            continue
+        if isinstance(key, tuple):
+            kind, i = key[0], key[1]
+            if kind == "soil":
+                fields[i]["soil_npk"] = json.loads(value)
+            elif kind == "grid":
+                fields[i]["soil_grid"] = json.loads(value)
+            else:
+                crop = fields[i]["crop"] = fields[i]["crop"] or {}
+                crop[key[2]] = json.loads(value) if kind == "crop_json" else value
+        elif key in ("storage", "loan_info", "automation", "soil_grid"):
+            save[key] = json.loads(value)
+        else:
+            save[key] = value
+    save["fields"] = fields
+    return save
+
+
+def diff(old, new):
+    """Leaves that changed from old to new; removed leaves map to _MISSING."""
+    changes = {key: value for key, value in new.items() if old.get(key, _MISSING) != value}
+    for key in old.keys() - new.keys():
+        changes[key] = _MISSING
+    return changes
+
+
+def apply(flat, changes):
+    for key, value in changes.items():
+        if value is _MISSING:
+            flat.pop(key, None)
+        else:
+            flat[key] = value
+
+
+class TimelineDay:
+    """One simulated day: a compressed checkpoint of its first recorded hour plus one delta per later hour."""
+
+    __slots__ = ("day", "times", "checkpoint", "deltas")
+
+    def __init__(self, day, time, flat):
+        self.day = day
+        self.times = [time]
+        self.checkpoint = zlib.compress(json.dumps(unflatten(flat), ensure_ascii=False).encode("utf-8"))
+        self.deltas = []
+
+    def state(self, hour_index):
+        """The flattened state after the given recorded hour of this day."""
+        flat = flatten(json.loads(zlib.decompress(self.checkpoint)))
+        for changes in self.deltas[:hour_index]:
+            apply(flat, changes)
+        return flat
+
+    def size(self):
+        """Rough memory footprint in bytes (checkpoint plus delta leaves)."""
+        return len(self.checkpoint) + sum(64 * len(changes) for changes in self.deltas)
+
+
+class Timeline:
+    """
+    Records one farm every hour and reconstructs any recorded hour in the retention window.
+    Positions (0 = oldest) index the recorded hours, which is what the GUI slider moves over.
+    """
+
+    def __init__(self, retention_days=3):
+        if retention_days < 1:
+            raise ValueError("至少需要保留 1 天的时间线。")
+        self.retention_days = retention_days
+        self.days = deque(maxlen=retention_days)
+        self._last = None  # 上一次记录的展开状态，用来求下一小时的增量
+        self._storage_key = None  # (仓库对象, 版本)：仓库未变化时沿用上一小时的 JSON
+        self._storage_json = None
+
+    def __len__(self):
+        return sum(len(day.times) for day in self.days)
+
+    def clear(self):
+        self.days.clear()
+        self._last = None
+        self._storage_key = None
+
+    def _flatten_farm(self, farm, time):
+        save = save_to_dict(farm, time)
+        storage = save.pop("storage")
+        key = (id(farm.storage), farm.storage.version)
+        if key != self._storage_key:
+            self._storage_key = key
+            self._storage_json = json.dumps(storage, sort_keys=True, ensure_ascii=False)
+        flat = flatten(save)
+        flat["storage"] = self._storage_json
+        return flat
+
+    def record(self, farm, time):
+        """Records the farm's state as of time (a datetime, after that hour's update)."""
+        flat = self._flatten_farm(farm, time)
+        day = (time - timedelta(hours=1)).date()  # time 是这一小时结束的时刻，00:00 属于前一天
+        flat.pop("date")  # 时间记在 times 里，不进入增量
+        if not self.days or self.days[-1].day != day or self._last is None:
+            self.days.append(TimelineDay(day, time, flat))
+        else:
+            current = self.days[-1]
+            current.times.append(time)
+            current.deltas.append(diff(self._last, flat))
+        self._last = flat
+
+    def times(self):
+        return [time for day in self.days for time in day.times]
+
+    def _locate(self, position):
+        if position < 0:
+            position += len(self)
+        for day in self.days:
+            if position < len(day.times):
+                return day, position
+            position -= len(day.times)
+        raise IndexError("时间线上没有这个位置。")
+
+    def time_at(self, position):
+        day, index = self._locate(position)
+        return day.times[index]
+
+    def save_at(self, position):
+        """The farm as of a recorded hour, in game_state.save_to_dict format."""
+        day, index = self._locate(position)
+        save = unflatten(day.state(index))
+        save["date"] = day.times[index].strftime("%Y-%m-%d %H:%M:%S")
+        return save
+
+    def farm_at(self, position, crop_data):
+        """A detached Farm rebuilt at a recorded hour (no ledger, no log), for read-only inspection."""
+        from farm import Farm
+        save = self.save_at(position)
+        farm = Farm(funds=0, num_fields=0, soil_grid=save.get("soil_grid"))
+        load_from_dict(save, farm, crop_data)
+        return farm
+
+    def first_damage(self, reason):
+        """{field index: first recorded time that field's crop showed reason} within the window."""
+        found = {}
+        for day in self.days:
+            flat = day.state(0)
+            for index, time in enumerate(day.times):
+                if index:
+                    apply(flat, day.deltas[index - 1])
+                for key, value in flat.items():
+                    if (isinstance(key, tuple) and key[0] == "crop_json" and key[2] == "damage_reasons"
+                            and key[1] not in found and reason in json.loads(value)):
+                        found[key[1]] = time
+        return found
+
+    def report(self):
+        return {
+            "days": len(self.days),
+            "hours": len(self),
+            "retention_days": self.retention_days,
+            "kb": round(sum(day.size() for day in self.days) / 1024, 1),
+        }
@@ -0,0 +1,116 @@
+# valuation.py
+# 库存估值：界面、一键出售和自动化出售共用同一个估值公式 (lot_value)。
+#   售价 = 重量 × 成交均价 × (营养 × 0.5 + 新鲜度 × 0.5) / 100 × 品质加成
+# InventoryValuation 一次为所有批次计算预估售价、利润和保本天数 (按预期腐烂速度，
+# 新鲜度降到售价等于成本的那一天)，结果缓存到库存或市场价格发生变化为止。
+# 估值与 Market.sell_batch 的撮合一致：同一作物的全部库存合并报价一次，各批次按同一成交均价分摊售价。
+
+from collections import namedtuple
+
+RISK_DAYS = 3         # 保本天数少于此值的批次视为有风险
+STALE_FRESHNESS = 40  # 新鲜度低于此值的批次视为有风险
+
+LotValue = namedtuple("LotValue", "lot_id name tier weight unit_price value cost profit break_even_days at_risk")
+CropValue = namedtuple("CropValue", "name lots weight value cost profit at_risk")
+
+
+def quality_bonus(crop):
+    """每个品质标签带来 25% 的售价加成。"""
+    return 1.0 + (len(crop.get('quality_tags', [])) * 0.25)
+
+
+def condition_multiplier(lot):
+    return (lot['nutrition'] * 0.5 + lot['freshness'] * 0.5) / 100
+
+
+def lot_value(lot, price):
+    """Sale value of a lot at an average execution price (None = no market -> 0)."""
+    return round(lot['yield'] * (price or 0.0) * condition_multiplier(lot) * quality_bonus(lot), 2)
+
+
+def break_even_days(lot, price, curve, tier_decay):
+    """
+    Days until the expected decay makes the lot worth less than its cost at this price.
+    0 if it already is, None if it never will (value stays above cost even at zero freshness).
+    """
+    scale = lot['yield'] * (price or 0.0) * quality_bonus(lot) / 200
+    if scale <= 0:
+        return 0.0 if lot.get('cost', 0) > 0 else None
+    floor = lot.get('cost', 0) / scale - lot['nutrition']  # 保本所需的新鲜度
+    if floor <= 0:
+        return None
+    margin = lot['freshness'] - floor
+    if margin <= 0:
+        return 0.0
+    base, per_day = curve
+    # 第 k 天的预期腐烂: tier × (base + (days + k) × per_day)，累计 d 天为 a·d² + b·d
+    a = tier_decay * per_day / 2
+    b = tier_decay * (base + per_day * (lot['days'] + 0.5))
+    if a <= 0:
+        return margin / b if b > 0 else None
+    return (-b + (b * b + 4 * a * margin) ** 0.5) / (2 * a)
+
+
+class InventoryValuation:
+    """Valuation of one Storage against a Market, recomputed only when either has changed."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._key = None
+        self._lots = []
+        self.computed = 0  # 实际重新计算的次数
+
+    def _market_key(self, market):
+        return id(market), tuple((p.fundamental, p.impact) for p in market.products)
+
+    def lots(self, market):
+        """One LotValue per lot, in stock order, priced as if the whole stock were sold in one sell_batch."""
+        key = (self.storage.version, self._market_key(market))
+        if key == self._key:
+            return self._lots
+        storage = self.storage
+        volume = {}
+        for lot in storage.stock:
+            volume[lot['name']] = volume.get(lot['name'], 0.0) + lot['yield']
+        prices = {name: market.quote(name, quantity) for name, quantity in volume.items()}
+        rows = []
+        for lot in storage.stock:
+            name = lot['name']
+            price = prices[name]
+            value = lot_value(lot, price)
+            cost = lot.get('cost', 0)
+            tier = lot.get('tier')
+            spec = storage.catalog.product(name)
+            days = break_even_days(lot, price, spec.decay if spec else (0.5, 1 / 30), storage.tiers[tier]['decay'])
+            at_risk = (value < cost or lot['freshness'] < STALE_FRESHNESS
+                       or (days is not None and days <= RISK_DAYS))
+            rows.append(LotValue(lot['lot_id'], name, tier, lot['yield'], price, value, cost,
+                                 round(value - cost, 2), days, at_risk))
+        self._key = key
+        self._lots = rows
+        self.computed += 1
+        return rows
+
+    def lot(self, market, index):
+        return self.lots(market)[index]
+
+    def at_risk(self, market):
+        """Indices of the lots that are losing money, stale, or close to their break-even day."""
+        return [i for i, row in enumerate(self.lots(market)) if row.at_risk]
+
+    def summary(self, market, sort_by="value", reverse=True):
+        """Per-crop totals, sorted by any CropValue field."""
+        totals = {}
+        for row in self.lots(market):
+            entry = totals.setdefault(row.name, [0, 0.0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += row.weight
+            entry[2] += row.value
+            entry[3] += row.cost
+            entry[4] += row.at_risk
+        crops = [CropValue(name, n, round(w, 1), round(v, 2), round(c, 2), round(v - c, 2), r)
+                 for name, (n, w, v, c, r) in totals.items()]
+        return sorted(crops, key=lambda crop: getattr(crop, sort_by), reverse=reverse)
+
+    def total(self, market):
+        return round(sum(row.value for row in self.lots(market)), 2)
@@ -82,6 +82,32 @@ class Weather:
     
 ## 小时级更新
 
+# 北京的月平均气温范围和月降雨 (概率, 雨量范围 mm)；WeatherDynamic 与 regional_weather 共用
+MONTH_TEMP = {
+    1: (-3, 4),  2: (0, 8),   3: (4, 14),
+    4: (10, 20), 5: (15, 25), 6: (20, 30),
+    7: (24, 34), 8: (22, 32), 9: (16, 26),
+    10: (10, 20), 11: (2, 12), 12: (-2, 6)
+}
+MONTH_RAIN = {
+    1: (0.1, (1, 8)),  2: (0.15, (1, 10)), 3: (0.25, (1, 15)),
+    4: (0.35, (3, 20)),5: (0.45, (5, 25)), 6: (0.6, (8, 35)),
+    7: (0.65, (10, 40)),8: (0.55, (8, 30)),9: (0.4, (5, 20)),
+    10: (0.2, (2, 12)),11: (0.1, (1, 6)),  12: (0.05, (1, 5))
+}
+
+
+def roll_extreme_event(month):
+    """Draws the day's extreme event (or None) for a month."""
+    if month in [6, 7, 8] and random.random() < 0.05:
+        return "雷暴台风"
+    elif month in [12, 1, 2] and random.random() < 0.03:
+        return "暴风雪"
+    elif month in [3, 4] and random.random() < 0.02:
+        return "强风"
+    return None
+
+
 class WeatherDynamic:
     def __init__(self, date: datetime):
         self.date = date
@@ -102,13 +128,7 @@ class WeatherDynamic:
 
     def _generate_daily_temperature_curve(self):
         # 模拟一天内 24 小时的温度曲线（贝尔状）
-        month_temp = {
-            1: (-3, 4),  2: (0, 8),   3: (4, 14),
-            4: (10, 20), 5: (15, 25), 6: (20, 30),
-            7: (24, 34), 8: (22, 32), 9: (16, 26),
-            10: (10, 20), 11: (2, 12), 12: (-2, 6)
-        }
-        low, high = month_temp[self.date.month]
+        low, high = MONTH_TEMP[self.date.month]
         midday = random.uniform((high + low) / 2, high)
         midnight = random.uniform(low, (high + low) / 2)
 
@@ -125,13 +145,7 @@ class WeatherDynamic:
 
     def _generate_daily_weather_base(self):
         # 每天决定降雨概率
-        month_rain = {
-            1: (0.1, (1, 8)),  2: (0.15, (1, 10)), 3: (0.25, (1, 15)),
-            4: (0.35, (3, 20)),5: (0.45, (5, 25)), 6: (0.6, (8, 35)),
-            7: (0.65, (10, 40)),8: (0.55, (8, 30)),9: (0.4, (5, 20)),
-            10: (0.2, (2, 12)),11: (0.1, (1, 6)),  12: (0.05, (1, 5))
-        }
-        chance, rain_range = month_rain[self.date.month]
+        chance, rain_range = MONTH_RAIN[self.date.month]
         self.rainfall_today = round(random.uniform(*rain_range), 1) if random.random() < chance else 0.0
 
         # 降雨时间段（若下雨）
@@ -139,15 +153,7 @@ class WeatherDynamic:
         self.rain_duration = random.randint(1, 4) if self.rainfall_today > 0 else 0
 
         # 极端天气
-        month = self.date.month
-        extreme = None
-        if month in [6, 7, 8] and random.random() < 0.05:
-            extreme = "雷暴台风"
-        elif month in [12, 1, 2] and random.random() < 0.03:
-            extreme = "暴风雪"
-        elif month in [3, 4] and random.random() < 0.02:
-            extreme = "强风"
-        self.extreme_event = extreme
+        self.extreme_event = roll_extreme_event(self.date.month)
 
     def start_new_day(self, date):
         self.date = date